@@ -0,0 +1,65 @@
+"""
+Worst-case benchmark of bioconverters.utils.remove_brackets_without_words against the previous
+implementation, which repeated three regex substitutions until the text stopped changing.
+
+Usage: python benchmarks/bench_brackets.py
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bioconverters.utils import remove_brackets_without_words
+
+
+def previous_remove_brackets_without_words(text):
+	changed = True
+	previous_text = text
+	while changed:
+		fixed = re.sub(r"\([^\w\t]*\)", "", previous_text)
+		fixed = re.sub(r"\[[^\w\t]*\]", "", fixed)
+		fixed = re.sub(r"\{[^\w\t]*\}", "", fixed)
+		changed = bool(previous_text != fixed)
+		previous_text = fixed
+	return fixed
+
+
+def nested(depth):
+	# ( [ ( [ ... ] ) ] ) with the brackets alternating at every level
+	opening = ''.join( '( ' if i % 2 == 0 else '[ ' for i in range(depth) )
+	closing = ''.join( ') ' if i % 2 == 0 else '] ' for i in reversed(range(depth)) )
+	return 'text %s%s text' % (opening, closing)
+
+
+def unclosed(depth):
+	return 'text %s text' % ('( [ ' * depth)
+
+
+def citations(count):
+	return ' '.join( 'Sentence %d with removed citations ( [] , [ ] ) .' % i for i in range(count) )
+
+
+if __name__ == '__main__':
+	cases = [
+		('nested', nested),
+		('unclosed', unclosed),
+		('citations', citations),
+	]
+
+	print("%10s %8s %10s %12s %12s %8s" % ('case', 'size', 'length', 'previous_s', 'current_s', 'speedup'))
+	for name, generator in cases:
+		for size in [100, 1000, 5000]:
+			text = generator(size)
+
+			start_time = time.perf_counter()
+			expected = previous_remove_brackets_without_words(text)
+			previous_time = time.perf_counter() - start_time
+
+			start_time = time.perf_counter()
+			result = remove_brackets_without_words(text)
+			current_time = time.perf_counter() - start_time
+
+			assert result == expected
+			print("%10s %8d %10d %12.4f %12.4f %7.1fx" % (name, size, len(text), previous_time, current_time, previous_time / current_time))
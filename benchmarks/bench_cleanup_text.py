@@ -0,0 +1,118 @@
+"""
+Benchmark of bioconverters.utils.cleanup_text against the previous per-character implementation, using
+the text that is actually cleaned when converting full PMC articles.
+
+Usage: python benchmarks/bench_cleanup_text.py [PMC XML files or .tar.gz archives...]
+(defaults to a generated full-length article)
+"""
+import io
+import os
+import re
+import sys
+import tarfile
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bioconverters import pmcxml2bioc, utils
+
+
+def previous_cleanup_text(text):
+	text = text.replace(u" ", " ").replace(u" ", " ")
+	text = "".join(ch for ch in text if unicodedata.category(ch)[0] != "C" or ch == utils.TABLE_DELIMITER)
+	text = "".join(ch if unicodedata.category(ch)[0] != "Z" else " " for ch in text)
+	text = re.sub(r",([^\S\t]*,)*", ",", text)
+	text = re.sub(r"(,[^\S\t]*)*\.", ".", text)
+	text = utils.remove_brackets_without_words(text)
+	text = re.sub(r'\([^\S\t]*([^)]*[^\s)])[^\S\t]*\)', r'(\1)', text)
+	text = re.sub(r'[^\S\t]+\.(\s|$)', r'.\1', text)
+	text = re.sub(r'[^\S\t]*([,;])[^\S\t]+', r'\1 ', text)
+	text = re.sub(r'(^|\t)([^\S\t]+)', r'\1', text)
+	text = re.sub(r'([^\S\t]+)(\t|$)', r'\2', text)
+	text = re.sub(r'[^\S\t][^\S\t]+', ' ', text)
+	return text
+
+
+def synthetic_article(section_count=20, paragraph_count=10):
+	paragraph = ('<p>Mutations in <italic>BRCA1</italic> and <italic>TP53</italic>\u00a0were found in 45 % of samples '
+		'( <xref ref-type="bibr" rid="b1">1</xref> , <xref ref-type="bibr" rid="b2">2</xref> ) and TNF-\u03b1 '
+		'signalling was reduced ( <xref ref-type="fig" rid="f1">Fig. 1</xref> ) ; see also '
+		'<xref ref-type="bibr" rid="b3">[3]</xref> .\n   The effect of <bold>EGFR</bold> inhibition was '
+		'\u2009significant (p &lt; 0.05) , as shown previously [ <xref ref-type="bibr" rid="b4">4</xref> ].</p>')
+	table = ('<table-wrap><label>Table 1</label><caption><p>Patient characteristics .</p></caption><table>'
+		'<thead><tr><th>Gene</th><th>Samples</th><th>Frequency (%)</th></tr></thead><tbody>'
+		+ ''.join( '<tr><td><italic>GENE%d</italic></td><td> %d </td><td>%d.%d</td></tr>' % (i,i*7,i,i) for i in range(30) )
+		+ '</tbody></table></table-wrap>')
+	sections = ''.join( '<sec><title>Section %d</title>%s%s</sec>' % (i, paragraph*paragraph_count, table) for i in range(section_count) )
+	references = ''.join( '<ref id="b%d"><label>%d</label><mixed-citation><person-group><name><surname>Smith</surname> '
+		'<given-names>J</given-names></name></person-group> <article-title>Reference %d</article-title> '
+		'<source>J Test</source> <year>2020</year>;<volume>1</volume>:<fpage>%d</fpage></mixed-citation></ref>' % (i,i,i,i)
+		for i in range(section_count*10) )
+
+	return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+		'<article article-type="research-article"><front><article-meta>'
+		'<article-id pub-id-type="pmid">1</article-id><article-id pub-id-type="pmc">PMC1</article-id>'
+		'<title-group><article-title>A synthetic article</article-title></title-group>'
+		'<abstract><p>An abstract .</p></abstract></article-meta></front>'
+		'<body>%s</body><back><ref-list>%s</ref-list></back></article>' % (sections, references))
+
+
+def load_articles(filenames):
+	articles = []
+	for filename in filenames:
+		if filename.endswith('.tar.gz'):
+			with tarfile.open(filename) as tar:
+				for member in tar:
+					if member.isfile() and member.name.endswith(('.xml','.nxml')):
+						articles.append(tar.extractfile(member).read().decode('utf-8'))
+		else:
+			with open(filename) as f:
+				articles.append(f.read())
+	return articles
+
+
+def collect_cleaned_texts(articles):
+	# Record every string passed to cleanup_text while converting the articles
+	texts = []
+	cleanup_text = utils.cleanup_text
+
+	def recording_cleanup_text(text):
+		texts.append(text)
+		return cleanup_text(text)
+
+	utils.cleanup_text = recording_cleanup_text
+	try:
+		for article in articles:
+			for _ in pmcxml2bioc(io.StringIO(article)):
+				pass
+	finally:
+		utils.cleanup_text = cleanup_text
+
+	return texts
+
+
+def time_function(func, texts, repeats):
+	start_time = time.perf_counter()
+	for _ in range(repeats):
+		for text in texts:
+			func(text)
+	return time.perf_counter() - start_time
+
+
+if __name__ == '__main__':
+	articles = load_articles(sys.argv[1:]) if len(sys.argv) > 1 else [ synthetic_article() ]
+
+	texts = collect_cleaned_texts(articles)
+	total_length = sum( len(text) for text in texts )
+	repeats = max(1, 5000000 // max(total_length, 1))
+
+	for text in texts:
+		assert utils.cleanup_text(text) == previous_cleanup_text(text)
+
+	previous_time = time_function(previous_cleanup_text, texts, repeats)
+	current_time = time_function(utils.cleanup_text, texts, repeats)
+
+	print("%d articles, %d calls, %d characters (x%d repeats)" % (len(articles), len(texts), total_length, repeats))
+	print("%12s %12s %8s" % ('previous_s', 'current_s', 'speedup'))
+	print("%12.3f %12.3f %7.1fx" % (previous_time, current_time, previous_time / current_time))
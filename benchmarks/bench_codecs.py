@@ -0,0 +1,79 @@
+"""
+Database size and decompression throughput of the document codecs (gzip for each document on its own and
+raw deflate with a preset dictionary trained, as trainDictionary.py does, on the first documents).
+
+Usage: python benchmarks/bench_codecs.py [BioC XML file] (defaults to generated PubMed abstracts)
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import dbutils
+
+
+def write_synthetic_abstracts(filename, document_count=20000):
+	# Random text (with Zipf-like word frequencies) in documents with the infons that PubMed abstracts have
+	rng = random.Random(0)
+	words = [ ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 10))) for _ in range(5000) ]
+	weights = [ 1 / (rank + 1) for rank in range(len(words)) ]
+	journals = [ ('Journal of %s' % ' '.join(rng.sample(words[:200], 2)).title(), 'J %s' % rng.choice(words[:200]).title()) for _ in range(200) ]
+	mesh_terms = [ 'D%06d|%s' % (rng.randint(0, 999999), ' '.join(rng.sample(words[:500], 2)).title()) for _ in range(2000) ]
+
+	def text(word_count):
+		return ' '.join(rng.choices(words, weights, k=word_count))
+
+	with open(filename, 'w') as f:
+		f.write('<?xml version="1.0" encoding="UTF-8"?>\n<collection><source></source><date></date><key></key>')
+		for pmid in range(1, document_count + 1):
+			journal, journal_iso = rng.choice(journals)
+			title = text(12)
+			infons = {
+				'title': title, 'pmid': pmid, 'pmcid': '', 'doi': '10.%d/%s.%d' % (rng.randint(1000, 9999), journal_iso.split()[-1].lower(), pmid),
+				'year': rng.randint(1990, 2023), 'month': rng.randint(1, 12), 'day': rng.randint(1, 28),
+				'journal': journal, 'journalISO': journal_iso,
+				'authors': ', '.join('%s %s' % (rng.choice(words).title(), rng.choice(words).title()) for _ in range(rng.randint(1, 8))),
+				'chemicals': '', 'meshHeadings': '~'.join('%s|N' % term for term in rng.sample(mesh_terms, rng.randint(3, 15))),
+				'supplementaryMesh': '', 'publicationTypes': 'Journal Article',
+			}
+			f.write(f'<document><id>{pmid}</id>')
+			f.write(''.join(f'<infon key="{key}">{value}</infon>' for key, value in infons.items()))
+			f.write(f'<passage><infon key="section">title</infon><offset>0</offset><text>{title}</text></passage>')
+			f.write(f'<passage><infon key="section">abstract</infon><offset>{len(title)}</offset><text>{text(rng.randint(100, 300))}</text></passage>')
+			f.write('</document>\n')
+		f.write('</collection>')
+
+
+def measure_decompression(db_filename):
+	con = sqlite3.connect(db_filename)
+	rows = con.execute("SELECT compressed, codec FROM abstracts").fetchall()
+	decompressor = dbutils.DocumentDecompressor(con)
+	start_time = time.perf_counter()
+	for compressed, codec in rows:
+		decompressor.decompress(compressed, codec)
+	elapsed = time.perf_counter() - start_time
+	blob_size = sum( len(compressed) for compressed, _ in rows )
+	con.close()
+	return len(rows), blob_size, elapsed
+
+
+if __name__ == '__main__':
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		if len(sys.argv) > 1:
+			documents_filename = sys.argv[1]
+		else:
+			documents_filename = os.path.join(tmp_dir, 'abstracts.bioc.xml')
+			write_synthetic_abstracts(documents_filename)
+
+		zdict = dbutils.trainDictionaryFromBioCFiles([documents_filename])
+
+		print("%8s %10s %12s %12s %14s" % ('codec', 'documents', 'db_mb', 'blobs_mb', 'decomp_docs_s'))
+		for codec in ['gzip', 'zdict']:
+			db_filename = os.path.join(tmp_dir, '%s.sqlite' % codec)
+			dbutils.saveDocumentsToDatabase(db_filename, documents_filename, is_fulltext=False, file_index=1, zdict=zdict if codec == 'zdict' else None)
+			count, blob_size, elapsed = measure_decompression(db_filename)
+			print("%8s %10d %12.2f %12.2f %14.0f" % (codec, count, os.path.getsize(db_filename) / 1024 / 1024, blob_size / 1024 / 1024, count / elapsed))
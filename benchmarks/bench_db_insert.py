@@ -0,0 +1,85 @@
+"""
+Peak RSS and insert throughput when loading a BioC XML file of documents into an SQLite database, comparing
+batched inserts (at various batch sizes) with collecting every document before a single insert.
+
+Usage: python benchmarks/bench_db_insert.py [BioC XML file] (defaults to generated abstracts)
+"""
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import dbutils
+
+
+def write_synthetic_documents(filename, document_count=20000):
+	# Random words so that the documents compress about as well as real abstracts
+	rng = random.Random(0)
+	words = [ ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 10))) for _ in range(5000) ]
+	with open(filename, 'w') as f:
+		f.write('<?xml version="1.0" encoding="UTF-8"?>\n<collection><source></source><date></date><key></key>')
+		for pmid in range(1, document_count + 1):
+			f.write(f'<document><id>{pmid}</id><infon key="pmid">{pmid}</infon><infon key="journal">Journal of Tests</infon>')
+			f.write(f'<passage><infon key="section">title</infon><offset>0</offset><text>Article {pmid} title</text></passage>')
+			f.write(f'<passage><infon key="section">abstract</infon><offset>20</offset><text>{" ".join(rng.choice(words) for _ in range(250))}</text></passage>')
+			f.write('</document>')
+		f.write('</collection>')
+
+
+def save_all_at_once(db_filename, documents_filename):
+	# The previous implementation that collects every compressed document before inserting them together
+	con = sqlite3.connect(db_filename)
+	cur = con.cursor()
+	cur.execute("CREATE TABLE abstracts(pmid INTEGER PRIMARY KEY ASC, compressed BLOB, hash INTEGER, updated INTEGER, file_index INTEGER);")
+	timestamp = int(time.time())
+	document_records = []
+	for pmid, xmlstr in dbutils.readDocumentsFromBioCFile(documents_filename):
+		compressed = dbutils.gzip_str(xmlstr)
+		document_records.append( (pmid, compressed, dbutils.calcSHA256_AsInt(compressed), timestamp, 1) )
+	cur.executemany("INSERT INTO abstracts VALUES (?,?,?,?,?)", document_records)
+	con.commit()
+	con.close()
+	return len(document_records)
+
+
+def run_single(documents_filename, mode):
+	# Run in a fresh process so that the peak RSS is only from this run
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		db_filename = os.path.join(tmp_dir, 'bench.sqlite')
+		start_time = time.perf_counter()
+		if mode == 'all':
+			count = save_all_at_once(db_filename, documents_filename)
+		else:
+			dbutils.saveDocumentsToDatabase(db_filename, documents_filename, is_fulltext=False, file_index=1, batch_size=int(mode))
+			count = sqlite3.connect(db_filename).execute("SELECT COUNT(*) FROM abstracts").fetchone()[0]
+		elapsed = time.perf_counter() - start_time
+
+	peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+	print("%d %f %f" % (count, elapsed, peak_rss_mb))
+
+
+if __name__ == '__main__':
+	if len(sys.argv) == 4 and sys.argv[1] == '--single':
+		run_single(sys.argv[2], sys.argv[3])
+		sys.exit(0)
+
+	with tempfile.NamedTemporaryFile(suffix='.bioc.xml') as tf:
+		if len(sys.argv) > 1:
+			documents_filename = sys.argv[1]
+		else:
+			documents_filename = tf.name
+			write_synthetic_documents(documents_filename)
+
+		print("%12s %10s %10s %12s %12s" % ('mode', 'documents', 'time_s', 'docs_per_s', 'peak_rss_mb'))
+		for mode in ['all', '100', '1000', '10000']:
+			output = subprocess.run([sys.executable, __file__, '--single', documents_filename, mode], check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+			count, elapsed, peak_rss_mb = output.split()[-3:]
+			count, elapsed, peak_rss_mb = int(count), float(elapsed), float(peak_rss_mb)
+			label = 'all at once' if mode == 'all' else 'batch %s' % mode
+			print("%12s %10d %10.2f %12.0f %12.1f" % (label, count, elapsed, count / elapsed, peak_rss_mb))
@@ -0,0 +1,63 @@
+"""
+Peak memory and number of text chunks created when extracting the text of PMC articles.
+
+Usage: python benchmarks/bench_extraction_memory.py [PMC XML files or .tar.gz archives...]
+(defaults to a generated full-length article)
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bioconverters import pmcxml2bioc, utils
+from bench_cleanup_text import load_articles, synthetic_article
+
+
+def count_chunks(article):
+	# Count the TextChunk objects created while converting an article
+	count = 0
+	init = utils.TextChunk.__init__
+
+	def counting_init(self, *args, **kwargs):
+		nonlocal count
+		count += 1
+		init(self, *args, **kwargs)
+
+	utils.TextChunk.__init__ = counting_init
+	try:
+		for _ in pmcxml2bioc(io.StringIO(article)):
+			pass
+	finally:
+		utils.TextChunk.__init__ = init
+
+	return count
+
+
+def measure_peak(article):
+	tracemalloc.start()
+	for _ in pmcxml2bioc(io.StringIO(article)):
+		pass
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return peak
+
+
+def measure_time(article):
+	start_time = time.perf_counter()
+	for _ in pmcxml2bioc(io.StringIO(article)):
+		pass
+	return time.perf_counter() - start_time
+
+
+if __name__ == '__main__':
+	articles = load_articles(sys.argv[1:]) if len(sys.argv) > 1 else [ synthetic_article(section_count=100) ]
+
+	chunk = utils.TextChunk('', None)
+	chunk_size = sys.getsizeof(chunk) + (sys.getsizeof(chunk.__dict__) if hasattr(chunk, '__dict__') else 0)
+	print("TextChunk size: %d bytes" % chunk_size)
+	print("%10s %10s %12s %10s" % ('length', 'chunks', 'peak_mb', 'time_s'))
+	for article in articles:
+		print("%10d %10d %12.2f %10.3f" % (len(article), count_chunks(article), measure_peak(article) / 1024 / 1024, measure_time(article)))
@@ -0,0 +1,91 @@
+"""
+Per-article throughput of the PubMed field extraction. Compares the single walk of each PubmedArticle
+(bioconverters.pubmedxml.collect_medline_fields) against the previous separate path queries for each
+field, then times the full conversion of each article (process_medline_article).
+
+Usage: python benchmarks/bench_medline_fields.py [PubMed XML file]
+(defaults to a generated file with 5,000 articles)
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from bioconverters.pubmedxml import collect_medline_fields, process_medline_article
+from bioconverters.xmlbackend import XML_BACKENDS, iterparse, lxml_etree, set_xml_backend
+from bench_xml_backends import write_synthetic_pubmed_file
+
+
+# The path queries previously run on each article (the DOI and PMC IDs were separate queries with an IdType filter)
+PREVIOUS_FIELD_PATHS = {
+	'pmid': './MedlineCitation/PMID',
+	'pubDate': './MedlineCitation/Article/Journal/JournalIssue/PubDate',
+	'history': './PubmedData/History/PubMedPubDate',
+	'authors': './MedlineCitation/Article/AuthorList/Author',
+	'chemicals': './MedlineCitation/ChemicalList/Chemical/NameOfSubstance',
+	'meshHeadings': './MedlineCitation/MeshHeadingList/MeshHeading',
+	'supplementaryMesh': './MedlineCitation/SupplMeshList/SupplMeshName',
+	'articleIds': './PubmedData/ArticleIdList/ArticleId',
+	'publicationTypes': './MedlineCitation/Article/PublicationTypeList/PublicationType',
+	'title': './MedlineCitation/Article/ArticleTitle',
+	'abstract': './MedlineCitation/Article/Abstract/AbstractText',
+	'journal': './MedlineCitation/Article/Journal/Title',
+	'journalISO': './MedlineCitation/Article/Journal/ISOAbbreviation',
+}
+
+
+def previous_collect_medline_fields(elem):
+	fields = { name:elem.findall(path) for name,path in PREVIOUS_FIELD_PATHS.items() }
+	fields['pubDateDuplicate'] = elem.find('./MedlineCitation/Article/Journal/JournalIssue/PubDate/MedlineDate')
+	fields['doi'] = elem.findall("./PubmedData/ArticleIdList/ArticleId[@IdType='doi']")
+	fields['pmc'] = elem.findall("./PubmedData/ArticleIdList/ArticleId[@IdType='pmc']")
+	return fields
+
+
+def load_articles(filename):
+	articles = []
+	for _, elem in iterparse(filename, events=('end',), tag='PubmedArticle'):
+		articles.append(elem)
+	return articles
+
+
+def time_per_article(func, articles, repeats=5):
+	best = None
+	for _ in range(repeats):
+		start_time = time.perf_counter()
+		for elem in articles:
+			func(elem)
+		duration = time.perf_counter() - start_time
+		best = duration if best is None else min(best, duration)
+	return 1000000 * best / len(articles)
+
+
+if __name__ == '__main__':
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		if len(sys.argv) > 1:
+			filename = sys.argv[1]
+		else:
+			filename = os.path.join(tmp_dir, 'pubmed_synthetic.xml')
+			write_synthetic_pubmed_file(filename, 5000)
+
+		print("%8s %10s %16s %16s %8s %18s" % ('backend', 'articles', 'previous_us', 'walk_us', 'speedup', 'article_total_us'))
+		for backend in XML_BACKENDS:
+			if backend == 'lxml' and lxml_etree is None:
+				print("%8s %10s" % (backend, 'not installed'))
+				continue
+
+			set_xml_backend(backend)
+			articles = load_articles(filename)
+
+			for elem in articles:
+				fields = collect_medline_fields(elem)
+				previous_fields = previous_collect_medline_fields(elem)
+				assert all( fields[name] == previous_fields[name] for name in PREVIOUS_FIELD_PATHS )
+
+			previous_us = time_per_article(previous_collect_medline_fields, articles)
+			walk_us = time_per_article(collect_medline_fields, articles)
+			total_us = time_per_article(process_medline_article, articles, repeats=3)
+
+			print("%8s %10d %16.1f %16.1f %7.1fx %18.1f" % (backend, len(articles), previous_us, walk_us, previous_us / walk_us, total_us))
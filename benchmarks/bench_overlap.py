@@ -0,0 +1,60 @@
+"""
+Benchmark of the longest-first overlap resolution used by alignWithPubtator.py on dense synthetic
+passages (e.g. supplementary tables with thousands of candidate mentions).
+
+Usage: python benchmarks/bench_overlap.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from pubtatorutils import selectLongestNonOverlapping
+
+
+def quadratic_select(spans):
+	# The previous implementation that checks every candidate against all accepted spans
+	locations = sorted([ (end-start,start,end) for start,end in spans ], reverse=True)
+	nonoverlapping = []
+	for _,start1,end1 in locations:
+		overlapping = False
+		for start2,end2 in nonoverlapping:
+			if start1 > end2:
+				pass
+			elif start2 > end1:
+				pass
+			else:
+				overlapping = True
+				break
+
+		if not overlapping:
+			nonoverlapping.append ((start1,end1))
+	return nonoverlapping
+
+
+def dense_candidates(passage_length, count, seed=0):
+	rng = random.Random(seed)
+	spans = set()
+	while len(spans) < count:
+		start = rng.randrange(passage_length)
+		spans.add((start, min(passage_length, start + rng.randint(2, 20))))
+	return list(spans)
+
+
+if __name__ == '__main__':
+	print("%10s %10s %12s %12s %8s" % ('length', 'candidates', 'quadratic_s', 'fenwick_s', 'speedup'))
+	for passage_length, count in [(10000, 1000), (50000, 5000), (200000, 20000), (500000, 50000)]:
+		spans = dense_candidates(passage_length, count)
+
+		start_time = time.perf_counter()
+		expected = quadratic_select(spans)
+		quadratic_time = time.perf_counter() - start_time
+
+		start_time = time.perf_counter()
+		result = selectLongestNonOverlapping(spans)
+		fenwick_time = time.perf_counter() - start_time
+
+		assert result == expected
+		print("%10d %10d %12.3f %12.3f %7.1fx" % (passage_length, count, quadratic_time, fenwick_time, quadratic_time / fenwick_time))
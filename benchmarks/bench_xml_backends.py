@@ -0,0 +1,97 @@
+"""
+Throughput of the PubMed converter with each XML parsing backend on a baseline-sized file (a PubMed
+baseline file has ~30,000 articles). Also checks that both backends give identical BioC output.
+
+Usage: python benchmarks/bench_xml_backends.py [PubMed XML file]
+(defaults to a generated file with 30,000 articles)
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import bioc
+from bioconverters import pubmedxml2bioc
+from bioconverters.xmlbackend import XML_BACKENDS, iterparse, lxml_etree, set_xml_backend
+
+
+def synthetic_pubmed_article(pmid):
+	authors = ''.join( '<Author ValidYN="Y"><LastName>Author%d</LastName><ForeName>A</ForeName><Initials>A</Initials></Author>' % i for i in range(6) )
+	mesh = ''.join( '<MeshHeading><DescriptorName UI="D%06d" MajorTopicYN="N">Term %d</DescriptorName>'
+		'<QualifierName UI="Q%06d" MajorTopicYN="Y">qualifier</QualifierName></MeshHeading>' % (i,i,i) for i in range(10) )
+	abstract = ' '.join( 'Sentence %d of the abstract about <i>BRCA1</i> and TNF-&#945; signalling (p &lt; 0.05).' % i for i in range(10) )
+
+	return ('<PubmedArticle><MedlineCitation Status="MEDLINE" Owner="NLM"><PMID Version="1">%d</PMID>'
+		'<Article PubModel="Print"><Journal><ISSN IssnType="Print">0000-0000</ISSN><JournalIssue CitedMedium="Print">'
+		'<Volume>1</Volume><Issue>2</Issue><PubDate><Year>2020</Year><Month>Mar</Month><Day>%d</Day></PubDate></JournalIssue>'
+		'<Title>Journal of Tests</Title><ISOAbbreviation>J Test</ISOAbbreviation></Journal>'
+		'<ArticleTitle>[A study of article %d in <i>vitro</i>].</ArticleTitle>'
+		'<Abstract><AbstractText Label="BACKGROUND">%s</AbstractText><AbstractText Label="RESULTS">%s</AbstractText></Abstract>'
+		'<AuthorList CompleteYN="Y">%s</AuthorList><Language>eng</Language>'
+		'<PublicationTypeList><PublicationType UI="D016428">Journal Article</PublicationType></PublicationTypeList></Article>'
+		'<ChemicalList><Chemical><RegistryNumber>0</RegistryNumber><NameOfSubstance UI="D000001">Chemical</NameOfSubstance></Chemical></ChemicalList>'
+		'<MeshHeadingList>%s</MeshHeadingList></MedlineCitation>'
+		'<PubmedData><History><PubMedPubDate PubStatus="pubmed"><Year>2020</Year><Month>3</Month><Day>4</Day></PubMedPubDate>'
+		'<PubMedPubDate PubStatus="medline"><Year>2020</Year><Month>5</Month><Day>6</Day></PubMedPubDate></History>'
+		'<PublicationStatus>ppublish</PublicationStatus><ArticleIdList><ArticleId IdType="pubmed">%d</ArticleId>'
+		'<ArticleId IdType="doi">10.1000/test.%d</ArticleId></ArticleIdList></PubmedData></PubmedArticle>\n'
+		% (pmid, pmid % 28 + 1, pmid, abstract, abstract, authors, mesh, pmid, pmid))
+
+
+def write_synthetic_pubmed_file(filename, article_count):
+	with open(filename, 'w') as f:
+		f.write('<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, 1st January 2019//EN" "https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_190101.dtd">\n<PubmedArticleSet>\n')
+		for pmid in range(1, article_count+1):
+			f.write(synthetic_pubmed_article(pmid))
+		f.write('</PubmedArticleSet>\n')
+
+
+def parse(filename):
+	# Time to parse the file alone (without converting the articles)
+	start_time = time.perf_counter()
+	for _, elem in iterparse(filename, events=('end',), tag='PubmedArticle'):
+		elem.clear()
+	return time.perf_counter() - start_time
+
+
+def convert(filename):
+	# Returns the time taken and a hash of the BioC output
+	start_time = time.perf_counter()
+	docs = list(pubmedxml2bioc(filename))
+	duration = time.perf_counter() - start_time
+
+	output_hash = hashlib.sha256()
+	for doc in docs:
+		collection = bioc.BioCCollection()
+		collection.add_document(doc)
+		output_hash.update(bioc.biocxml.dumps(collection).encode('utf-8'))
+
+	return len(docs), duration, output_hash.hexdigest()
+
+
+if __name__ == '__main__':
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		if len(sys.argv) > 1:
+			filename = sys.argv[1]
+		else:
+			filename = os.path.join(tmp_dir, 'pubmed_synthetic.xml')
+			write_synthetic_pubmed_file(filename, 30000)
+
+		size_mb = os.path.getsize(filename) / 1024 / 1024
+
+		print("%8s %10s %10s %10s %12s %10s" % ('backend', 'articles', 'parse_s', 'total_s', 'articles/s', 'MB/s'))
+		hashes = {}
+		for backend in XML_BACKENDS:
+			if backend == 'lxml' and lxml_etree is None:
+				print("%8s %10s" % (backend, 'not installed'))
+				continue
+
+			set_xml_backend(backend)
+			parse_duration = parse(filename)
+			article_count, duration, hashes[backend] = convert(filename)
+			print("%8s %10d %10.2f %10.2f %12.0f %10.2f" % (backend, article_count, parse_duration, duration, article_count / duration, size_mb / duration))
+
+		assert len(set(hashes.values())) == 1, "XML backends gave different output"
@@ -18,7 +18,7 @@ setup(
     long_description=long_description,
     long_description_content_type='text/markdown',
     install_requires=['bioc>=2.0', 'typing_extensions'],
-    extras_require={'dev': DEV_REQS + TEST_REQS, 'test': TEST_REQS},
+    extras_require={'dev': DEV_REQS + TEST_REQS, 'test': TEST_REQS, 'lxml': ['lxml']},
     python_requires='>=3.6',
     author='Jake Lever',
     author_email='jake.lever@glasgow.ac.uk',
@@ -1,9 +1,12 @@
-from typing import Iterable, Iterator, TextIO, Union
+import collections
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, TextIO, Tuple, Union
 
 import bioc
 
 from .pmcxml import pmcxml2bioc
 from .pubmedxml import pubmedxml2bioc
+from .xmlbackend import get_xml_backend, set_xml_backend
 
 
 def docs2bioc(source: Union[str, TextIO], format: str, **kwargs) -> Iterator[Iterable[bioc.BioCDocument]]:
@@ -23,7 +26,69 @@ accepted_in_formats = ["biocxml", "pubmedxml", "pmcxml"]
 accepted_out_formats = ["biocxml", "txt"]
 
 
-def convert(in_files, in_format, out_file, out_format, **kwargs):
+# How many input files per worker process can be waiting to be converted (or written out) at any time
+PENDING_FILES_PER_WORKER = 2
+
+
+def _convert_file(
+    in_file: str, in_format: str, xml_backend: str, kwargs: dict
+) -> List[bioc.BioCDocument]:
+    # the backend is set again as worker processes do not always inherit it
+    set_xml_backend(xml_backend)
+    return list(docs2bioc(in_file, in_format, **kwargs))
+
+
+def _with_failed_file(in_file: str, documents: Iterable[bioc.BioCDocument]) -> Iterator[bioc.BioCDocument]:
+    # the converters are lazy, so errors are only raised while their documents are being written out
+    try:
+        yield from documents
+    except Exception as e:
+        raise RuntimeError("Failed to convert %s: %s" % (in_file, e)) from e
+
+
+def _convert_files_in_parallel(
+    in_files: Iterable[str], in_format: str, workers: int, **kwargs
+) -> Iterator[Tuple[str, List[bioc.BioCDocument]]]:
+    """
+    Convert the input files in a pool of worker processes, yielding (in_file, documents) in the same order as in_files
+    """
+    xml_backend = get_xml_backend()
+    pending = collections.deque()
+
+    def next_result():
+        in_file, future = pending.popleft()
+        try:
+            return in_file, future.result()
+        except Exception as e:
+            raise RuntimeError("Failed to convert %s: %s" % (in_file, e)) from e
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for in_file in in_files:
+                assert isinstance(
+                    in_file, str
+                ), "Input files must be given as paths when converting with multiple workers"
+                pending.append(
+                    (in_file, executor.submit(_convert_file, in_file, in_format, xml_backend, kwargs))
+                )
+                if len(pending) >= workers * PENDING_FILES_PER_WORKER:
+                    yield next_result()
+
+            while pending:
+                yield next_result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def convert(in_files, in_format, out_file, out_format, workers=1, **kwargs):
+    """
+    Args:
+        in_files: paths (or filehandlers) of the input files
+        workers: number of processes to convert the input files with. With more than one, the input files must be
+            paths (except for pubmedxml, where each file is split between the workers instead). The documents are
+            still written out in the same order as the input files.
+    """
     out_bioc_handle, out_txt_handle = None, None
 
     assert (
@@ -38,25 +103,41 @@ def convert(in_files, in_format, out_file, out_format, **kwargs):
         out_format,
         "/".join(accepted_out_formats),
     )
+    assert workers >= 1, "Must have at least one worker"
 
     if out_format == "biocxml":
         out_bioc_handle = bioc.biocxml.BioCXMLDocumentWriter(out_file)
     elif out_format == "txt":
         out_txt_handle = open(out_file, "w", encoding="utf-8")
 
-    for in_file in in_files:
+    if workers > 1 and in_format == "pubmedxml":
+        # each PubMed file is large enough to be split between the workers instead
+        converted = (
+            (in_file, _with_failed_file(in_file, docs2bioc(in_file, in_format, workers=workers, **kwargs)))
+            for in_file in in_files
+        )
+    elif workers > 1:
+        converted = _convert_files_in_parallel(in_files, in_format, workers, **kwargs)
+    else:
+        converted = (
+            (in_file, _with_failed_file(in_file, docs2bioc(in_file, in_format, **kwargs))) for in_file in in_files
+        )
 
-        for bioc_doc in docs2bioc(in_file, in_format, **kwargs):
+    try:
+        for in_file, bioc_docs in converted:
 
-            if out_format == "biocxml":
-                out_bioc_handle.write_document(bioc_doc)
-            elif out_format == "txt":
-                for passage in bioc_doc.passages:
-                    out_txt_handle.write(passage.text)
-                    out_txt_handle.write("\n\n")
+            for bioc_doc in bioc_docs:
 
-    if out_format == "biocxml":
-        out_bioc_handle.close()
-    elif out_format == "txt":
-        out_txt_handle.close()
+                if out_format == "biocxml":
+                    out_bioc_handle.write_document(bioc_doc)
+                elif out_format == "txt":
+                    for passage in bioc_doc.passages:
+                        out_txt_handle.write(passage.text)
+                        out_txt_handle.write("\n\n")
+    finally:
+        converted.close()
 
+        if out_format == "biocxml":
+            out_bioc_handle.close()
+        elif out_format == "txt":
+            out_txt_handle.close()
@@ -1,9 +1,8 @@
 import calendar
 import html
-import io
 import re
 import xml.etree.cElementTree as etree
-from typing import Dict, Iterable, Iterator, Optional, TextIO, Tuple, Union
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, TextIO, Tuple, Union
 
 try:
     # python 3.8+
@@ -23,6 +22,7 @@ from .utils import (
     strip_annotation_markers,
     trim_sentence_lengths,
 )
+from .xmlbackend import XML_PARSE_ERRORS, iterparse
 
 allowed_subsections = {
     "abbreviations",
@@ -245,37 +245,86 @@ def get_meta_info_for_pmc_article(
         journal_iso_text,
     )
 
-def apply_pmc_xlink_fix(
-    source: Union[str, TextIO]
-) -> TextIO:
+XLINK_NAMESPACE_DECLARATION = ' xmlns:xlink="http://www.w3.org/1999/xlink"'
+
+# The start tag of the article element (not e.g. article-meta), which may be split over multiple lines
+ARTICLE_START_TAG_REGEX = re.compile(r'<article(?=[\s/>])[^>]*>')
+ARTICLE_START_TAG_BYTES_REGEX = re.compile(ARTICLE_START_TAG_REGEX.pattern.encode('utf-8'))
+
+# How much of the file to read at a time when looking for the article start tag
+XLINK_FIX_READ_SIZE = 16 * 1024
+
+
+class XlinkFixReader:
     """
-    Hacky fix to add the xlink namespace to the article document if it uses it and has not defined it.
-    A small number of PMC documents need this for the XML parser to successfully load it.
+    Wraps a PMC XML file (binary or text) and adds the xlink namespace to the article start tag as the
+    file is read, if the tag does not already declare it. Only the start of the file, up to the end of
+    the article start tag, is buffered. The rest is passed straight through from the wrapped file.
     """
-    if isinstance(source,str):
-        with open(source,encoding='utf-8') as f:
-            content = f.read()
-    else:
-        content = source.read()
 
-    if 'xlink' in content:
-        article_tag = re.search(r'<article.*?>',content).group()
-        if not 'xmlns:xlink=' in article_tag:
-            new_article_tag = article_tag.replace('<article ', '<article xmlns:xlink="http://www.w3.org/1999/xlink" ', 1)
-            content = content.replace(article_tag,new_article_tag,1)
+    def __init__(self, source: Union[BinaryIO, TextIO]):
+        self.source = source
+        self.buffer = None
+
+    def _read_to_article_start_tag(self) -> None:
+        buffer = self.source.read(0)
+        regex, declaration, declared = ARTICLE_START_TAG_REGEX, XLINK_NAMESPACE_DECLARATION, 'xmlns:xlink='
+        if isinstance(buffer, bytes):
+            regex = ARTICLE_START_TAG_BYTES_REGEX
+            declaration, declared = declaration.encode('utf-8'), declared.encode('utf-8')
+
+        while True:
+            chunk = self.source.read(XLINK_FIX_READ_SIZE)
+            buffer += chunk
+            match = regex.search(buffer)
+            if match or not chunk:
+                break
+
+        if match and declared not in match.group():
+            insert_at = match.start() + len('<article')
+            buffer = buffer[:insert_at] + declaration + buffer[insert_at:]
+
+        self.buffer = buffer
+
+    def read(self, size: int = -1) -> Union[bytes, str]:
+        if self.buffer is None:
+            self._read_to_article_start_tag()
+
+        if not self.buffer:
+            return self.source.read(size)
+        elif size is None or size < 0:
+            data = self.buffer + self.source.read()
+            self.buffer = self.buffer[:0]
+        else:
+            data = self.buffer[:size]
+            self.buffer = self.buffer[size:]
+        return data
 
-    source = io.StringIO(content)
-    return source
+
+def apply_pmc_xlink_fix(
+    source: Union[BinaryIO, TextIO]
+) -> XlinkFixReader:
+    """
+    Hacky fix to add the xlink namespace to the article document if it has not defined it.
+    A small number of PMC documents need this for the XML parser to successfully load it.
+    The namespace is declared as the file is read, so the file is never loaded into memory as a whole.
+    """
+    return XlinkFixReader(source)
 
 def process_pmc_file(
-    source: Union[str, TextIO],
+    source: Union[str, BinaryIO, TextIO],
     tag_handlers: Dict[str, TagHandlerFunction] = {},
 ) -> Iterable[PmcArticle]:
 
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            yield from process_pmc_file(f, tag_handlers=tag_handlers)
+        return
+
     source = apply_pmc_xlink_fix(source)
 
     # Skip to the article element in the file
-    for event, elem in etree.iterparse(source, events=("start", "end", "start-ns", "end-ns")):
+    for event, elem in iterparse(source, events=("end",), tag="article"):
         if event == "end" and elem.tag == "article":
             (
                 pmid_text,
@@ -367,7 +416,7 @@ def process_pmc_file(
 
 
 def pmcxml2bioc(
-    source: Union[str, TextIO],
+    source: Union[str, BinaryIO, TextIO],
     tag_handlers: Dict[str, TagHandlerFunction] = {},
     trim_sentences: bool = False,
     all_xml_path_infon: bool = False,
@@ -377,7 +426,7 @@ def pmcxml2bioc(
     Convert a PMC XML file into its Bioc equivalent
 
     Args:
-        source: The text or file handle containing the PMC XML
+        source: The path to the PMC XML file or a file handle for it (binary file handles, e.g. from tarfile.extractfile, are read without decoding them first)
         tag_handlers: custom overrides for handling specific XML tags.
         trim_sentences: Trim text content to a maximum sentence length.
         all_xml_path_infon: Add a xml_path infon element to every passages to describe where in the XML heirarchy this text is from (Will always add to table/figure elements even without flag)
@@ -455,5 +504,5 @@ def pmcxml2bioc(
 
             yield bioc_doc
 
-    except etree.ParseError:
+    except XML_PARSE_ERRORS:
         raise RuntimeError("Parsing error in PMC xml file: %s" % source)
@@ -1,8 +1,12 @@
 import calendar
+import collections
 import html
+import io
+import pickle
 import re
 import xml.etree.cElementTree as etree
-from typing import Dict, Iterable, Optional, TextIO, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 
 try:
     # python 3.8+
@@ -19,6 +23,7 @@ from .utils import (
     remove_brackets_from_titles,
     trim_sentence_lengths,
 )
+from .xmlbackend import get_xml_backend, iterparse_detached, set_xml_backend
 
 DateTuple = Tuple[Optional[int], Optional[int], Optional[int]]
 
@@ -41,6 +46,31 @@ class MedlineArticle(TypedDict):
     publicationTypes: str
 
 
+MONTH_MAPPING = {
+    m: i for months in (calendar.month_name, calendar.month_abbr) for i, m in enumerate(months)
+}
+
+# Month names and abbreviations to search for (in this order) in a free-text MedlineDate
+MEDLINE_DATE_MONTHS = [
+    c for c in (list(calendar.month_name) + list(calendar.month_abbr)) if c != ""
+]
+
+YEAR_REGEX = re.compile(r"(18|19|20)\d\d")
+
+# The start and end tags of each article (and the start tag of the root), for splitting a file between workers
+PUBMED_ARTICLE_START_REGEX = re.compile(rb"<PubmedArticle[\s>]")
+PUBMED_ARTICLE_END_TAG = b"</PubmedArticle>"
+XML_START_TAG_REGEX = re.compile(rb"<([^\s>/?!]+)")
+XML_DECLARATION_ENCODING_REGEX = re.compile(r"""\s*<\?xml[^>]*\sencoding\s*=\s*["']([\w.:-]+)["']""")
+
+# Approximate size (in bytes) of the pieces that a file is split into for the workers, and how much is read at a time
+MEDLINE_PIECE_SIZE = 4 * 1024 * 1024
+MEDLINE_READ_SIZE = 1024 * 1024
+
+# How many pieces per worker process can be waiting to be converted (or written out) at any time
+PENDING_PIECES_PER_WORKER = 2
+
+
 def get_journal_date_for_medline_file(elem: etree.Element, pmid: Union[str, int]) -> DateTuple:
     """
     Scrapes the Journal Date from the Medline XML element tree.
@@ -49,20 +79,19 @@ def get_journal_date_for_medline_file(elem: etree.Element, pmid: Union[str, int]
         elem: XML element to be scraped/parsed
         pmid: Pubmed ID of the article, only used for reporting errors
     """
-    year_regex = re.compile(r"(18|19|20)\d\d")
-
-    month_mapping = {}
-    for i, m in enumerate(calendar.month_name):
-        month_mapping[m] = i
-    for i, m in enumerate(calendar.month_abbr):
-        month_mapping[m] = i
-
     # Try to extract the publication date
     pub_date_field = elem.find("./MedlineCitation/Article/Journal/JournalIssue/PubDate")
-    medline_date_field = elem.find(
-        "./MedlineCitation/Article/Journal/JournalIssue/PubDate/MedlineDate"
-    )
+    return get_journal_date_from_pub_date(pub_date_field, pmid)
+
 
+def get_journal_date_from_pub_date(
+    pub_date_field: Optional[etree.Element], pmid: Union[str, int]
+) -> DateTuple:
+    """
+    Args:
+        pub_date_field: the PubDate element of the article's journal issue
+        pmid: Pubmed ID of the article, only used for reporting errors
+    """
     assert pub_date_field is not None, "Couldn't find PubDate field for PMID=%s" % pmid
 
     medline_date_field = pub_date_field.find("./MedlineDate")
@@ -72,14 +101,10 @@ def get_journal_date_for_medline_file(elem: etree.Element, pmid: Union[str, int]
 
     pub_year, pub_month, pub_day = None, None, None
     if medline_date_field is not None:
-        regex_search = re.search(year_regex, medline_date_field.text)
+        regex_search = re.search(YEAR_REGEX, medline_date_field.text)
         if regex_search:
             pub_year = regex_search.group()
-        month_search = [
-            c
-            for c in (list(calendar.month_name) + list(calendar.month_abbr))
-            if c != "" and c in medline_date_field.text
-        ]
+        month_search = [c for c in MEDLINE_DATE_MONTHS if c in medline_date_field.text]
         if len(month_search) > 0:
             pub_month = month_search[0]
     else:
@@ -96,8 +121,8 @@ def get_journal_date_for_medline_file(elem: etree.Element, pmid: Union[str, int]
             pub_year = None
 
     if pub_month is not None:
-        if pub_month in month_mapping:
-            pub_month = month_mapping[pub_month]  # type: ignore
+        if pub_month in MONTH_MAPPING:
+            pub_month = MONTH_MAPPING[pub_month]  # type: ignore
         pub_month = int(pub_month)
     if pub_day is not None:
         pub_day = int(pub_day)
@@ -111,6 +136,14 @@ def get_pubmed_entry_date(elem: etree.Element, pmid) -> DateTuple:
         pmid: not used?
     """
     pub_date_fields = elem.findall("./PubmedData/History/PubMedPubDate")
+    return get_pubmed_entry_date_from_history(pub_date_fields)
+
+
+def get_pubmed_entry_date_from_history(pub_date_fields: List[etree.Element]) -> DateTuple:
+    """
+    Args:
+        pub_date_fields: the PubMedPubDate elements from the article's history
+    """
     all_dates = {}
     for pub_date_field in pub_date_fields:
         assert "PubStatus" in pub_date_field.attrib
@@ -152,6 +185,231 @@ pub_type_skips = {
 doi_regex = re.compile(r"^[0-9\.]+\/.+[^\/]$")
 
 
+# Dispatch table for the single walk of a PubmedArticle. Nested dicts follow the element tags down the
+# tree and each string names the list that the matching elements are collected into (in document order).
+MEDLINE_FIELD_PATHS = {
+    "MedlineCitation": {
+        "PMID": "pmid",
+        "Article": {
+            "Journal": {
+                "JournalIssue": {"PubDate": "pubDate"},
+                "Title": "journal",
+                "ISOAbbreviation": "journalISO",
+            },
+            "ArticleTitle": "title",
+            "Abstract": {"AbstractText": "abstract"},
+            "AuthorList": {"Author": "authors"},
+            "PublicationTypeList": {"PublicationType": "publicationTypes"},
+        },
+        "ChemicalList": {"Chemical": {"NameOfSubstance": "chemicals"}},
+        "MeshHeadingList": {"MeshHeading": "meshHeadings"},
+        "SupplMeshList": {"SupplMeshName": "supplementaryMesh"},
+    },
+    "PubmedData": {
+        "History": {"PubMedPubDate": "history"},
+        "ArticleIdList": {"ArticleId": "articleIds"},
+    },
+}
+
+
+def _medline_field_names(paths: dict) -> Iterable[str]:
+    for target in paths.values():
+        if isinstance(target, dict):
+            yield from _medline_field_names(target)
+        else:
+            yield target
+
+
+MEDLINE_FIELD_NAMES = list(_medline_field_names(MEDLINE_FIELD_PATHS))
+
+
+def _collect_medline_fields_from(
+    elem: etree.Element, paths: dict, fields: Dict[str, List[etree.Element]]
+) -> None:
+    for child in elem:
+        target = paths.get(child.tag)
+        if target is None:
+            continue
+        elif isinstance(target, dict):
+            _collect_medline_fields_from(child, target, fields)
+        else:
+            fields[target].append(child)
+
+
+def collect_medline_fields(elem: etree.Element) -> Dict[str, List[etree.Element]]:
+    """
+    Walks the children of a PubmedArticle once and gathers the elements for each of the fields in
+    MEDLINE_FIELD_PATHS (the same elements as a findall with each path)
+    """
+    fields: Dict[str, List[etree.Element]] = {name: [] for name in MEDLINE_FIELD_NAMES}
+    _collect_medline_fields_from(elem, MEDLINE_FIELD_PATHS, fields)
+    return fields
+
+
+def get_author_name(author_elem: etree.Element, pmid: str) -> str:
+    forename = author_elem.find("./ForeName")
+    lastname = author_elem.find("./LastName")
+    collectivename = author_elem.find("./CollectiveName")
+
+    if (
+        forename is not None
+        and lastname is not None
+        and forename.text is not None
+        and lastname.text is not None
+    ):
+        return "%s %s" % (forename.text, lastname.text)
+    elif lastname is not None and lastname.text is not None:
+        return lastname.text
+    elif forename is not None and forename.text is not None:
+        return forename.text
+    elif collectivename is not None and collectivename.text is not None:
+        return collectivename.text
+    else:
+        raise RuntimeError("Unable to find authors in Pubmed citation (PMID=%s)" % pmid)
+
+
+def get_mesh_heading(mesh_elem: etree.Element) -> str:
+    descriptor_elem = mesh_elem.find("./DescriptorName")
+    mesh_id = descriptor_elem.attrib["UI"]
+    major_topic_yn = descriptor_elem.attrib["MajorTopicYN"]
+    name = descriptor_elem.text
+
+    assert "|" not in mesh_id and "~" not in mesh_id, "Found delimiter in %s" % mesh_id
+    assert "|" not in major_topic_yn and "~" not in major_topic_yn, (
+        "Found delimiter in %s" % major_topic_yn
+    )
+    assert "|" not in name and "~" not in name, "Found delimiter in %s" % name
+
+    mesh_heading = "Descriptor|%s|%s|%s" % (mesh_id, major_topic_yn, name)
+
+    qualifier_elems = mesh_elem.findall("./QualifierName")
+    for qualifier_elem in qualifier_elems:
+        mesh_id = qualifier_elem.attrib["UI"]
+        major_topic_yn = qualifier_elem.attrib["MajorTopicYN"]
+        name = qualifier_elem.text
+
+        assert "|" not in mesh_id and "~" not in mesh_id, "Found delimiter in %s" % mesh_id
+        assert "|" not in major_topic_yn and "~" not in major_topic_yn, (
+            "Found delimiter in %s" % major_topic_yn
+        )
+        assert "|" not in name and "~" not in name, "Found delimiter in %s" % name
+
+        mesh_heading += "~Qualifier|%s|%s|%s" % (mesh_id, major_topic_yn, name)
+
+    return mesh_heading
+
+
+def process_medline_article(
+    elem: etree.Element, tag_handlers: Dict[str, TagHandlerFunction] = {}
+) -> MedlineArticle:
+    """
+    Args:
+        elem: a PubmedArticle element
+    """
+    fields = collect_medline_fields(elem)
+
+    # Try to extract the pmid_id
+    assert len(fields["pmid"]) > 0
+    pmid = fields["pmid"][0].text
+
+    journal_year, journal_month, journal_day = get_journal_date_from_pub_date(
+        fields["pubDate"][0] if fields["pubDate"] else None, pmid
+    )
+    entry_year, entry_month, entry_day = get_pubmed_entry_date_from_history(fields["history"])
+
+    jComparison = tuple(
+        9999 if d is None else d for d in [journal_year, journal_month, journal_day]
+    )
+    eComparison = tuple(9999 if d is None else d for d in [entry_year, entry_month, entry_day])
+    if (
+        jComparison < eComparison
+    ):  # The PubMed entry has been delayed for some reason so let's try the journal data
+        pub_year, pub_month, pub_day = journal_year, journal_month, journal_day
+    else:
+        pub_year, pub_month, pub_day = entry_year, entry_month, entry_day
+
+    # Extract the authors
+    authors = [get_author_name(author_elem, pmid) for author_elem in fields["authors"]]
+
+    chemicals = []
+    for chemical_elem in fields["chemicals"]:
+        chem_id = chemical_elem.attrib["UI"]
+        name = chemical_elem.text
+        # chemicals.append((chem_id,name))
+        chemicals.append("%s|%s" % (chem_id, name))
+    chemicals_txt = "\t".join(chemicals)
+
+    mesh_headings = [get_mesh_heading(mesh_elem) for mesh_elem in fields["meshHeadings"]]
+    mesh_headings_txt = "\t".join(mesh_headings)
+
+    supplementary_concepts = []
+    for concept_elem in fields["supplementaryMesh"]:
+        concept_id = concept_elem.attrib["UI"]
+        concept_type = concept_elem.attrib["Type"]
+        concept_name = concept_elem.text
+        # supplementary_concepts.append((concept_id,concept_type,concept_name))
+        supplementary_concepts.append("%s|%s|%s" % (concept_id, concept_type, concept_name))
+    supplementary_concepts_txt = "\t".join(supplementary_concepts)
+
+    doi_elems = [e for e in fields["articleIds"] if e.get("IdType") == "doi"]
+    dois = [
+        doi_elem.text for doi_elem in doi_elems if doi_elem.text and doi_regex.match(doi_elem.text)
+    ]
+
+    doi = None
+    if dois:
+        doi = dois[0]  # We'll just use DOI the first one provided
+
+    pmc_elems = [e for e in fields["articleIds"] if e.get("IdType") == "pmc"]
+    assert len(pmc_elems) <= 1, "Foud more than one PMCID with PMID: %s" % pmid
+    pmcid = None
+    if len(pmc_elems) == 1:
+        pmcid = pmc_elems[0].text
+
+    pub_type = [e.text for e in fields["publicationTypes"] if e.text not in pub_type_skips]
+    pub_type_txt = "|".join(pub_type)
+
+    # Extract the title of paper
+    title_text = extract_text_chunks(fields["title"], tag_handlers=tag_handlers)
+    title_text = [remove_brackets_from_titles(chunk.text) for chunk in title_text if chunk.text]
+    title_text = [t for t in title_text if len(t) > 0]
+    title_text = [html.unescape(t) for t in title_text]
+    title_text = [remove_brackets_without_words(t) for t in title_text]
+
+    # Extract the abstract from the paper
+    abstract_text = extract_text_chunks(fields["abstract"], tag_handlers=tag_handlers)
+    abstract_text = [chunk.text for chunk in abstract_text if len(chunk.text) > 0]
+    abstract_text = [html.unescape(t) for t in abstract_text]
+    abstract_text = [remove_brackets_without_words(t) for t in abstract_text]
+
+    journal_title, journal_iso_title = "", ""
+    assert len(fields["journal"]) <= 1, "Error with pmid=%s" % pmid
+    assert len(fields["journalISO"]) <= 1, "Error with pmid=%s" % pmid
+    if fields["journal"]:
+        journal_title = fields["journal"][0].text
+    if fields["journalISO"]:
+        journal_iso_title = fields["journalISO"][0].text
+
+    document = {}
+    document["pmid"] = pmid
+    document["pmcid"] = pmcid
+    document["doi"] = doi
+    document["pubYear"] = pub_year
+    document["pubMonth"] = pub_month
+    document["pubDay"] = pub_day
+    document["title"] = title_text
+    document["abstract"] = abstract_text
+    document["journal"] = journal_title
+    document["journalISO"] = journal_iso_title
+    document["authors"] = authors
+    document["chemicals"] = chemicals_txt
+    document["meshHeadings"] = mesh_headings_txt
+    document["supplementaryMesh"] = supplementary_concepts_txt
+    document["publicationTypes"] = pub_type_txt
+
+    return MedlineArticle(document)
+
+
 def process_medline_file(
     source: Union[str, TextIO], tag_handlers: Dict[str, TagHandlerFunction] = {}
 ) -> Iterable[MedlineArticle]:
@@ -159,196 +417,137 @@ def process_medline_file(
     Args:
         source: path to the MEDLINE xml file
     """
-    for event, elem in etree.iterparse(source, events=("start", "end", "start-ns", "end-ns")):
-        if event == "end" and elem.tag == "PubmedArticle":  # MedlineCitation'):
-            # Try to extract the pmid_id
-            pmid_field = elem.find("./MedlineCitation/PMID")
-            assert pmid_field is not None
-            pmid = pmid_field.text
-
-            journal_year, journal_month, journal_day = get_journal_date_for_medline_file(elem, pmid)
-            entry_year, entry_month, entry_day = get_pubmed_entry_date(elem, pmid)
-
-            jComparison = tuple(
-                9999 if d is None else d for d in [journal_year, journal_month, journal_day]
-            )
-            eComparison = tuple(
-                9999 if d is None else d for d in [entry_year, entry_month, entry_day]
-            )
-            if (
-                jComparison < eComparison
-            ):  # The PubMed entry has been delayed for some reason so let's try the journal data
-                pub_year, pub_month, pub_day = journal_year, journal_month, journal_day
-            else:
-                pub_year, pub_month, pub_day = entry_year, entry_month, entry_day
-
-            # Extract the authors
-            author_elems = elem.findall("./MedlineCitation/Article/AuthorList/Author")
-            authors = []
-            for author_elem in author_elems:
-                forename = author_elem.find("./ForeName")
-                lastname = author_elem.find("./LastName")
-                collectivename = author_elem.find("./CollectiveName")
-
-                name = None
-                if (
-                    forename is not None
-                    and lastname is not None
-                    and forename.text is not None
-                    and lastname.text is not None
-                ):
-                    name = "%s %s" % (forename.text, lastname.text)
-                elif lastname is not None and lastname.text is not None:
-                    name = lastname.text
-                elif forename is not None and forename.text is not None:
-                    name = forename.text
-                elif collectivename is not None and collectivename.text is not None:
-                    name = collectivename.text
-                else:
-                    raise RuntimeError("Unable to find authors in Pubmed citation (PMID=%s)" % pmid)
-                authors.append(name)
-
-            chemicals = []
-            chemical_elems = elem.findall("./MedlineCitation/ChemicalList/Chemical/NameOfSubstance")
-            for chemical_elem in chemical_elems:
-                chem_id = chemical_elem.attrib["UI"]
-                name = chemical_elem.text
-                # chemicals.append((chem_id,name))
-                chemicals.append("%s|%s" % (chem_id, name))
-            chemicals_txt = "\t".join(chemicals)
-
-            mesh_headings = []
-            mesh_elems = elem.findall("./MedlineCitation/MeshHeadingList/MeshHeading")
-            for mesh_elem in mesh_elems:
-                descriptor_elem = mesh_elem.find("./DescriptorName")
-                mesh_id = descriptor_elem.attrib["UI"]
-                major_topic_yn = descriptor_elem.attrib["MajorTopicYN"]
-                name = descriptor_elem.text
-
-                assert "|" not in mesh_id and "~" not in mesh_id, "Found delimiter in %s" % mesh_id
-                assert "|" not in major_topic_yn and "~" not in major_topic_yn, (
-                    "Found delimiter in %s" % major_topic_yn
-                )
-                assert "|" not in name and "~" not in name, "Found delimiter in %s" % name
-
-                mesh_heading = "Descriptor|%s|%s|%s" % (mesh_id, major_topic_yn, name)
-
-                qualifier_elems = mesh_elem.findall("./QualifierName")
-                for qualifier_elem in qualifier_elems:
-                    mesh_id = qualifier_elem.attrib["UI"]
-                    major_topic_yn = qualifier_elem.attrib["MajorTopicYN"]
-                    name = qualifier_elem.text
-
-                    assert "|" not in mesh_id and "~" not in mesh_id, (
-                        "Found delimiter in %s" % mesh_id
-                    )
-                    assert "|" not in major_topic_yn and "~" not in major_topic_yn, (
-                        "Found delimiter in %s" % major_topic_yn
-                    )
-                    assert "|" not in name and "~" not in name, "Found delimiter in %s" % name
-
-                    mesh_heading += "~Qualifier|%s|%s|%s" % (mesh_id, major_topic_yn, name)
-
-                mesh_headings.append(mesh_heading)
-            mesh_headings_txt = "\t".join(mesh_headings)
-
-            supplementary_concepts = []
-            concept_elems = elem.findall("./MedlineCitation/SupplMeshList/SupplMeshName")
-            for concept_elem in concept_elems:
-                concept_id = concept_elem.attrib["UI"]
-                concept_type = concept_elem.attrib["Type"]
-                concept_name = concept_elem.text
-                # supplementary_concepts.append((concept_id,concept_type,concept_name))
-                supplementary_concepts.append("%s|%s|%s" % (concept_id, concept_type, concept_name))
-            supplementary_concepts_txt = "\t".join(supplementary_concepts)
-
-            doi_elems = elem.findall("./PubmedData/ArticleIdList/ArticleId[@IdType='doi']")
-            dois = [
-                doi_elem.text
-                for doi_elem in doi_elems
-                if doi_elem.text and doi_regex.match(doi_elem.text)
-            ]
-
-            doi = None
-            if dois:
-                doi = dois[0]  # We'll just use DOI the first one provided
-
-            pmc_elems = elem.findall("./PubmedData/ArticleIdList/ArticleId[@IdType='pmc']")
-            assert len(pmc_elems) <= 1, "Foud more than one PMCID with PMID: %s" % pmid
-            pmcid = None
-            if len(pmc_elems) == 1:
-                pmcid = pmc_elems[0].text
-
-            pub_type_elems = elem.findall(
-                "./MedlineCitation/Article/PublicationTypeList/PublicationType"
-            )
-            pub_type = [e.text for e in pub_type_elems if e.text not in pub_type_skips]
-            pub_type_txt = "|".join(pub_type)
-
-            # Extract the title of paper
-            title = elem.findall("./MedlineCitation/Article/ArticleTitle")
-            title_text = extract_text_chunks(title, tag_handlers=tag_handlers)
-            title_text = [
-                remove_brackets_from_titles(chunk.text)
-                for chunk in title_text
-                if chunk.text
-            ]
-            title_text = [t for t in title_text if len(t) > 0]
-            title_text = [html.unescape(t) for t in title_text]
-            title_text = [remove_brackets_without_words(t) for t in title_text]
-
-            # Extract the abstract from the paper
-            abstract = elem.findall("./MedlineCitation/Article/Abstract/AbstractText")
-            abstract_text = extract_text_chunks(abstract, tag_handlers=tag_handlers)
-            abstract_text = [chunk.text for chunk in abstract_text if len(chunk.text) > 0]
-            abstract_text = [html.unescape(t) for t in abstract_text]
-            abstract_text = [remove_brackets_without_words(t) for t in abstract_text]
-
-            journal_title_fields = elem.findall("./MedlineCitation/Article/Journal/Title")
-            journal_title_iso_fields = elem.findall(
-                "./MedlineCitation/Article/Journal/ISOAbbreviation"
-            )
-
-            journal_title, journal_iso_title = "", ""
-            assert len(journal_title_fields) <= 1, "Error with pmid=%s" % pmid
-            assert len(journal_title_iso_fields) <= 1, "Error with pmid=%s" % pmid
-            if journal_title_fields:
-                journal_title = journal_title_fields[0].text
-            if journal_title_iso_fields:
-                journal_iso_title = journal_title_iso_fields[0].text
-
-            document = {}
-            document["pmid"] = pmid
-            document["pmcid"] = pmcid
-            document["doi"] = doi
-            document["pubYear"] = pub_year
-            document["pubMonth"] = pub_month
-            document["pubDay"] = pub_day
-            document["title"] = title_text
-            document["abstract"] = abstract_text
-            document["journal"] = journal_title
-            document["journalISO"] = journal_iso_title
-            document["authors"] = authors
-            document["chemicals"] = chemicals_txt
-            document["meshHeadings"] = mesh_headings_txt
-            document["supplementaryMesh"] = supplementary_concepts_txt
-            document["publicationTypes"] = pub_type_txt
-
-            yield MedlineArticle(document)
-
-            # Important: clear the current element from memory to keep memory usage low
-            elem.clear()
+    # Each article is cleared and detached from the root once it has been processed to keep memory usage flat
+    for elem in iterparse_detached(source, tag="PubmedArticle"):
+        yield process_medline_article(elem, tag_handlers=tag_handlers)
+
+
+def split_medline_file(
+    source: Union[BinaryIO, TextIO], piece_size: int = MEDLINE_PIECE_SIZE
+) -> Iterator[bytes]:
+    """
+    Read a MEDLINE xml file and split it at PubmedArticle boundaries into pieces of about piece_size bytes, yielding
+    each one as soon as it has been read. Each piece is a complete XML document. It has the content of the file before
+    the first PubmedArticle (the XML declaration and start of the PubmedArticleSet), a contiguous run of PubmedArticle
+    elements and the end tag of the PubmedArticleSet. So the pieces parse to the same articles, in the same order, as
+    the whole file. Anything after the last PubmedArticle (e.g. DeleteCitation elements) is left out.
+
+    The file is split on the bytes of the tags, so its encoding must be ASCII-compatible (e.g. UTF-8, as PubMed uses).
+    """
+    encoding = None
+
+    def read_chunk():
+        nonlocal encoding
+        chunk = source.read(MEDLINE_READ_SIZE)
+        if isinstance(chunk, bytes):
+            return chunk
+        if encoding is None:
+            # a text file has already been decoded so it is encoded again with the encoding its XML declaration
+            # gives, which the header of each piece keeps
+            match = XML_DECLARATION_ENCODING_REGEX.match(chunk)
+            encoding = match.group(1) if match else "utf-8"
+        return chunk.encode(encoding)
+
+    buffer, match = b"", None
+    while match is None:
+        chunk = read_chunk()
+        if not chunk:
+            # no articles, so the file is parsed as it is
+            if buffer:
+                yield buffer
+            return
+        buffer += chunk
+        match = PUBMED_ARTICLE_START_REGEX.search(buffer)
+
+    header = buffer[: match.start()]
+    root_end_tag = b"</%s>" % XML_START_TAG_REGEX.findall(header)[-1]
+    buffer = buffer[match.start() :]
+
+    while True:
+        # cut after the first article that ends beyond the piece size
+        while len(buffer) >= piece_size:
+            end = buffer.find(PUBMED_ARTICLE_END_TAG, piece_size - len(PUBMED_ARTICLE_END_TAG))
+            if end == -1:
+                break
+            end += len(PUBMED_ARTICLE_END_TAG)
+            yield header + buffer[:end] + root_end_tag
+            buffer = buffer[end:]
+
+        chunk = read_chunk()
+        if not chunk:
+            break
+        buffer += chunk
+
+    end = buffer.rfind(PUBMED_ARTICLE_END_TAG)
+    if end != -1:
+        yield header + buffer[: end + len(PUBMED_ARTICLE_END_TAG)] + root_end_tag
+
+
+def _convert_medline_piece(
+    data: bytes, xml_backend: str, kwargs: dict
+) -> List[bioc.BioCDocument]:
+    # the backend is set again as worker processes do not always inherit it
+    set_xml_backend(xml_backend)
+    return list(pubmedxml2bioc(io.BytesIO(data), **kwargs))
+
+
+def _check_picklable(kwargs: dict) -> None:
+    # the arguments are sent to the worker processes, which would otherwise only fail once the first piece is sent
+    try:
+        pickle.dumps(kwargs)
+    except (pickle.PicklingError, AttributeError, TypeError) as e:
+        raise ValueError(
+            "tag_handlers must be picklable (e.g. module-level functions rather than lambdas or closures) "
+            "to parse with more than one worker: %s" % e
+        ) from e
+
+
+def _pubmedxml2bioc_in_parallel(
+    source: Union[str, BinaryIO, TextIO], workers: int, **kwargs
+) -> Iterable[bioc.BioCDocument]:
+    f = source if hasattr(source, "read") else open(source, "rb")
+    _check_picklable(kwargs)
+    xml_backend = get_xml_backend()
+    pending = collections.deque()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            try:
+                for piece in split_medline_file(f):
+                    pending.append(executor.submit(_convert_medline_piece, piece, xml_backend, kwargs))
+                    if len(pending) >= workers * PENDING_PIECES_PER_WORKER:
+                        yield from pending.popleft().result()
+
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+    finally:
+        if f is not source:
+            f.close()
 
 
 def pubmedxml2bioc(
     source: Union[str, TextIO],
     tag_handlers: Dict[str, TagHandlerFunction] = {},
     trim_sentences=True,
+    workers: int = 1,
 ) -> Iterable[bioc.BioCDocument]:
     """
     Args:
-        source: path to the MEDLINE xml file
+        source: path to the MEDLINE xml file or a file handle for it
+        workers: number of processes to parse the file with. With more than one, the file is read in pieces of
+            about MEDLINE_PIECE_SIZE bytes (of whole articles) which are parsed in parallel, with a bounded number of
+            them in memory at a time. The documents are the same, and in the same order, as when parsing it in this
+            process. The tag_handlers are sent to the worker processes so they must be picklable (e.g. module-level
+            functions), otherwise a ValueError is raised.
     """
+    if workers > 1:
+        yield from _pubmedxml2bioc_in_parallel(
+            source, workers, tag_handlers=tag_handlers, trim_sentences=trim_sentences
+        )
+        return
+
     for pm_doc in process_medline_file(source, tag_handlers=tag_handlers):
         bioc_doc = bioc.BioCDocument()
         bioc_doc.id = pm_doc["pmid"]
@@ -1,6 +1,6 @@
 import re
 import unicodedata
-import uuid
+from collections import deque
 import xml.etree.cElementTree as etree
 from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
@@ -34,17 +34,23 @@ SEPARATION_LIST = [
     "label",
 ]
 
+# Placeholders left in the passage text for in-text citations until they are converted to annotations
+ANNOTATION_MARKER_PATTERN = r'ANN_\d{8}'
+
 TABLE_DELIMITER = '\t'
 TABLE_DELIMITED_TAGS = {'tr', 'th', 'td'}
 
 
 class TextChunk:
+    # an article creates a chunk for the head and tail text of every XML element so keep them small
+    __slots__ = ('text', 'xml_node', 'xml_path', 'non_separating', 'is_tail', 'is_annotation')
+
     text: str
     xml_node: str
     xml_path: str
-    non_separating: bool = False
-    is_tail: bool = False
-    is_annotation: bool = False
+    non_separating: bool
+    is_tail: bool
+    is_annotation: bool
 
     def __init__(
         self,
@@ -86,18 +92,36 @@ class TextChunk:
 TagHandlerFunction = Callable[[etree.Element, Dict[str, Callable]], List[TextChunk]]
 
 
+# The rest of a run of non-word (and non-tab) characters from its first opening bracket. Nothing
+# before that bracket can be removed, and each match is found without backtracking
+BRACKET_RUN_REGEX = re.compile(r"[(\[{][^\w\t]*")
+
+
+def _remove_brackets_from_run(match: "re.Match") -> str:
+    run = match.group()
+    for opening, closing in (("(", ")"), ("[", "]"), ("{", "}")):
+        start = run.find(opening)
+        if start != -1:
+            end = run.rfind(closing)
+            if end > start:
+                run = run[:start] + run[end + 1 :]
+    return run
+
+
 # Remove empty brackets (that could happen if the contents have been removed already
 # e.g. for citation ( [] [] ) -> ( ) -> nothing
 def remove_brackets_without_words(text: str) -> str:
-    changed = True
-    previous_text = text
-    while changed:
-        fixed = re.sub(r"\([^\w\t]*\)", "", previous_text)
-        fixed = re.sub(r"\[[^\w\t]*\]", "", fixed)
-        fixed = re.sub(r"\{[^\w\t]*\}", "", fixed)
-        changed = bool(previous_text != fixed)
-        previous_text = fixed
-    return fixed
+    """
+    Removes brackets that only contain non-word characters, repeating until there are none left.
+
+    A removal never crosses a word character or tab, so each run of other characters can be handled
+    on its own (from its first opening bracket). Within a run, the repeated substitutions remove
+    everything from the first "(" to the last ")" (if there is one after it), then the same for "[ ]"
+    and "{ }", after which nothing more can match. This gives the same result in a single pass.
+    """
+    if ")" not in text and "]" not in text and "}" not in text:
+        return text
+    return BRACKET_RUN_REGEX.sub(_remove_brackets_from_run, text)
 
 
 # Some articles have titles like "[A study of ...]."
@@ -109,35 +133,68 @@ def remove_brackets_from_titles(title_text: str) -> str:
     return title_text
 
 
+class _CleanupCharacterMap(dict):
+    """
+    str.translate table that drops control-like characters (unicode category C, apart from the table
+    delimiter) and turns separators (category Z) into plain spaces. Entries are filled in the first time
+    each character is seen so that later lookups don't need unicodedata
+    """
+
+    def __missing__(self, codepoint: int):
+        ch = chr(codepoint)
+        category = unicodedata.category(ch)[0]
+        if category == "C" and ch != TABLE_DELIMITER:
+            value = None
+        elif category == "Z":
+            value = " "
+        else:
+            value = codepoint
+        self[codepoint] = value
+        return value
+
+
+CLEANUP_CHARACTER_MAP = _CleanupCharacterMap()
+
+REPEATED_COMMAS_REGEX = re.compile(r",([^\S\t]*,)*")
+COMMAS_BEFORE_PERIOD_REGEX = re.compile(r"(,[^\S\t]*)*\.")
+CITATION_SPACES_REGEX = re.compile(r'\([^\S\t]*([^)]*[^\s)])[^\S\t]*\)')
+SPACES_BEFORE_PERIOD_REGEX = re.compile(r'[^\S\t]+\.(\s|$)')
+SPACES_AROUND_COMMA_REGEX = re.compile(r'[^\S\t]*([,;])[^\S\t]+')
+# leading and trailing non-tab whitespace (at either end of the text or of a table cell)
+TRIM_SPACES_REGEX = re.compile(r'(?:^|(?<=\t))[^\S\t]+|[^\S\t]+(?=\t|$)')
+MULTIPLE_SPACES_REGEX = re.compile(r'[^\S\t][^\S\t]+')
+
+
 def cleanup_text(text: str) -> str:
     """
     Clean up non-tab extra whitespace, remove control characters and extra leftover brackets etc
     """
-    # Remove some "control-like" characters (left/right separator)
-    text = text.replace(u"\u2028", " ").replace(u"\u2029", " ")
-    text = "".join(ch for ch in text if unicodedata.category(ch)[0] != "C" or ch == TABLE_DELIMITER)
-    text = "".join(ch if unicodedata.category(ch)[0] != "Z" else " " for ch in text)
+    # Remove "control-like" characters and normalize separators (incl. line/paragraph separators) to spaces
+    text = text.translate(CLEANUP_CHARACTER_MAP)
 
     # Remove repeated commands and commas next to periods
-    text = re.sub(r",([^\S\t]*,)*", ",", text)
-    text = re.sub(r"(,[^\S\t]*)*\.", ".", text)
+    if "," in text:
+        text = REPEATED_COMMAS_REGEX.sub(",", text)
+        text = COMMAS_BEFORE_PERIOD_REGEX.sub(".", text)
     text = remove_brackets_without_words(text)
 
     # remove extra spaces from in-text figute/table citations
-    text = re.sub(r'\([^\S\t]*([^)]*[^\s)])[^\S\t]*\)', r'(\1)', text)
+    if "(" in text:
+        text = CITATION_SPACES_REGEX.sub(r'(\1)', text)
 
     # remove trailing spaces before periods
-    text = re.sub(r'[^\S\t]+\.(\s|$)', r'.\1', text)
+    if "." in text:
+        text = SPACES_BEFORE_PERIOD_REGEX.sub(r'.\1', text)
 
     # remove extra spaces around commas/semi-colons
-    text = re.sub(r'[^\S\t]*([,;])[^\S\t]+', r'\1 ', text)
+    if "," in text or ";" in text:
+        text = SPACES_AROUND_COMMA_REGEX.sub(r'\1 ', text)
 
     # trim leading and trailing non tab whitespace
-    text = re.sub(r'(^|\t)([^\S\t]+)', r'\1', text)
-    text = re.sub(r'([^\S\t]+)(\t|$)', r'\2', text)
+    text = TRIM_SPACES_REGEX.sub('', text)
 
     # trim multiple non-tab spaces
-    text = re.sub(r'[^\S\t][^\S\t]+', ' ', text)
+    text = MULTIPLE_SPACES_REGEX.sub(' ', text)
 
     return text
 
@@ -154,9 +211,9 @@ def build_xml_parent_mapping(
     Build a map of each XML node element to its respective parent
     """
     mapping = {}
-    queue = root_nodes
+    queue = deque(root_nodes)
     while queue:
-        current_node = queue.pop(0)
+        current_node = queue.popleft()
         for child in current_node:
             queue.append(child)
             mapping[child] = current_node
@@ -201,7 +258,9 @@ def get_tag_path(mapping: Dict[etree.Element, etree.Element], node: etree.Elemen
 
 
 def tag_handler(
-    elem: etree.Element, custom_handlers: Dict[str, TagHandlerFunction] = {}
+    elem: etree.Element,
+    custom_handlers: Dict[str, TagHandlerFunction] = {},
+    parent_path: Optional[str] = None,
 ) -> List[TextChunk]:
     """
     Parses an XML node element into a series of text chunks
@@ -209,53 +268,75 @@ def tag_handler(
     Args:
         elem: the element to be parsed
         custom_handlers: overloads the default behaviour for a given tag type. Defaults to {}.
+        parent_path: the XML path of the parent of this element ('' for a top-level element). If given, the
+            chunks are labelled with their XML path as they are created. Defaults to None.
     """
+    chunks: List[TextChunk] = []
+    _append_tag_chunks(elem, custom_handlers, parent_path, chunks)
+    return chunks
+
+
+def _append_tag_chunks(
+    elem: etree.Element,
+    custom_handlers: Dict[str, TagHandlerFunction],
+    parent_path: Optional[str],
+    chunks: List[TextChunk],
+) -> None:
+    """
+    Does the work of tag_handler, appending the chunks for the element (and its children) to a shared list
+    """
+    if parent_path is None:
+        elem_path = None
+    else:
+        elem_path = f'{parent_path}/{elem.tag}' if parent_path else elem.tag
+
     # custom handlers override the default behaviour for any tag
     if elem.tag in custom_handlers:
         try:
-            return custom_handlers[elem.tag](elem, custom_handlers=custom_handlers)
+            custom_chunks = custom_handlers[elem.tag](elem, custom_handlers=custom_handlers)
         except NotImplementedError:
             pass
+        else:
+            for chunk in custom_chunks:
+                if chunk.xml_path is None and chunk.xml_node is elem:
+                    chunk.xml_path = elem_path
+            chunks.extend(custom_chunks)
+            return
     # Extract any raw text directly in XML element or just after
     head = (elem.text or "").strip()
     tail = (elem.tail or "").strip()
 
-    # Then get the text from all child XML nodes recursively
-    child_passages = []
-
-    for child in merge_adjacent_xref_siblings(elem):
-        child_passages.extend(tag_handler(child, custom_handlers=custom_handlers))
-
+    # The contents of ignored elements are dropped so their children don't need to be processed
     if elem.tag == 'xref' and 'xref' in IGNORE_LIST:
         # keep xref tags that refer to internal elements like tables and figures
         if elem.attrib.get('ref-type', '') == 'bibr':
+            chunks.append(TextChunk(head, elem, elem_path, is_annotation=True))
             if tail:
-                return [
-                    TextChunk(head, elem, is_annotation=True),
-                    TextChunk(tail, elem, is_tail=True),
-                ]
-            else:
-                return [TextChunk(head, elem, is_annotation=True)]
+                chunks.append(TextChunk(tail, elem, elem_path, is_tail=True))
+            return
     elif elem.tag in IGNORE_LIST:
-        if not all(
-            [
-                elem.tag == 'ext-link',
-                head,
-                re.search(r'(supp|suppl|supplementary)?\s*(table|figure)\s*s?\d+', head.lower()),
-            ]
+        if not (
+            elem.tag == 'ext-link'
+            and head
+            and re.search(r'(supp|suppl|supplementary)?\s*(table|figure)\s*s?\d+', head.lower())
         ):
             # Check if the tag should be ignored (so don't use main contents)
-            return [
-                TextChunk(tail, elem, non_separating=True, is_tail=True),
-            ]
+            chunks.append(TextChunk(tail, elem, elem_path, non_separating=True, is_tail=True))
+            return
 
-    return [TextChunk(head, elem)] + child_passages + [TextChunk(tail, elem, is_tail=True)]
+    chunks.append(TextChunk(head, elem, elem_path))
+
+    # Then get the text from all child XML nodes recursively
+    for child in merge_adjacent_xref_siblings(elem):
+        _append_tag_chunks(child, custom_handlers, elem_path, chunks)
+
+    chunks.append(TextChunk(tail, elem, elem_path, is_tail=True))
 
 
 def strip_annotation_markers(
     text: str,
     annotations_map: Dict[str, str],
-    marker_pattern=r'ANN_[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}',
+    marker_pattern=ANNOTATION_MARKER_PATTERN,
 ) -> Tuple[str, List[bioc.BioCAnnotation]]:
     """
     Given a set of annotations, remove any which are found in the current text and return
@@ -268,16 +349,17 @@ def strip_annotation_markers(
         return (text, [])
 
     transformed_annotations: List[bioc.BioCAnnotation] = []
-    transformed_text = text
+    transformed_text: List[str] = []
 
     pattern = (
         r'([^\S\t]*)([\(\[\{][^\S\t]*)?(' + marker_pattern + r')([^\S\t]*[\)\]\}])?([^\S\t]*)(\.)?'
     )
 
-    matched_annotations: List[Tuple[int, int, str]] = []
-
+    # the matches are in order and don't overlap, so the transformed text is built up as they are found
+    previous_end = 0
+    offset = 0
     for match in re.finditer(pattern, text):
-        ws_start, br_open, marker, br_close, ws_end, period = [match.group(i) for i in range(1, 7)]
+        ws_start, br_open, marker, br_close, ws_end, period = match.groups()
 
         if marker not in annotations_map:
             continue
@@ -302,21 +384,15 @@ def strip_annotation_markers(
             # remove trailing ws and leading ws
             end_offset += len(period)
 
-        matched_annotations.append(
-            (
-                match.start() + start_offset,
-                match.end() - end_offset,
-                marker,
-            )
-        )
+        start = match.start() + start_offset
+        end = match.end() - end_offset
 
-    offset = 0
-    for start, end, marker in sorted(matched_annotations):
         ann = bioc.BioCAnnotation()
         ann.id = marker
         ann.infons['citation_text'] = annotations_map[marker]
         ann.infons['type'] = 'citation'
-        transformed_text = transformed_text[: start - offset] + transformed_text[end - offset :]
+        transformed_text.append(text[previous_end:start])
+        previous_end = end
 
         # since the token place-holder is removed, must be start - 1 (and previous offset) for the new position
         annotation_offset = max(start - offset - 1, 0)  # if annotation is the first thing in a passage it may have a -1 start, should reset to 0
@@ -324,7 +400,9 @@ def strip_annotation_markers(
 
         offset += end - start
         transformed_annotations.append(ann)
-    return transformed_text, transformed_annotations
+
+    transformed_text.append(text[previous_end:])
+    return ''.join(transformed_text), transformed_annotations
 
 
 def merge_text_chunks(chunk_list, annotations_map=None) -> TextChunk:
@@ -344,14 +422,12 @@ def merge_text_chunks(chunk_list, annotations_map=None) -> TextChunk:
             previous_chunk = chunk_list[i - 1]
             join_char = ' '
             tags = {previous_chunk.tag, current_chunk.tag}
-            if any(
-                [
-                    previous_chunk.is_annotation,
-                    current_chunk.is_annotation,
-                    previous_chunk.non_separating,
-                    current_chunk.non_separating,
-                    current_chunk.is_tail and not (current_chunk.text or previous_chunk.text),
-                ]
+            if (
+                previous_chunk.is_annotation
+                or current_chunk.is_annotation
+                or previous_chunk.non_separating
+                or current_chunk.non_separating
+                or (current_chunk.is_tail and not (current_chunk.text or previous_chunk.text))
             ):
                 join_char = ''
             elif len(tags) == 1 and tags & TABLE_DELIMITED_TAGS and not current_chunk.is_tail:
@@ -361,7 +437,8 @@ def merge_text_chunks(chunk_list, annotations_map=None) -> TextChunk:
 
         current_text = cleanup_text(current_chunk.text)
         if current_chunk.is_annotation:
-            ann_id = f'ANN_{uuid.uuid4()}'
+            # numbered in order within the document so that conversions are reproducible
+            ann_id = f'ANN_{len(annotations_map):08d}'
             annotations_map[ann_id] = current_text
             merge.append(ann_id)
         else:
@@ -372,12 +449,14 @@ def merge_text_chunks(chunk_list, annotations_map=None) -> TextChunk:
     text = text.replace('\n', '')
     text = cleanup_text(text)
 
-    first_non_tail_node = chunk_list[0].xml_node
+    first_non_tail_chunk = chunk_list[0]
     for chunk in chunk_list:
         if not chunk.is_tail and not chunk.is_annotation:
-            first_non_tail_node = chunk.xml_node
+            first_non_tail_chunk = chunk
             break
-    return TextChunk(text, xml_node=first_non_tail_node)
+    return TextChunk(
+        text, xml_node=first_non_tail_chunk.xml_node, xml_path=first_non_tail_chunk.xml_path
+    )
 
 
 def extract_text_chunks(
@@ -399,9 +478,9 @@ def extract_text_chunks(
     """
     if not isinstance(element_list, list):
         element_list = [element_list]
-    raw_text_chunks = []
+    raw_text_chunks: List[TextChunk] = []
     for elem in element_list:
-        raw_text_chunks.extend(tag_handler(elem, tag_handlers))
+        _append_tag_chunks(elem, tag_handlers, '', raw_text_chunks)
     chunks_to_be_merged = [[]]
 
     for chunk in raw_text_chunks:
@@ -413,9 +492,12 @@ def extract_text_chunks(
 
     merged_chunks = [merge_text_chunks(m, annotations_map) for m in chunks_to_be_merged if m]
 
-    # assign the XML path to each passage
-    mapping = build_xml_parent_mapping(element_list)
+    # the XML paths are assigned as the chunks are created, but custom tag handlers may not provide them
+    mapping = None
     for chunk in merged_chunks:
-        chunk.xml_path = get_tag_path(mapping, chunk.xml_node)
+        if chunk.xml_path is None:
+            if mapping is None:
+                mapping = build_xml_parent_mapping(element_list)
+            chunk.xml_path = get_tag_path(mapping, chunk.xml_node)
 
     return [c for c in merged_chunks if c.text]
@@ -0,0 +1,180 @@
+"""
+Pluggable XML parsing backend. The standard library parser is used by default and lxml can be chosen
+instead if it is installed. lxml parses faster (and filters the elements by tag while parsing) but
+accessing its elements from Python is slower, so it is not always faster overall. Both give the same
+elements (and so the same output) to the converters.
+"""
+import os
+import xml.etree.cElementTree as stdlib_etree
+from typing import Iterator, Optional, Sequence, TextIO, Tuple, Union
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+XML_BACKENDS = ['lxml', 'stdlib']
+
+# Errors raised by either backend for a malformed XML file
+XML_PARSE_ERRORS = (stdlib_etree.ParseError,) + (
+    (lxml_etree.XMLSyntaxError,) if lxml_etree is not None else ()
+)
+
+_xml_backend = 'stdlib'
+
+
+def get_xml_backend() -> str:
+    return _xml_backend
+
+
+def set_xml_backend(name: str) -> None:
+    """
+    Args:
+        name: one of XML_BACKENDS ('lxml' requires the lxml package to be installed)
+    """
+    global _xml_backend
+    _check_xml_backend(name)
+    _xml_backend = name
+
+
+def _check_xml_backend(name: str) -> None:
+    if name not in XML_BACKENDS:
+        raise ValueError(f'Unknown XML backend: {name} (expected one of {XML_BACKENDS})')
+    if name == 'lxml' and lxml_etree is None:
+        raise ImportError('lxml must be installed to use the lxml XML backend')
+
+
+class _EncodedReader:
+    """
+    Wraps a text file so that lxml (which only reads bytes) can parse it
+    """
+
+    def __init__(self, source: TextIO):
+        self.source = source
+
+    def read(self, size: int = -1) -> bytes:
+        return self.source.read(size).encode('utf-8')
+
+
+def iterparse(
+    source: Union[str, TextIO],
+    events: Sequence[str] = ('end',),
+    tag: Optional[str] = None,
+    backend: Optional[str] = None,
+) -> Iterator[Tuple[str, stdlib_etree.Element]]:
+    """
+    Incrementally parse an XML file with the current backend, yielding (event, element) as with etree.iterparse
+
+    Args:
+        source: path to the XML file or a file object
+        events: the events to report ('start' and/or 'end')
+        tag: only report the events for elements with this tag. Defaults to None (all elements).
+        backend: the backend to parse with, for callers that need a particular type of element. Defaults
+            to None (the current backend).
+    """
+    backend = backend or _xml_backend
+    _check_xml_backend(backend)
+
+    if backend == 'lxml':
+        kwargs = {}
+        if not isinstance(source, str) and isinstance(source.read(0), str):
+            # a text file has already been decoded so the document's declared encoding no longer applies
+            source = _EncodedReader(source)
+            kwargs['encoding'] = 'utf-8'
+
+        # comments and processing instructions are dropped as the standard library parser does
+        yield from lxml_etree.iterparse(
+            source,
+            events=events,
+            tag=tag,
+            remove_comments=True,
+            remove_pis=True,
+            huge_tree=True,
+            **kwargs,
+        )
+    elif tag is None:
+        yield from stdlib_etree.iterparse(source, events=events)
+    else:
+        for event, elem in stdlib_etree.iterparse(source, events=events):
+            if elem.tag == tag:
+                yield event, elem
+
+
+def _detach(parent: stdlib_etree.Element, elem: stdlib_etree.Element) -> bool:
+    """
+    Remove an element (and any siblings before it, which are already complete) from its parent
+    """
+    for i, child in enumerate(parent):
+        if child is elem:
+            del parent[: i + 1]
+            return True
+    return False
+
+
+def iterparse_detached(
+    source: Union[str, TextIO], tag: str, backend: Optional[str] = None
+) -> Iterator[stdlib_etree.Element]:
+    """
+    Incrementally parse an XML file with the current backend, yielding each complete element with the
+    given tag. When the next element is requested, the previous one is cleared and detached from the
+    tree so that memory use does not grow with the number of elements in the file. Elements that are
+    not children of the root are only detached with lxml (the standard library parser does not track
+    parents), otherwise they are just cleared.
+
+    Args:
+        source: path to the XML file or a file object
+        tag: the tag of the elements to yield
+        backend: the backend to parse with, for callers that need a particular type of element. Defaults
+            to None (the current backend).
+    """
+    backend = backend or _xml_backend
+    _check_xml_backend(backend)
+
+    if backend == 'lxml':
+        for _, elem in iterparse(source, events=('end',), tag=tag, backend=backend):
+            parent = elem.getparent()
+            yield elem
+            elem.clear()
+            if parent is not None:
+                _detach(parent, elem)
+    else:
+        yield from _stdlib_iterparse_detached(source, tag)
+
+
+# The standard library parser is fed in chunks of this size
+STDLIB_READ_SIZE = 64 * 1024
+
+
+def _stdlib_iterparse_detached(source: Union[str, TextIO], tag: str) -> Iterator[stdlib_etree.Element]:
+    # The root is needed to detach its children, but it is only reported by a start event, so start
+    # events are subscribed to and all but the first one (the root's) are ignored
+    f = source if hasattr(source, 'read') else open(source, 'rb')
+    try:
+        parser = stdlib_etree.XMLPullParser(events=('start', 'end'))
+        root = None
+        data = b''
+        while True:
+            for event, elem in parser.read_events():
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                elif elem.tag == tag:
+                    yield elem
+                    elem.clear()
+                    if elem is not root:
+                        _detach(root, elem)
+            if data is None:
+                break
+            data = f.read(STDLIB_READ_SIZE)
+            if data:
+                parser.feed(data)
+            else:
+                parser.close()
+                data = None
+    finally:
+        if f is not source:
+            f.close()
+
+
+if os.environ.get('BIOCONVERTERS_XML_BACKEND'):
+    set_xml_backend(os.environ['BIOCONVERTERS_XML_BACKEND'])
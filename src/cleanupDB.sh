@@ -10,5 +10,5 @@ do
 done
 
 echo "Deleting PMC archives"
-rm -f pmc_archives/*.gz
+rm -f pmc_archives/*.gz pmc_archives/*.gz.gzidx pmc_archives/*.gz.members.json
 
@@ -11,6 +11,7 @@ if __name__ == '__main__':
 	parser.add_argument('--iFormat',type=str,required=True,help="Format of input corpus. Options: %s" % "/".join(acceptedInFormats))
 	parser.add_argument('--o',type=str,required=True,help="Where to store resulting converted docs")
 	parser.add_argument('--oFormat',type=str,required=True,help="Format for output corpus. Options: %s" % "/".join(acceptedOutFormats))
+	parser.add_argument('--workers',type=int,default=1,help="Number of processes to convert the documents with (default: 1)")
 
 	args = parser.parse_args()
 
@@ -23,6 +24,6 @@ if __name__ == '__main__':
 	inFiles = args.i.split(',')
 	
 	print("Converting %d files to %s" % (len(inFiles),args.o))
-	convert(inFiles,inFormat,args.o,outFormat)
+	convert(inFiles,inFormat,args.o,outFormat,workers=args.workers)
 	print("Output to %s complete" % args.o)
 
@@ -1,73 +1,165 @@
 import argparse
 import os
+import io
 import json
-import tarfile
+import collections
+from concurrent.futures import ProcessPoolExecutor
 
 from bioconverters import pmcxml2bioc
 import bioc
-import io
 
-import tempfile
-from dbutils import saveDocumentsToDatabase
-import pathlib
+from dbutils import DocumentDatabaseWriter, loadDictionary
+from pmcutils import readArchiveMembers
+from pmidutils import savePMIDs
 from tqdm import tqdm
 
+# How many files per worker process can be waiting to be converted (or written out) at any time
+PENDING_FILES_PER_WORKER = 4
+
+def convertMemberData(data):
+	return list(pmcxml2bioc(io.BytesIO(data)))
+
+def convertMembers(members, workers=1):
+	"""
+	Yields (name, documents) for each (name, file) from readArchiveMembers, in the same order. With more than one
+	worker, the files are read in this process and converted in a pool of worker processes. Only a limited number
+	of files are held waiting for their turn to be written out, so memory use does not grow with the archive.
+	"""
+	if workers <= 1:
+		for member_name, member_file in members:
+			yield member_name, pmcxml2bioc(member_file)
+		return
+
+	pending = collections.deque()
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		try:
+			for member_name, member_file in members:
+				pending.append( (member_name, executor.submit(convertMemberData, member_file.read())) )
+				if len(pending) >= workers * PENDING_FILES_PER_WORKER:
+					member_name, future = pending.popleft()
+					yield member_name, future.result()
+
+			while pending:
+				member_name, future = pending.popleft()
+				yield member_name, future.result()
+		finally:
+			for _, future in pending:
+				future.cancel()
+
+def convertArchive(source, blocks, out_files, db, pmids_files=None, verbose=False, workers=1, zdict=None):
+	"""
+	Streams through a PMC archive once (or reads directly from it if it has an index) and converts the files
+	for every requested block, sending each one to the output for its block. The members of a block are
+	contiguous in the archive, so each block's output is finished (and closed) as soon as its last file has been found.
+	With more than one worker, the files are converted in parallel but still written out in archive order.
+	"""
+	member_to_block = {}
+	for block_name, block in blocks.items():
+		for member_name in block['group']:
+			member_to_block[member_name] = block_name
+
+	remaining = { block_name:set(block['group']) for block_name,block in blocks.items() }
+	expected_count = len(member_to_block)
+	found_count = 0
+
+	writers = {}
+	block_pmids = { block_name:[] for block_name in blocks }
+
+	def finishBlock(block_name):
+		writers.pop(block_name).close()
+		if pmids_files:
+			savePMIDs(pmids_files[block_name], block_pmids[block_name])
+
+		print("Saved %d documents to %s" % (len(blocks[block_name]['group']), out_files[block_name]))
+
+	members = readArchiveMembers(source, member_to_block.keys())
+	converted = convertMembers(members, workers)
+
+	iterator = tqdm(converted) if verbose else converted
+
+	for member_name, bioc_docs in iterator:
+		block_name = member_to_block[member_name]
+
+		if not block_name in writers:
+			if db:
+				writers[block_name] = DocumentDatabaseWriter(out_files[block_name], is_fulltext=True, zdict=zdict)
+			else:
+				writers[block_name] = bioc.biocxml.BioCXMLDocumentWriter(out_files[block_name])
+
+		found_count += 1
+		if verbose:
+			iterator.set_description(f"Found {member_name}: {found_count}/{expected_count}")
+
+		for bioc_doc in bioc_docs:
+			writers[block_name].write_document(bioc_doc)
+			block_pmids[block_name].append(bioc_doc.infons.get('pmid',''))
+
+		remaining[block_name].remove(member_name)
+		if len(remaining[block_name]) == 0:
+			finishBlock(block_name)
+
+		if found_count == expected_count:
+			if verbose:
+				print(f"Extracted all {found_count} files from archives.")
+			break
+
+	converted.close()
+	members.close()
+
+	missing_files = sorted( member_name for block_name in remaining for member_name in remaining[block_name] )
+
+	# Close off any partially written blocks before reporting the missing files
+	for block_name in list(writers.keys()):
+		writers.pop(block_name).close()
+
+	assert len(missing_files) == 0, f"Did not find {len(missing_files)} expected files in the archive ({source}): {missing_files[:10]}"
+
 if __name__ == '__main__':
 	parser = argparse.ArgumentParser(description='Convert a block of PMC articles')
 	parser.add_argument('--pmcDir',required=True,type=str,help='Directory with PMC Tar Gz files and groupings already processed')
-	parser.add_argument('--block',required=True,type=str,help='Name of block to process')
+	parser.add_argument('--block',required=False,type=str,help='Name of block to process')
+	parser.add_argument('--archive',required=False,type=str,help='Name of PMC archive (in pmcDir) to convert all blocks of in a single pass, instead of a single --block')
 	parser.add_argument('--format',required=True,type=str,help='Format to output documents to (only biocxml supported)')
-	parser.add_argument('--outFile',required=True,type=str,help='File to save to')
+	parser.add_argument('--outFile',required=True,type=str,help='File to save to. With --archive, this must contain {block} which is replaced by each block name')
 	parser.add_argument('--db',action='store_true',help="Whether to output as an SQLite database")
+	parser.add_argument('--zdict',required=False,type=str,help='Preset dictionary (from trainDictionary.py) to compress the documents with when using --db, instead of gzip')
+	parser.add_argument('--pmidsFile',required=False,type=str,help='Where to store the PMIDs of the converted documents. With --archive, this must contain {block} as with --outFile')
+	parser.add_argument('--workers',required=False,type=int,default=1,help='Number of processes to convert the files with (default: 1)')
 	parser.add_argument('--verbose',action='store_true',help="Whether to provide more output")
 	args = parser.parse_args()
 
 	assert args.format == 'biocxml'
+	assert bool(args.block) != bool(args.archive), "Must provide one of --block or --archive"
+	assert args.workers >= 1, "--workers must be at least 1"
+
+	pmids_files = None
 
 	grouping_file = os.path.join(args.pmcDir,'groupings.json')
 	with open(grouping_file) as f:
-		block = json.load(f)[args.block]
-
-	source = os.path.join(args.pmcDir, block['src'])
-	files_to_extract = set(block['group'])
-
-	print(f"Loading {len(files_to_extract)} documents from archive: {source}")
+		groupings = json.load(f)
 
-	found_files = set()
+	if args.archive:
+		assert '{block}' in args.outFile, "--outFile must contain {block} when converting a whole archive"
 
-	with tempfile.NamedTemporaryFile() as tf_out:
-		out_file = tf_out.name if args.db else args.outFile
+		blocks = { block_name:block for block_name,block in groupings.items() if block['src'] == args.archive }
+		assert len(blocks) > 0, "No blocks found for archive: %s" % args.archive
 
-		with bioc.biocxml.iterwrite(out_file) as writer:
+		out_files = { block_name:args.outFile.replace('{block}',block_name) for block_name in blocks }
+		if args.pmidsFile:
+			assert '{block}' in args.pmidsFile, "--pmidsFile must contain {block} when converting a whole archive"
+			pmids_files = { block_name:args.pmidsFile.replace('{block}',block_name) for block_name in blocks }
+		source = os.path.join(args.pmcDir, args.archive)
+	else:
+		blocks = { args.block: groupings[args.block] }
+		out_files = { args.block: args.outFile }
+		if args.pmidsFile:
+			pmids_files = { args.block: args.pmidsFile }
+		source = os.path.join(args.pmcDir, groupings[args.block]['src'])
 
-			tar = tarfile.open(source)
+	file_count = sum( len(block['group']) for block in blocks.values() )
+	print(f"Loading {file_count} documents in {len(blocks)} block(s) from archive: {source}")
 
-			iterator = tqdm(tar) if args.verbose else tar
-
-			for member in iterator:
-				if member.name in files_to_extract:
-
-					found_files.add(member.name)
-					if args.verbose:
-						iterator.set_description(f"Found {member.name}: {len(found_files)}/{len(files_to_extract)}")
-
-					file_handle = tar.extractfile(member)
-					
-					data = file_handle.read().decode('utf-8')
-
-					for bioc_doc in pmcxml2bioc(io.StringIO(data)):
-						writer.write_document(bioc_doc)
-
-					if found_files == files_to_extract:
-						if args.verbose:
-							print(f"Extracted all {len(found_files)} files from archives.")
-						break
-
-		if args.db:
-			saveDocumentsToDatabase(args.outFile,tf_out.name,is_fulltext=True)
-
-	missing_files = sorted(files_to_extract - found_files)
-	assert len(missing_files) == 0, f"Did not find {len(missing_files)} expected files in the archive ({source}): {missing_files[:10]}"
+	zdict = loadDictionary(args.zdict) if args.zdict else None
 
-	print("Saved %d documents to %s" % (len(files_to_extract), args.outFile))
+	convertArchive(source, blocks, out_files, args.db, pmids_files, args.verbose, args.workers, zdict)
 
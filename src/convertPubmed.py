@@ -3,7 +3,8 @@ import argparse
 import tempfile
 import hashlib
 
-from bioconverters import convert
+from bioconverters import convert, pubmedxml2bioc
+import bioc
 
 import shutil
 import urllib.request as request
@@ -17,7 +18,8 @@ import re
 import os
 from datetime import datetime
 
-from dbutils import saveDocumentsToDatabase
+from dbutils import DocumentDatabaseWriter, loadDictionary
+from pmidutils import savePMIDs
 
 def download_file(url,local_filename):
 	with closing(request.urlopen(url,timeout=20)) as r:
@@ -93,31 +95,48 @@ def main():
 	parser.add_argument('--o',type=str,required=True,help="Where to store resulting converted docs")
 	parser.add_argument('--oFormat',type=str,required=True,help="Format for output corpus. Options: %s" % "/".join(accepted_out_formats))
 	parser.add_argument('--db',action='store_true',help="Whether to output as an SQLite database")
+	parser.add_argument('--zdict',type=str,required=False,help="Preset dictionary (from trainDictionary.py) to compress the documents with when using --db, instead of gzip")
+	parser.add_argument('--pmidsFile',type=str,required=False,help="Where to store the PMIDs of the converted documents (one per line)")
+	parser.add_argument('--workers',type=int,default=1,help="Number of processes to parse the PubMed file with (default: 1)")
 
 	args = parser.parse_args()
 
 	in_format = 'pubmedxml'
 	out_format = args.oFormat.lower()
 
-	if args.db:
-		assert out_format == 'biocxml', "Output format must be biocxml when storing to the database"
+	if args.db or args.pmidsFile:
+		assert out_format == 'biocxml', "Output format must be biocxml when storing to the database or saving PMIDs"
 
 	assert out_format in accepted_out_formats, "%s is not an accepted output format. Options are: %s" % (out_format, "/".join(accepted_out_formats))
 
 	file_index = get_pubmed_fileindex(args.url)
 
-	with tempfile.NamedTemporaryFile() as tf_pubmed, tempfile.NamedTemporaryFile() as tf_out:
+	with tempfile.NamedTemporaryFile() as tf_pubmed:
 		print("Downloading...")
 		download_file_with_retries(args.url, tf_pubmed.name, check_md5=True)
-	
-		out_file = tf_out.name if args.db else args.o
 
 		print("Converting...")
-		with gzip.open(tf_pubmed.name) as f:	
-			convert([f],in_format,out_file,out_format)
-
-		if args.db:
-			saveDocumentsToDatabase(args.o,tf_out.name,is_fulltext=False,file_index=file_index)
+		if out_format == 'biocxml':
+			# The documents are written straight into the database (without a BioC XML file in between) or the
+			# BioC XML file, collecting their PMIDs on the way
+			if args.db:
+				zdict = loadDictionary(args.zdict) if args.zdict else None
+				writer = DocumentDatabaseWriter(args.o, is_fulltext=False, file_index=file_index, zdict=zdict)
+			else:
+				writer = bioc.biocxml.BioCXMLDocumentWriter(args.o)
+
+			pmids = []
+			with gzip.open(tf_pubmed.name) as f:
+				for bioc_doc in pubmedxml2bioc(f, workers=args.workers):
+					writer.write_document(bioc_doc)
+					pmids.append(bioc_doc.infons.get('pmid',''))
+			writer.close()
+
+			if args.pmidsFile:
+				savePMIDs(args.pmidsFile, pmids)
+		else:
+			with gzip.open(tf_pubmed.name) as f:
+				convert([f],in_format,args.o,out_format,workers=args.workers)
 
 	print("Output to %s complete" % args.o)
 
@@ -1,5 +1,8 @@
 
+import collections
 import gzip
+import heapq
+import itertools
 import sqlite3
 import os
 import hashlib
@@ -9,84 +12,363 @@ import shutil
 import sys
 import time
 import tempfile
+import urllib.parse
+import re
+import zlib
+
+from bioc.biocxml.encoder import encode_document
+from lxml import etree as lxml_etree
+
+from bioconverters.xmlbackend import iterparse_detached
 
 def gzip_str(string_: str) -> bytes:
 	out = io.BytesIO()
 
-	with gzip.GzipFile(fileobj=out, mode='w') as fo:
+	# No timestamp in the header so that the same document always compresses to the same bytes
+	with gzip.GzipFile(fileobj=out, mode='w', mtime=0) as fo:
 		fo.write(string_.encode())
 
 	bytes_obj = out.getvalue()
 	return bytes_obj
 
 
-def gunzip_bytes_obj(bytes_obj: bytes) -> str:
-	return gzip.decompress(bytes_obj).decode()
+def deflate_str(string_: str, zdict: bytes) -> bytes:
+	compressor = zlib.compressobj(level=9, wbits=-zlib.MAX_WBITS, zdict=zdict)
+	return compressor.compress(string_.encode()) + compressor.flush()
+
+
+def gunzip_bytes_obj(bytes_obj: bytes, zdict: bytes = None) -> str:
+	"""
+	Decompresses a document compressed with gzip (the default) or, if the preset dictionary is given, raw deflate
+	"""
+	if zdict is None:
+		return gzip.decompress(bytes_obj).decode()
+
+	decompressor = zlib.decompressobj(wbits=-zlib.MAX_WBITS, zdict=zdict)
+	return (decompressor.decompress(bytes_obj) + decompressor.flush()).decode()
+
+# The codec column holds CODEC_GZIP for documents compressed with gzip, otherwise the id of the preset dictionary
+# (in the dictionaries table) that the document was compressed with using raw deflate.
+CODEC_GZIP = 0
+
+# A single preset dictionary is trained (by trainDictionary.py) on the first documents of some sample files and then
+# used for every database, so that the dictionaries table of the merged database only holds one
+ZDICT_SIZE = 32 * 1024
+ZDICT_SAMPLE_COUNT = 500
+
+# Pieces of the documents that are counted when training a dictionary: each tag along with the text after it,
+# and runs of up to three words in longer text
+ZDICT_SEGMENT_REGEX = re.compile(r'<[^<]{0,256}|(?:[^<\s]+ ){1,3}')
+
+def trainDictionary(samples, size=ZDICT_SIZE):
+	"""
+	Builds a preset dictionary for compressing documents like the samples from the pieces of XML that appear in
+	the most samples (weighted by their length). The most useful pieces go at the end of the dictionary, where
+	they are cheapest to refer to.
+	"""
+	counts = collections.Counter()
+	for sample in samples:
+		counts.update(set(ZDICT_SEGMENT_REGEX.findall(sample)))
+
+	scored = sorted( ((count*len(segment), segment) for segment,count in counts.items() if count > 1), reverse=True )
+
+	chosen, length = [], 0
+	for _, segment in scored:
+		if length >= size:
+			break
+		chosen.append(segment)
+		length += len(segment.encode())
+
+	return ''.join(reversed(chosen)).encode()[-size:]
+
+def trainDictionaryFromBioCFiles(documents_filenames, sample_count=ZDICT_SAMPLE_COUNT, size=ZDICT_SIZE):
+	"""
+	Builds a preset dictionary from the first sample_count documents of each BioC XML file (which are read one at a time)
+	"""
+	samples = ( xmlstr for documents_filename in documents_filenames for _, xmlstr in itertools.islice(readDocumentsFromBioCFile(documents_filename), sample_count) )
+	return trainDictionary(samples, size)
+
+def loadDictionary(zdict_filename):
+	with open(zdict_filename, 'rb') as f:
+		return f.read()
+
+class DocumentDecompressor:
+	"""
+	Decompresses documents from a database with whichever codec they were compressed with, loading (and
+	keeping) the preset dictionaries as they are needed
+	"""
+
+	def __init__(self, con):
+		self.con = con
+		self.zdicts = {}
+
+	def decompress(self, compressed, codec=CODEC_GZIP):
+		if codec == CODEC_GZIP:
+			return gunzip_bytes_obj(compressed)
+
+		if not codec in self.zdicts:
+			row = self.con.execute("SELECT zdict FROM dictionaries WHERE id = ?", (codec,)).fetchone()
+			assert row is not None, "Could not find the dictionary (%d) for a document" % codec
+			self.zdicts[codec] = row[0]
+
+		return gunzip_bytes_obj(compressed, self.zdicts[codec])
 
 def calcSHA256_AsInt(data):
 	sha256 = hashlib.sha256(data).hexdigest()
 	return int(sha256[:10],16)
 
-def saveDocumentsToDatabase(db_filename, documents_filename, is_fulltext, file_index=-1):
-	if os.path.isfile(db_filename):
-		os.remove(db_filename)
+def calcContentHash(doc_elem):
+	"""
+	Hash of a document (as an lxml element) that is stable across conversions of the same content. It is
+	calculated over the canonical XML (C14N 2.0) of the document so that it does not depend on how the
+	document was serialized. Any whitespace between elements must already have been removed, e.g. by
+	parsing the document with DOCUMENT_PARSER.
+	"""
+	return calcSHA256_AsInt(lxml_etree.tostring(doc_elem, method='c14n2'))
+
+# Parser for serialized documents that drops the whitespace between elements (e.g. from pretty-printing) so
+# that they hash the same as the encoded documents. Whitespace-only text inside an element is kept.
+DOCUMENT_PARSER = lxml_etree.XMLParser(remove_blank_text=True)
+
+# How many documents to insert at a time, so that only one batch of compressed documents is held in memory
+DEFAULT_BATCH_SIZE = 1000
+
+# Pragmas for building a new database from scratch. It is not worth journaling or syncing the writes as a
+# partially built database is just rebuilt. The page size must be set before any tables are created.
+BUILD_PRAGMAS = [
+	"PRAGMA page_size = 8192;",
+	"PRAGMA journal_mode = OFF;",
+	"PRAGMA synchronous = OFF;",
+]
+
+# Document infons that are also stored in their own (indexed) columns so documents can be found without decompressing them
+METADATA_COLUMNS = [ ('pmcid','TEXT'), ('doi','TEXT'), ('year','INTEGER'), ('journal','TEXT') ]
+
+def createDocumentTables(cur):
+	metadata_columns = "".join( f", {column} {column_type}" for column,column_type in METADATA_COLUMNS )
+	cur.execute(f"CREATE TABLE fulltext(pmid INTEGER PRIMARY KEY ASC, compressed BLOB, hash INTEGER, updated INTEGER, codec INTEGER NOT NULL DEFAULT 0{metadata_columns});")
+	cur.execute(f"CREATE TABLE abstracts(pmid INTEGER PRIMARY KEY ASC, compressed BLOB, hash INTEGER, updated INTEGER, file_index INTEGER, codec INTEGER NOT NULL DEFAULT 0{metadata_columns});")
+	cur.execute("CREATE TABLE dictionaries(id INTEGER PRIMARY KEY ASC, zdict BLOB);")
+	createMetadataIndices(cur)
+
+def createMetadataIndices(cur):
+	for table in ['fulltext','abstracts']:
+		for column,_ in METADATA_COLUMNS:
+			cur.execute(f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table}({column});")
+
+def getColumnNames(con, table):
+	return [ row[1] for row in con.execute(f"PRAGMA table_info({table});") ]
+
+def upgradeDBSchema(db_filename, batch_size=DEFAULT_BATCH_SIZE):
+	"""
+	Adds the columns, tables and indices that a database created by an older version is missing, so that it can be
+	merged with newer ones. Its existing documents are gzipped, and the metadata columns are filled in for them
+	(by decompressing each document) when they are added, so that searching by metadata also finds them.
+	"""
+	# Transactions are managed explicitly so that the columns are only added along with their values
+	con = sqlite3.connect(db_filename, isolation_level=None)
+	cur = con.cursor()
+	cur.execute("BEGIN;")
+	try:
+		for table in ['fulltext','abstracts']:
+			columns = getColumnNames(con, table)
+			if not 'codec' in columns:
+				cur.execute(f"ALTER TABLE {table} ADD COLUMN codec INTEGER NOT NULL DEFAULT 0;")
+
+			missing_metadata = [ (column,column_type) for column,column_type in METADATA_COLUMNS if not column in columns ]
+			for column,column_type in missing_metadata:
+				cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type};")
+			if missing_metadata:
+				fillInMetadata(con, table, batch_size)
+
+		cur.execute("CREATE TABLE IF NOT EXISTS dictionaries(id INTEGER PRIMARY KEY ASC, zdict BLOB);")
+		createMetadataIndices(cur)
+	except:
+		cur.execute("ROLLBACK;")
+		raise
+	cur.execute("COMMIT;")
+	con.close()
 
-	if not is_fulltext:
-		assert file_index > 0, "Must provide the PubMed file number"
+def fillInMetadata(con, table, batch_size=DEFAULT_BATCH_SIZE):
+	"""
+	Sets the metadata columns of every document in a table from its infons. The documents are read (and updated) in
+	batches in pmid order, so only one batch is held in memory.
+	"""
+	document_count = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+	print("Filling in the metadata of %d existing documents in %s..." % (document_count, table))
+	sys.stdout.flush()
+
+	decompressor = DocumentDecompressor(con)
+	assignments = ", ".join( f"{column} = ?" for column,_ in METADATA_COLUMNS )
+
+	last_pmid = None
+	while True:
+		if last_pmid is None:
+			rows = con.execute(f"SELECT pmid, compressed, codec FROM {table} ORDER BY pmid LIMIT ?", (batch_size,)).fetchall()
+		else:
+			rows = con.execute(f"SELECT pmid, compressed, codec FROM {table} WHERE pmid > ? ORDER BY pmid LIMIT ?", (last_pmid, batch_size)).fetchall()
+		if not rows:
+			break
+
+		updates = []
+		for pmid, compressed, codec in rows:
+			doc_elem = lxml_etree.fromstring(decompressor.decompress(compressed, codec).encode('utf8'), DOCUMENT_PARSER)
+			updates.append( getMetadata(getInfons(doc_elem)) + (pmid,) )
+		con.executemany(f"UPDATE {table} SET {assignments} WHERE pmid = ?", updates)
+
+		last_pmid = rows[-1][0]
+
+def getInfons(doc_elem):
+	"""
+	Gets the document-level infons of a BioC document (as an lxml element)
+	"""
+	return { infon.get('key'):infon.text for infon in doc_elem.findall('./infon') }
+
+def getMetadata(infons):
+	"""
+	Gets the values for the metadata columns from the infons of a document (with None for any that are missing)
+	"""
+	metadata = []
+	for column,column_type in METADATA_COLUMNS:
+		value = infons.get(column)
+		value = None if value is None else str(value).strip()
+		if not value or value == 'None':
+			value = None
+		elif column_type == 'INTEGER':
+			value = int(value) if value.isdigit() else None
+		elif column == 'pmcid':
+			value = normalizePMCID(value)
+		metadata.append(value)
+	return tuple(metadata)
+
+def normalizePMCID(pmcid):
+	"""
+	Gets a PMCID in the form PMC<digits> (PMC OA articles often give just the digits)
+	"""
+	pmcid = pmcid.strip()
+	digits = pmcid[3:] if pmcid.upper().startswith('PMC') else pmcid
+	return 'PMC' + digits if digits.isdigit() else pmcid
+
+def readDocumentsFromBioCFile(documents_filename):
+	"""
+	Yields (pmid, xmlstr) for each document with a PMID in a BioC XML file
+	"""
+	with open(documents_filename) as f:
+		# Each document is detached from the collection once it has been read so memory use stays flat. The standard
+		# library parser is always used (whatever the current backend) as the documents are serialized with it.
+		for elem in iterparse_detached(f, tag='document', backend='stdlib'):
+			pmid_field = elem.find('./id')
+
+			pmid = None
+			if pmid_field is not None and pmid_field.text and pmid_field.text != 'None':
+				pmid = int(pmid_field.text)
+			
+			if pmid:
+				xmlstr = etree.tostring(elem, encoding='utf8', method='html').decode()
+
+				yield pmid, xmlstr
+
+def serializeDocument(doc_elem):
+	"""
+	Serializes a BioC document (encoded as an lxml element) to the XML stored in the database (the same as a document element in a BioC XML file)
+	"""
+	return lxml_etree.tostring(doc_elem, encoding='unicode') + '\n'
+
+class DocumentDatabaseWriter:
+	"""
+	Writes documents straight into a new database (replacing any existing file), with the same interface as
+	bioc.biocxml.BioCXMLDocumentWriter. The documents are inserted in batches of batch_size in a single
+	transaction, which is committed by close(). Documents without a PMID or with a repeated PMID are skipped.
+	The documents are gzipped unless a preset dictionary (zdict) is given, which is stored in the database.
+	"""
+
+	def __init__(self, db_filename, is_fulltext, file_index=-1, batch_size=DEFAULT_BATCH_SIZE, zdict=None):
+		if os.path.isfile(db_filename):
+			os.remove(db_filename)
+
+		if not is_fulltext:
+			assert file_index > 0, "Must provide the PubMed file number"
+
+		self.is_fulltext = is_fulltext
+		self.file_index = file_index
+		self.batch_size = batch_size
+
+		self.con = sqlite3.connect(db_filename)
+		
+		self.cur = self.con.cursor()
+		for pragma in BUILD_PRAGMAS:
+			self.cur.execute(pragma)
+
+		createDocumentTables(self.cur)
+		self.con.commit()
+
+		self.timestamp = int(time.time())
+		self.seen_pmids = set()
+		self.batch = []
+		self.record_count = 0
+
+		self.zdict, self.zdict_id = zdict, CODEC_GZIP
+		if zdict is not None:
+			self.zdict_id = calcSHA256_AsInt(zdict)
+			assert self.zdict_id != CODEC_GZIP
+			self.cur.execute("INSERT INTO dictionaries VALUES (?,?)", (self.zdict_id, zdict))
+
+	def write_document(self, bioc_doc):
+		if bioc_doc.id and bioc_doc.id != 'None':
+			doc_elem = encode_document(bioc_doc)
+			self.write_xml(int(bioc_doc.id), serializeDocument(doc_elem), calcContentHash(doc_elem), getMetadata(bioc_doc.infons))
+
+	def write_xml(self, pmid, xmlstr, content_hash=None, metadata=None):
+		if not pmid or pmid in self.seen_pmids:
+			return
+		self.seen_pmids.add(pmid)
 
-	con = sqlite3.connect(db_filename)
-	
-	cur = con.cursor()
-	cur.execute("CREATE TABLE fulltext(pmid INTEGER PRIMARY KEY ASC, compressed BLOB, hash INTEGER, updated INTEGER);")
-	con.commit()
+		if content_hash is None or metadata is None:
+			doc_elem = lxml_etree.fromstring(xmlstr.encode('utf8'), DOCUMENT_PARSER)
+			content_hash = calcContentHash(doc_elem)
+			metadata = getMetadata(getInfons(doc_elem))
 
-	cur.execute("CREATE TABLE abstracts(pmid INTEGER PRIMARY KEY ASC, compressed BLOB, hash INTEGER, updated INTEGER, file_index INTEGER);")
-	con.commit()
+		if self.zdict is None:
+			compressed = gzip_str(xmlstr)
+		else:
+			compressed = deflate_str(xmlstr, self.zdict)
 
-	timestamp = int(time.time())
+		if self.is_fulltext:
+			self.batch.append( (pmid, compressed, content_hash, self.timestamp, self.zdict_id) + metadata )
+		else:
+			self.batch.append( (pmid, compressed, content_hash, self.timestamp, self.file_index, self.zdict_id) + metadata )
 
-	document_records = []
-	seen_pmids = set()
-	with open(documents_filename) as f:
-		for event, elem in etree.iterparse(f, events=('start', 'end', 'start-ns', 'end-ns')):
-			if (event=='end' and elem.tag=='document'):
-				pmid_field = elem.find('./id')
-
-				pmid = None
-				if pmid_field is not None and pmid_field.text and pmid_field.text != 'None':
-					pmid = int(pmid_field.text)
-				
-				if pmid and not pmid in seen_pmids:
-					seen_pmids.add(pmid)
-					
-					xmlstr = etree.tostring(elem, encoding='utf8', method='html').decode()
-				
-					compressed = gzip_str(xmlstr)
-					
-					original_hash = calcSHA256_AsInt(compressed)
-
-					if is_fulltext:
-						document_record = (pmid, compressed, original_hash, timestamp)
-					else:
-						document_record = (pmid, compressed, original_hash, timestamp, file_index)
-
-					document_records.append(document_record)
-				
-				elem.clear()
-		
-	if is_fulltext:	
-		cur.executemany("INSERT INTO fulltext VALUES (?,?,?,?)", document_records)
-	else:
-		cur.executemany("INSERT INTO abstracts VALUES (?,?,?,?,?)", document_records)
+		if len(self.batch) >= self.batch_size:
+			self._flush()
 
-	con.commit()
+	def _flush(self):
+		metadata_placeholders = ",?" * len(METADATA_COLUMNS)
+		if self.is_fulltext:
+			self.cur.executemany(f"INSERT INTO fulltext VALUES (?,?,?,?,?{metadata_placeholders})", self.batch)
+		else:
+			self.cur.executemany(f"INSERT INTO abstracts VALUES (?,?,?,?,?,?{metadata_placeholders})", self.batch)
+		self.record_count += len(self.batch)
+		self.batch = []
 
-	print("Stored %d {table} in database" % len(document_records))
+	def close(self):
+		self._flush()
+		self.con.commit()
 
-	con.close()
+		print("Stored %d %s in database" % (self.record_count, 'fulltext' if self.is_fulltext else 'abstracts'))
+
+		self.con.close()
+
+def saveDocumentsToDatabase(db_filename, documents_filename, is_fulltext, file_index=-1, batch_size=DEFAULT_BATCH_SIZE, zdict=None):
+	writer = DocumentDatabaseWriter(db_filename, is_fulltext, file_index, batch_size, zdict)
+	for pmid, xmlstr in readDocumentsFromBioCFile(documents_filename):
+		writer.write_xml(pmid, xmlstr)
+	writer.close()
+
+def readOnlyURI(db_filename):
+	return 'file:%s?mode=ro' % urllib.parse.quote(os.path.abspath(db_filename))
 
 def getDBSchema(db_filename):
-	con = sqlite3.connect(db_filename)
+	con = sqlite3.connect(readOnlyURI(db_filename), uri=True)
 	
 	cur = con.cursor()
 
@@ -114,7 +396,47 @@ def truncateFileAndKeepModifiedDates(filename):
 
 	os.utime(filename, (access_time, modification_time))
 
-def mergeDBs(input_dbs,output_db,truncate_inputs=False):
+# How many input databases to attach at a time while merging (SQLite allows 10 by default)
+MAX_ATTACHED_DBS = 8
+
+# How many input databases to read from at a time in a k-way merge (each is a separate read-only connection)
+MAX_OPEN_DBS = 256
+
+# The field used to decide which version of a document is the latest for each table
+TIME_FIELDS = { 'fulltext':'updated', 'abstracts':'file_index' }
+
+def mergeAttachedTable(cur, alias, table):
+	"""
+	Merges one table of an attached database into the main database and returns the counts of documents that
+	were inserted, replaced, unchanged (skipped) and older than the current ones (skipped)
+	"""
+	time_field = TIME_FIELDS[table]
+
+	join = f"FROM {alias}.{table} inserting LEFT JOIN main.{table} current ON inserting.pmid = current.pmid"
+	newer = f"inserting.hash != current.hash AND inserting.{time_field} >= current.{time_field}"
+	older = f"inserting.hash != current.hash AND inserting.{time_field} < current.{time_field}"
+
+	cur.execute(f"SELECT COUNT(*), SUM(current.pmid IS NULL), SUM({newer}), SUM(inserting.hash == current.hash), SUM({older}) {join}")
+	total, inserted, replaced, unchanged, older_count = [ count or 0 for count in cur.fetchone() ]
+
+	# Only the new documents and the changed ones that are at least as recent as the current ones are written
+	cur.execute(f"REPLACE INTO main.{table} SELECT inserting.* {join} WHERE current.pmid IS NULL OR ({newer})")
+
+	return collections.Counter(inserted=inserted, replaced=replaced, unchanged=unchanged, older=older_count)
+
+def mergeDBs(input_dbs,output_db,truncate_inputs=False,in_place=False):
+	"""
+	Merges the documents from the input databases into the output database (which is created from the first input if
+	it doesn't exist). The inputs are attached read-only, MAX_ATTACHED_DBS at a time, and the documents from each group
+	are merged in a single transaction.
+
+	By default the merge is done on a copy of the output database which then replaces it. With in_place, the output
+	database is changed directly and committed after each group (one transaction for all of them isn't possible as
+	databases can't be attached inside a transaction). If the merge is interrupted, the rollback journal leaves the
+	output database as it was after the last committed group. Running the same merge again then completes it, as
+	documents that were already merged are skipped as unchanged and the later inputs still take precedence. The
+	inputs are only truncated once every group has been merged.
+	"""
 	assert isinstance(input_dbs,list), "Expected list of input DB files"
 	assert isinstance(output_db, str), "Expected string with output DB"
 
@@ -126,71 +448,220 @@ def mergeDBs(input_dbs,output_db,truncate_inputs=False):
 		skip_count = len(input_dbs_orig) - len(input_dbs)
 		print("Skipping %d files that are empty" % skip_count)
 
-	tmp_output_db = "%s.tmp" % output_db
+	target_db = output_db if in_place else "%s.tmp" % output_db
 
 	# If the output_db doesn't exist, use the first input db and merge into it
 	if not os.path.isfile(output_db):
 		assert len(input_dbs) > 0, "Must provide non-empty databases as no output file exists yet"
 		print("Starting with %s..." % input_dbs[0])
-		shutil.copyfile(input_dbs[0],tmp_output_db)
+		shutil.copyfile(input_dbs[0],target_db)
 		input_dbs = input_dbs[1:]
 	else:
 		if len(input_dbs) == 0:
 			print("No input databases to process, but output database does exist. So no work to do.")
 			return
-		shutil.copyfile(output_db,tmp_output_db)
+		if not in_place:
+			shutil.copyfile(output_db,target_db)
 
-	expected_schema = getDBSchema(tmp_output_db)
+	upgradeDBSchema(target_db)
+	expected_schema = getDBSchema(target_db)
 
-	con = sqlite3.connect(tmp_output_db)
+	# Transactions are managed explicitly as databases can't be attached inside one
+	con = sqlite3.connect(target_db, isolation_level=None)
 	cur = con.cursor()
 
-	for input_db in input_dbs:
-		#if os.path.getsize(input_db) == 0:
-		#	print("Skipping %s..." % input_db)
-		#	continue
+	merge_counts = { table:collections.Counter() for table in ['fulltext','abstracts'] }
 
-		assert os.path.getsize(input_db) > 0, "Input db file (%s) is empty" % input_db
+	for group_start in range(0, len(input_dbs), MAX_ATTACHED_DBS):
+		group = input_dbs[group_start:group_start+MAX_ATTACHED_DBS]
 
-		print("Processing %s..." % input_db)
-		sys.stdout.flush()
+		aliases = []
+		for input_db in group:
+			assert os.path.getsize(input_db) > 0, "Input db file (%s) is empty" % input_db
 
-		tmp_insert_db = "%s.tmp" % input_db
+			input_schema = getDBSchema(input_db)
 
-		shutil.copyfile(input_db, tmp_insert_db)
+			assert expected_schema == input_schema, "Databases should match up exactly! %s != %s" % (expected_schema, input_schema)
 
-		input_schema = getDBSchema(tmp_insert_db)
+			alias = "input_db%d" % len(aliases)
+			cur.execute(f"ATTACH DATABASE ? as {alias} ;", (readOnlyURI(input_db), ))
+			aliases.append(alias)
 
-		assert expected_schema == input_schema, "Databases should match up exactly! %s != %s" % (expected_schema, input_schema)
+		cur.execute("BEGIN;")
+		try:
+			for alias, input_db in zip(aliases, group):
+				print("Processing %s..." % input_db)
+				sys.stdout.flush()
 
+				cur.execute(f"INSERT OR IGNORE INTO main.dictionaries SELECT * FROM {alias}.dictionaries;")
 
-		cur.execute("ATTACH DATABASE ? as input_db ;", (tmp_insert_db, ))
+				for table in ['fulltext','abstracts']:
+					counts = mergeAttachedTable(cur, alias, table)
 
-		for table in ['fulltext','abstracts']:
-			time_field = 'updated' if table == 'fulltext' else 'file_index'
+					print("  %s: %d inserted, %d replaced, %d unchanged (skipped), %d older (skipped)" % (table, counts['inserted'], counts['replaced'], counts['unchanged'], counts['older']))
+					merge_counts[table] += counts
+		except:
+			cur.execute("ROLLBACK;")
+			raise
 
-			# Update the documents  table with the latest documents
-			cur.execute(f"DELETE FROM input_db.{table} WHERE pmid IN (SELECT current.pmid FROM input_db.{table} inserting, {table} current WHERE inserting.pmid = current.pmid AND inserting.{time_field} < current.{time_field} AND inserting.hash != current.hash )")
-			con.commit()
+		cur.execute("COMMIT;")
 
-			cur.execute(f"DELETE FROM input_db.{table} WHERE pmid IN (SELECT current.pmid FROM input_db.{table} inserting, {table} current WHERE inserting.pmid = current.pmid AND inserting.{time_field} > current.{time_field} AND inserting.hash == current.hash )")
-			con.commit()
+		for alias in aliases:
+			cur.execute(f"DETACH DATABASE {alias} ;")
 
-			cur.execute(f"REPLACE INTO {table} SELECT * FROM input_db.{table};")
-			con.commit()
+	con.close()
 
+	for table, counts in merge_counts.items():
+		print("Merged %s: %d inserted, %d replaced, %d unchanged (skipped), %d older (skipped)" % (table, counts['inserted'], counts['replaced'], counts['unchanged'], counts['older']))
 
-		cur.execute("DETACH DATABASE input_db ;")
-		
-		con.commit()
+	if not in_place:
+		shutil.move(target_db,output_db)
+
+	if truncate_inputs:
+		for input_db in input_dbs_orig:
+			truncateFileAndKeepModifiedDates(input_db)
+
+def createEmptyDB(db_filename, schema_db):
+	"""
+	Creates a database with the same tables and indices as another one, but none of its documents
+	"""
+	schema_con = sqlite3.connect(readOnlyURI(schema_db), uri=True)
+	statements = [ row[0] for row in schema_con.execute("SELECT sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY type DESC") ]
+	schema_con.close()
+
+	con = sqlite3.connect(db_filename)
+	con.execute("PRAGMA page_size = 8192;")
+	for statement in statements:
+		con.execute(statement)
+	con.commit()
+	con.close()
+
+def kwayMergeTable(con, input_cons, table, batch_size=DEFAULT_BATCH_SIZE):
+	"""
+	Merges a table from each of the input databases into the output database in one pass, reading every input in
+	pmid order. The versions of each document are resolved with the same rules (and in the same order) as merging
+	the inputs one after another, so only the final version is written, once. Returns the counts of documents that
+	were inserted, replaced, unchanged (skipped) and older than the current ones (skipped).
+	"""
+	time_field = TIME_FIELDS[table]
+	columns = [ row[1] for row in con.execute(f"PRAGMA table_info({table});") ]
+	hash_index, time_index = columns.index('hash'), columns.index(time_field)
+	insert_sql = f"REPLACE INTO {table} VALUES ({','.join('?' for _ in columns)})"
+
+	# The input number breaks ties between the same pmid so that the rows themselves are never compared (and the
+	# versions are resolved in the order of the inputs)
+	def numberedRows(input_no, input_con):
+		for row in input_con.execute(f"SELECT * FROM {table} ORDER BY pmid"):
+			yield row[0], input_no, row
+
+	streams = [ numberedRows(input_no, input_con) for input_no, input_con in enumerate(input_cons) ]
+
+	counts = collections.Counter()
+	winners = []
+	for pmid, versions in itertools.groupby(heapq.merge(*streams), key=lambda version: version[0]):
+		current = con.execute(f"SELECT hash, {time_field} FROM {table} WHERE pmid = ?", (pmid,)).fetchone()
+
+		winner = None
+		for _, _, row in versions:
+			if current is None:
+				counts['inserted'] += 1
+			elif row[hash_index] == current[0]:
+				counts['unchanged'] += 1
+				continue
+			elif row[time_index] < current[1]:
+				counts['older'] += 1
+				continue
+			else:
+				counts['replaced'] += 1
+
+			winner = row
+			current = (row[hash_index], row[time_index])
+
+		if winner is not None:
+			winners.append(winner)
+			if len(winners) >= batch_size:
+				con.executemany(insert_sql, winners)
+				winners = []
+
+	if winners:
+		con.executemany(insert_sql, winners)
+
+	return counts
+
+def kwayMergeDBs(input_dbs,output_db,truncate_inputs=False,max_open=MAX_OPEN_DBS):
+	"""
+	Merges the documents from all the input databases into the output database (which is created if it doesn't exist)
+	with a k-way merge of up to max_open inputs at a time. Each group of inputs is merged in a single transaction on the
+	output database, writing only the winning version of each document. The result is the same as merging the inputs
+	one after another with mergeDBs(..., in_place=True).
+	"""
+	assert isinstance(input_dbs,list), "Expected list of input DB files"
+	assert isinstance(output_db, str), "Expected string with output DB"
+	assert max_open > 0, "Must be able to read at least one input database at a time"
+
+	input_dbs_orig = list(input_dbs)
+
+	input_dbs = [ input_db for input_db in input_dbs if os.path.getsize(input_db) > 0 ]
+
+	if len(input_dbs) < len(input_dbs_orig):
+		skip_count = len(input_dbs_orig) - len(input_dbs)
+		print("Skipping %d files that are empty" % skip_count)
+
+	if not os.path.isfile(output_db):
+		assert len(input_dbs) > 0, "Must provide non-empty databases as no output file exists yet"
+		createEmptyDB(output_db, input_dbs[0])
+	elif len(input_dbs) == 0:
+		print("No input databases to process, but output database does exist. So no work to do.")
+		return
+
+	upgradeDBSchema(output_db)
+	expected_schema = getDBSchema(output_db)
+
+	con = sqlite3.connect(output_db, isolation_level=None)
+
+	merge_counts = { table:collections.Counter() for table in TIME_FIELDS }
 
-		os.remove(tmp_insert_db)
+	for group_start in range(0, len(input_dbs), max_open):
+		group = input_dbs[group_start:group_start+max_open]
+
+		print("Merging %d databases (%s to %s)..." % (len(group), group[0], group[-1]))
+		sys.stdout.flush()
+
+		input_cons = []
+		for input_db in group:
+			input_schema = getDBSchema(input_db)
+
+			assert expected_schema == input_schema, "Databases should match up exactly! %s != %s" % (expected_schema, input_schema)
+
+			input_con = sqlite3.connect(readOnlyURI(input_db), uri=True)
+			# The inputs are only scanned once so they don't need much cache
+			input_con.execute("PRAGMA cache_size = -256;")
+			input_cons.append(input_con)
+
+		con.execute("BEGIN;")
+		try:
+			for input_con in input_cons:
+				con.executemany("INSERT OR IGNORE INTO dictionaries VALUES (?,?)", input_con.execute("SELECT * FROM dictionaries"))
+
+			for table in TIME_FIELDS:
+				counts = kwayMergeTable(con, input_cons, table)
+
+				print("  %s: %d inserted, %d replaced, %d unchanged (skipped), %d older (skipped)" % (table, counts['inserted'], counts['replaced'], counts['unchanged'], counts['older']))
+				merge_counts[table] += counts
+		except:
+			con.execute("ROLLBACK;")
+			raise
+
+		con.execute("COMMIT;")
+
+		for input_con in input_cons:
+			input_con.close()
 
 	con.close()
 
-	shutil.move(tmp_output_db,output_db)
+	for table, counts in merge_counts.items():
+		print("Merged %s: %d inserted, %d replaced, %d unchanged (skipped), %d older (skipped)" % (table, counts['inserted'], counts['replaced'], counts['unchanged'], counts['older']))
 
 	if truncate_inputs:
 		for input_db in input_dbs_orig:
 			truncateFileAndKeepModifiedDates(input_db)
-
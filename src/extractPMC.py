@@ -0,0 +1,60 @@
+import argparse
+import os
+import json
+import shutil
+
+from bioconverters import pmcxml2bioc
+import bioc
+
+from pmcutils import findPMCIDsInArchives, readArchiveMembers
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Pull individual articles (or a block of articles) straight out of the PMC archives using their indices')
+	parser.add_argument('--pmcDir',required=True,type=str,help='Directory with PMC Tar Gz files, their indices and groupings already processed')
+	parser.add_argument('--pmcids',required=False,type=str,help='Comma-delimited set of PMCIDs (e.g. PMC176545)')
+	parser.add_argument('--block',required=False,type=str,help='Name of block to extract')
+	parser.add_argument('--format',required=True,type=str,help='Format to output documents to (biocxml/pmcxml)')
+	parser.add_argument('--outFile',required=True,type=str,help='File to save to (or directory for pmcxml)')
+	args = parser.parse_args()
+
+	assert args.format in ['biocxml','pmcxml'], "Format must be biocxml or pmcxml"
+	assert bool(args.pmcids) != bool(args.block), "Must provide one of --pmcids or --block"
+
+	if args.block:
+		grouping_file = os.path.join(args.pmcDir,'groupings.json')
+		with open(grouping_file) as f:
+			block = json.load(f)[args.block]
+
+		to_extract = { os.path.join(args.pmcDir, block['src']) : block['group'] }
+		expected_count = len(block['group'])
+	else:
+		pmcids = [ pmcid.strip() for pmcid in args.pmcids.split(',') if pmcid.strip() ]
+		locations = findPMCIDsInArchives(args.pmcDir, pmcids)
+
+		missing = [ pmcid for pmcid in pmcids if not pmcid in locations ]
+		if missing:
+			print("WARNING: Could not find %d PMCIDs in archive indices: %s" % (len(missing), ",".join(missing[:10])))
+
+		to_extract = {}
+		for archive_filename, member_name in locations.values():
+			to_extract.setdefault(archive_filename, []).append(member_name)
+		expected_count = len(pmcids)
+
+	found_count = 0
+	if args.format == 'biocxml':
+		with bioc.biocxml.iterwrite(args.outFile) as writer:
+			for archive_filename, member_names in sorted(to_extract.items()):
+				for member_name, member_file in readArchiveMembers(archive_filename, member_names):
+					for bioc_doc in pmcxml2bioc(member_file):
+						writer.write_document(bioc_doc)
+					found_count += 1
+	else:
+		os.makedirs(args.outFile, exist_ok=True)
+		for archive_filename, member_names in sorted(to_extract.items()):
+			for member_name, member_file in readArchiveMembers(archive_filename, member_names):
+				with open(os.path.join(args.outFile, os.path.basename(member_name)),'wb') as f:
+					shutil.copyfileobj(member_file, f)
+				found_count += 1
+
+	print("Extracted %d/%d documents to %s" % (found_count, expected_count, args.outFile))
+
@@ -1,9 +1,10 @@
-import tarfile
 import json
 import argparse
 import os
 import sys
 
+from pmcutils import iterateAndIndexArchive, indexed_gzip
+
 if __name__ == '__main__':
 	parser = argparse.ArgumentParser(description='Split up the documents inside a set of PMC archives into groups and save the groupings')
 	parser.add_argument('--inPMCDir',required=True,type=str,help='Directory with gzipped tars of PubMedCentral documents')
@@ -14,6 +15,8 @@ if __name__ == '__main__':
 	per_group = 2000
 
 	print("Splitting PMC archive into groups of %d documents" % per_group)
+	if indexed_gzip is None:
+		print("WARNING: indexed_gzip is not installed so no archive indices will be built")
 
 	if args.prevGroupings and os.path.isfile(args.prevGroupings):
 		with open(args.prevGroupings) as f:
@@ -45,10 +48,11 @@ if __name__ == '__main__':
 		groupname_base = filename.replace('.tar.gz','')
 		group_index = 0
 
-		tar = tarfile.open(os.path.join(args.inPMCDir,filename))
 		current_group = []
 
-		for i,member in enumerate(tar):
+		# Streaming through the archive also saves an index of it (if indexed_gzip is installed) so
+		# that individual files can be read later without decompressing the whole archive again
+		for i,member in enumerate(iterateAndIndexArchive(os.path.join(args.inPMCDir,filename))):
 			file_ext = member.name.split('.')[-1]
 			if member.isfile() and file_ext in ['xml','nxml']:
 				current_group.append(member.name)
@@ -64,8 +68,6 @@ if __name__ == '__main__':
 			group_index += 1
 			file_groups[group_name] = {'src':filename, 'group':current_group}
 			current_group = []
-
-		tar.close()
 	
 	print("Added %d new groups" % (len(file_groups)-prev_group_count))
 
@@ -0,0 +1,14 @@
+import argparse
+
+from pubtatorutils import buildPubtatorIndex
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser('Build an on-disk store of PubTator annotations keyed by PMID for use by alignWithPubtator.py')
+	parser.add_argument('--annotations',required=True,type=str,help='PubTator annotations file (e.g. bioconcepts2pubtatorcentral.gz)')
+	parser.add_argument('--outPrefix',required=True,type=str,help='Prefix for the index and data files to create')
+	args = parser.parse_args()
+
+	record_count = buildPubtatorIndex(args.annotations, args.outPrefix)
+
+	print("Indexed %d runs of annotations to %s" % (record_count, args.outPrefix))
+
@@ -4,13 +4,16 @@ import os
 import shutil
 import sqlite3
 
-from dbutils import mergeDBs
+from dbutils import mergeDBs, kwayMergeDBs, MAX_ATTACHED_DBS, MAX_OPEN_DBS
 
 def main():
 	parser = argparse.ArgumentParser('Merge document SQLite databases into a single database')
 	parser.add_argument('--mainDB',required=True,type=str,help='Database to merge into')
 	parser.add_argument('--inDir',required=True,type=str,help='Directory with SQLite databases to merge')
 	parser.add_argument('--truncateInputs',action='store_true',help='Whether to truncate the input files (to save disk space)')
+	parser.add_argument('--inPlace',action='store_true',help='Merge directly into the main database instead of into a copy of it. This commits after each group of %d inputs, so an interrupted merge leaves the main database with only the earlier groups merged. Running the same merge again completes it (documents that were already merged are skipped as unchanged), as --truncateInputs only truncates the inputs once every group has been merged.' % MAX_ATTACHED_DBS)
+	parser.add_argument('--kway',action='store_true',help='Merge all the databases (directly into the main database) in a single k-way merge, writing each document once')
+	parser.add_argument('--maxOpen',type=int,default=MAX_OPEN_DBS,help='How many databases to read from at a time with --kway (default: %d)' % MAX_OPEN_DBS)
 	args = parser.parse_args()
 
 	truncate_inputs = bool(args.truncateInputs)
@@ -25,7 +28,10 @@ def main():
 	#	print("DELETING the main DB, for testing purposes")
 	#	os.remove(args.mainDB)
 
-	mergeDBs(input_dbs,args.mainDB,truncate_inputs)
+	if args.kway:
+		kwayMergeDBs(input_dbs,args.mainDB,truncate_inputs,max_open=args.maxOpen)
+	else:
+		mergeDBs(input_dbs,args.mainDB,truncate_inputs,in_place=args.inPlace)
 
 if __name__ == '__main__':
 	main()
@@ -0,0 +1,129 @@
+import io
+import json
+import os
+import tarfile
+
+try:
+	import indexed_gzip
+except ImportError:
+	indexed_gzip = None
+
+# Distance (in uncompressed bytes) between the gzip seek points stored in an archive index
+INDEX_SPACING = 4*1024*1024
+
+def getIndexFilenames(archive_filename):
+	"""
+	Files that store the gzip seek points and the member offsets for a PMC archive
+	"""
+	return "%s.gzidx" % archive_filename, "%s.members.json" % archive_filename
+
+def hasArchiveIndex(archive_filename):
+	return indexed_gzip is not None and all( os.path.isfile(f) for f in getIndexFilenames(archive_filename) )
+
+def getPMCIDFromMemberName(member_name):
+	return os.path.basename(member_name).split('.')[0]
+
+def iterateAndIndexArchive(archive_filename):
+	"""
+	Iterates through the members of a PMC archive. If indexed_gzip is installed, gzip seek points (every
+	INDEX_SPACING bytes) and the uncompressed offset of every file are saved alongside the archive once
+	the iteration is complete. These let IndexedArchive jump straight to any file later on.
+	"""
+	if indexed_gzip is None:
+		with tarfile.open(archive_filename) as tar:
+			for member in tar:
+				yield member
+		return
+
+	gzip_index_filename, members_filename = getIndexFilenames(archive_filename)
+
+	members = {}
+	with indexed_gzip.IndexedGzipFile(archive_filename, spacing=INDEX_SPACING) as igz:
+		with tarfile.open(fileobj=igz, mode='r:') as tar:
+			for member in tar:
+				if member.isfile():
+					members[member.name] = [member.offset_data, member.size]
+				yield member
+
+		igz.build_full_index()
+		igz.export_index(gzip_index_filename)
+
+	with open(members_filename,'w') as f:
+		json.dump(members,f)
+
+class IndexedArchive:
+	"""
+	Random access to the files inside a PMC archive using the index saved by iterateAndIndexArchive
+	"""
+	def __init__(self, archive_filename):
+		assert indexed_gzip is not None, "indexed_gzip must be installed to use PMC archive indices"
+		assert hasArchiveIndex(archive_filename), "No index found for PMC archive: %s" % archive_filename
+
+		gzip_index_filename, members_filename = getIndexFilenames(archive_filename)
+
+		with open(members_filename) as f:
+			self.members = json.load(f)
+
+		self.igz = indexed_gzip.IndexedGzipFile(archive_filename, index_file=gzip_index_filename)
+
+	def read(self, member_name):
+		offset, size = self.members[member_name]
+		self.igz.seek(offset)
+		return self.igz.read(size)
+
+	def close(self):
+		self.igz.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+def readArchiveMembers(archive_filename, member_names):
+	"""
+	Yields (name, binary file object) for the requested files in a PMC archive in the order they are stored.
+	Uses the archive index if there is one, otherwise streams through the archive until all have been found.
+	Each file must be read before moving on to the next one.
+	"""
+	remaining = set(member_names)
+
+	if hasArchiveIndex(archive_filename):
+		with IndexedArchive(archive_filename) as archive:
+			found = sorted( (archive.members[name][0], name) for name in remaining if name in archive.members )
+			for _, name in found:
+				yield name, io.BytesIO(archive.read(name))
+		return
+
+	with tarfile.open(archive_filename) as tar:
+		for member in tar:
+			if member.name in remaining:
+				remaining.remove(member.name)
+				yield member.name, tar.extractfile(member)
+
+				if len(remaining) == 0:
+					break
+
+def findPMCIDsInArchives(pmc_dir, pmcids):
+	"""
+	Uses the archive indices in a directory to find which archive (and file) holds each PMCID.
+	If a PMCID is in multiple archives, the last one (i.e. the latest update) is used.
+	"""
+	pmcids = set(pmcids)
+	locations = {}
+
+	archive_filenames = sorted( os.path.join(pmc_dir,f) for f in os.listdir(pmc_dir) if f.endswith('.tar.gz') )
+	for archive_filename in archive_filenames:
+		if not hasArchiveIndex(archive_filename):
+			continue
+
+		_, members_filename = getIndexFilenames(archive_filename)
+		with open(members_filename) as f:
+			members = json.load(f)
+
+		for member_name in members:
+			pmcid = getPMCIDFromMemberName(member_name)
+			if pmcid in pmcids:
+				locations[pmcid] = (archive_filename, member_name)
+
+	return locations
@@ -0,0 +1,29 @@
+import mmap
+import os
+import re
+
+PMID_INFON_REGEX = re.compile(rb'<infon key=.pmid.>(\d+)</infon>')
+
+def savePMIDs(filename, pmids):
+	"""
+	Save a PMID sidecar for a converted file (one PMID per line, sorted and deduplicated) so that later
+	steps don't need to parse the documents to find their PMIDs
+	"""
+	pmids = sorted(set( str(pmid) for pmid in pmids if re.fullmatch('[0-9]+', str(pmid)) ))
+	with open(filename,'w') as f:
+		for pmid in pmids:
+			f.write("%s\n" % pmid)
+
+def loadPMIDs(filename):
+	with open(filename) as f:
+		return set( int(line.strip()) for line in f if line.strip() )
+
+def scanPMIDs(biocxml_filename):
+	"""
+	Find the PMIDs in a BioC XML file by scanning for the pmid infons instead of parsing the whole file
+	"""
+	if os.path.getsize(biocxml_filename) == 0:
+		return set()
+
+	with open(biocxml_filename,'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+		return set( int(match.group(1)) for match in PMID_INFON_REGEX.finditer(m) )
@@ -0,0 +1,319 @@
+import bisect
+import gzip
+import heapq
+import mmap
+import os
+import re
+import struct
+import tempfile
+from collections import defaultdict
+
+# The index is a sorted table of fixed-width (pmid, offset, length) records pointing into the data file
+INDEX_MAGIC = b'PTINDEX1'
+INDEX_RECORD = struct.Struct('<QQQ')
+
+# Number of index records to sort in memory before spilling them to a temporary file
+SORT_CHUNK_SIZE = 5000000
+
+def getIndexFilenames(index_prefix):
+	return "%s.index" % index_prefix, "%s.data" % index_prefix
+
+def parseAnnotationLine(line):
+	"""
+	Parse a line of the PubTator file into (pmid, annotationType, conceptid, mentions). Mentions are
+	stripped and may be empty.
+	"""
+	split = line.strip('\n').split('\t')
+	pmid,annotationType,conceptid,mentions,database = split
+	return int(pmid), annotationType, conceptid, mentions.strip()
+
+def loadAnnotationsFromFile(annotations_filename, pmids):
+	"""
+	Scan the full PubTator file and get the annotations for a set of PMIDs
+	"""
+	pmidToAnnotations = {}
+	pubtatorRowCount = 0
+	with open(annotations_filename) as f:
+		for line in f:
+			pubtatorRowCount += 1
+
+			pmid,annotationType,conceptid,mentions = parseAnnotationLine(line)
+			if len(mentions) > 0 and pmid in pmids:
+				pmidToAnnotations.setdefault(pmid, []).append((annotationType,conceptid,mentions))
+
+	assert pubtatorRowCount > 0, "Unable to load any data from PubTator file (%s). Does file exist?" % annotations_filename
+
+	return pmidToAnnotations
+
+def _writeSortedRecords(records, f):
+	records.sort()
+	for record in records:
+		f.write(INDEX_RECORD.pack(*record))
+	f.flush()
+	f.seek(0)
+
+def _readRecords(f):
+	while True:
+		data = f.read(INDEX_RECORD.size * 10000)
+		if not data:
+			break
+		for record in INDEX_RECORD.iter_unpack(data):
+			yield record
+
+def buildPubtatorIndex(annotations_filename, index_prefix):
+	"""
+	Build the on-disk store of PubTator annotations keyed by PMID. The data file holds the original
+	lines, grouped into runs of consecutive lines for the same PMID, and the index file is a sorted
+	table of (pmid, offset, length) for each run. A PMID may have multiple runs which are kept in file order.
+	"""
+	index_filename, data_filename = getIndexFilenames(index_prefix)
+
+	open_func = gzip.open if annotations_filename.endswith('.gz') else open
+
+	sorted_chunks = []
+	records = []
+	record_count = 0
+
+	with open_func(annotations_filename,'rb') as f_in, open(data_filename,'wb') as f_data:
+		offset = 0
+		run_pmid, run_offset = None, 0
+
+		for line in f_in:
+			pmid = int(line.split(b'\t',1)[0])
+
+			if pmid != run_pmid:
+				if run_pmid is not None:
+					records.append((run_pmid, run_offset, offset-run_offset))
+				run_pmid, run_offset = pmid, offset
+
+				if len(records) >= SORT_CHUNK_SIZE:
+					chunk = tempfile.TemporaryFile()
+					_writeSortedRecords(records, chunk)
+					sorted_chunks.append(chunk)
+					record_count += len(records)
+					records = []
+
+			f_data.write(line)
+			offset += len(line)
+
+		if run_pmid is not None:
+			records.append((run_pmid, run_offset, offset-run_offset))
+
+	record_count += len(records)
+	assert record_count > 0, "Unable to load any data from PubTator file (%s). Does file exist?" % annotations_filename
+
+	records.sort()
+	with open(index_filename,'wb') as f_index:
+		f_index.write(INDEX_MAGIC)
+		for record in heapq.merge(records, *[ _readRecords(chunk) for chunk in sorted_chunks ]):
+			f_index.write(INDEX_RECORD.pack(*record))
+
+	for chunk in sorted_chunks:
+		chunk.close()
+
+	return record_count
+
+class PubtatorIndex:
+	"""
+	Memory-mapped lookup of the PubTator annotations for individual PMIDs using a store built by buildPubtatorIndex
+	"""
+	def __init__(self, index_prefix):
+		index_filename, data_filename = getIndexFilenames(index_prefix)
+
+		assert os.path.isfile(index_filename) and os.path.isfile(data_filename), "PubTator index (%s) does not exist" % index_prefix
+
+		self.f_index = open(index_filename,'rb')
+		self.f_data = open(data_filename,'rb')
+		self.index = mmap.mmap(self.f_index.fileno(), 0, access=mmap.ACCESS_READ)
+		self.data = mmap.mmap(self.f_data.fileno(), 0, access=mmap.ACCESS_READ)
+
+		assert self.index[:len(INDEX_MAGIC)] == INDEX_MAGIC, "Unexpected format for PubTator index (%s)" % index_filename
+		self.record_count = (len(self.index) - len(INDEX_MAGIC)) // INDEX_RECORD.size
+		assert self.record_count > 0, "PubTator index (%s) is empty" % index_filename
+
+	def _getRecord(self, i):
+		return INDEX_RECORD.unpack_from(self.index, len(INDEX_MAGIC) + i*INDEX_RECORD.size)
+
+	def _findFirst(self, pmid):
+		lo, hi = 0, self.record_count
+		while lo < hi:
+			mid = (lo+hi) // 2
+			if self._getRecord(mid)[0] < pmid:
+				lo = mid+1
+			else:
+				hi = mid
+		return lo
+
+	def getAnnotationLines(self, pmid):
+		lines = []
+		i = self._findFirst(pmid)
+		while i < self.record_count:
+			record_pmid, offset, length = self._getRecord(i)
+			if record_pmid != pmid:
+				break
+			run = self.data[offset:offset+length].decode('utf-8')
+			lines += run[:-1].split('\n') if run.endswith('\n') else run.split('\n')
+			i += 1
+		return lines
+
+	def getAnnotations(self, pmids):
+		"""
+		Get the annotations for a set of PMIDs (in the same form as loadAnnotationsFromFile)
+		"""
+		pmidToAnnotations = {}
+		for pmid in sorted(pmids):
+			for line in self.getAnnotationLines(pmid):
+				_,annotationType,conceptid,mentions = parseAnnotationLine(line)
+				if len(mentions) > 0:
+					pmidToAnnotations.setdefault(pmid, []).append((annotationType,conceptid,mentions))
+		return pmidToAnnotations
+
+	def close(self):
+		self.index.close()
+		self.data.close()
+		self.f_index.close()
+		self.f_data.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+def createRegex(mention):
+	mention = re.sub('\s+',' ',mention.strip())
+	m = re.escape(mention)
+	m = m.replace('alpha','(alpha|α)')
+	m = m.replace('beta','(beta|β)')
+	m = m.replace('gamma','(gamma|γ)')
+	m = m.replace('delta','(delta|δ)')
+	m = m.replace('\ ','\s+')
+	return '\\b%s\\b' % m
+
+def getRegexFirstCharacters(regex):
+	"""
+	The characters that a regex from createRegex can start matching with (after its leading word boundary)
+	"""
+	r = regex[2:]
+	if r.startswith('('):
+		return [ alternative[0] for alternative in r[1:r.index(')')].split('|') ]
+	elif r.startswith('\\'):
+		return [ r[1] ]
+	else:
+		return [ r[0] ]
+
+class MentionMatcher:
+	"""
+	Matches all the mentions of a document's annotations against a passage with a single scan. This gives
+	the same hits as running re.finditer with the createRegex pattern of every mention of every annotation.
+
+	The mentions are combined into one lookahead pattern which finds every position where any mention
+	matches. Only the mentions starting with the character at that position are then tried, and each
+	mention only matches again after the end of its previous match (as with re.finditer).
+	"""
+	def __init__(self, annotations):
+		self.patterns = []
+		self.occurrences = []
+
+		pattern_ids = {}
+		for annotationType,conceptid,mentions in annotations:
+			mentions = [ m.strip() for m in mentions.split('|') ]
+			mentions = [ m for m in mentions if m ]
+			for mention in mentions:
+				regex = createRegex(mention)
+				if not regex in pattern_ids:
+					pattern_ids[regex] = len(self.patterns)
+					self.patterns.append(regex)
+				self.occurrences.append((pattern_ids[regex],annotationType,conceptid))
+
+		self.compiled = [ re.compile(regex) for regex in self.patterns ]
+
+		self.patterns_by_first_character = defaultdict(list)
+		for pattern_id,regex in enumerate(self.patterns):
+			for c in getRegexFirstCharacters(regex):
+				self.patterns_by_first_character[c].append(pattern_id)
+
+		self.combined = re.compile('(?=%s)' % '|'.join(self.patterns)) if self.patterns else None
+
+	def findSpans(self, text):
+		"""
+		Get the (start,end) matches for each unique mention pattern
+		"""
+		spans = [ [] for _ in self.patterns ]
+		if self.combined is None:
+			return spans
+
+		last_end = [0] * len(self.patterns)
+		for match in self.combined.finditer(text):
+			start = match.start()
+			for pattern_id in self.patterns_by_first_character[text[start]]:
+				if start < last_end[pattern_id]:
+					continue
+
+				pattern_match = self.compiled[pattern_id].match(text, start)
+				if pattern_match:
+					spans[pattern_id].append(pattern_match.span())
+					last_end[pattern_id] = pattern_match.end()
+
+		return spans
+
+	def findAll(self, text):
+		"""
+		Get all (start, end, annotationType, conceptid) hits in the text, in the same order as searching
+		for each mention of each annotation in turn
+		"""
+		spans = self.findSpans(text)
+
+		hits = []
+		for pattern_id,annotationType,conceptid in self.occurrences:
+			for start,end in spans[pattern_id]:
+				hits.append((start,end,annotationType,conceptid))
+		return hits
+
+def selectLongestNonOverlapping(spans):
+	"""
+	Greedily pick non-overlapping (start,end) spans, taking the longest first (and the later one on ties).
+	Spans that share an endpoint count as overlapping. The chosen spans are returned in the order they were picked.
+
+	The chosen spans don't overlap, so the only one that a candidate can overlap is the chosen span with the
+	largest start that is not after the candidate's end. The chosen starts are counted in a Fenwick tree over
+	all the candidate starts, which finds that span (and adds a new one) in O(log n) time.
+	"""
+	locations = sorted([ (end-start,start,end) for start,end in spans ], reverse=True)
+
+	coords = sorted(set( start for _,start,_ in locations ))
+	size = len(coords)
+	tree = [0] * (size+1)
+	chosen_ends = [None] * size
+	top_bit = 1 << size.bit_length()
+	bisect_left, bisect_right = bisect.bisect_left, bisect.bisect_right
+
+	nonoverlapping = []
+	for _,start,end in locations:
+		# Number of chosen spans that start before or at the end of this one
+		count, i = 0, bisect_right(coords, end)
+		while i > 0:
+			count += tree[i]
+			i -= i & -i
+
+		if count > 0:
+			# Find the position of the last of them by descending the tree
+			pos, bit = 0, top_bit
+			while bit:
+				nxt = pos+bit
+				if nxt <= size and tree[nxt] < count:
+					pos = nxt
+					count -= tree[pos]
+				bit >>= 1
+			if chosen_ends[pos] >= start:
+				continue
+
+		i = bisect_left(coords, start)
+		chosen_ends[i] = end
+		i += 1
+		while i <= size:
+			tree[i] += 1
+			i += i & -i
+		nonoverlapping.append((start,end))
+
+	return nonoverlapping
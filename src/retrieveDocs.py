@@ -9,7 +9,7 @@ import io
 import subprocess
 import json
 
-from dbutils import gunzip_bytes_obj
+from dbutils import DocumentDecompressor, getColumnNames, normalizePMCID
 
 import xml.etree.ElementTree as ET
 
@@ -39,6 +39,33 @@ def mergeInMetadata(fulltext,abstract):
 	xmlstr = ET.tostring(fulltext_root, encoding='utf8', method='html').decode()
 	return xmlstr
 
+def findPMIDsByMetadata(con, tables, pmcids=None, dois=None, year_range=None, journal=None):
+	"""
+	Finds the PMIDs of the documents in the given tables that match all of the provided metadata using the indexed
+	metadata columns (so without decompressing any documents)
+	"""
+	conditions, params = [], []
+	if pmcids:
+		conditions.append('pmcid IN (%s)' % ','.join('?' for _ in pmcids))
+		params += pmcids
+	if dois:
+		conditions.append('doi IN (%s)' % ','.join('?' for _ in dois))
+		params += dois
+	if year_range:
+		conditions.append('year BETWEEN ? AND ?')
+		params += list(year_range)
+	if journal:
+		conditions.append('journal = ?')
+		params.append(journal)
+
+	pmids = set()
+	for table in tables:
+		assert 'pmcid' in getColumnNames(con, table), "Database does not have metadata columns. It must be rebuilt to search by metadata"
+		query = 'SELECT pmid FROM %s WHERE %s' % (table, ' AND '.join(conditions))
+		pmids.update( row[0] for row in con.execute(query, params) )
+
+	return pmids
+
 def main():
 	parser = argparse.ArgumentParser(description='Insert documents into DB')
 	parser.add_argument('--db',required=True,type=str,help='Name of DB file')
@@ -46,6 +73,10 @@ def main():
 	parser.add_argument('--mode',required=True,type=str,help='Whether to get abstracts/fulltext or whichever is available (abstracts/fulltext/all)')
 	parser.add_argument('--pmids',required=False,type=str,help='Comma-delimited set of pmids')
 	parser.add_argument('--pmidfile',required=False,type=str,help='File with PMIDs. Either JSON file or text file with one PMID per line')
+	parser.add_argument('--pmcids',required=False,type=str,help='Comma-delimited set of PMCIDs to select documents by')
+	parser.add_argument('--dois',required=False,type=str,help='Comma-delimited set of DOIs to select documents by')
+	parser.add_argument('--yearRange',required=False,type=str,help='Range of publication years to select documents by (e.g. 2010-2015, or 2010 for a single year)')
+	parser.add_argument('--journal',required=False,type=str,help='Journal name to select documents by')
 	parser.add_argument('--noprettyify',action='store_true',help='Do not prettyify the output BioC document')
 	parser.add_argument('--outFile',required=True,type=str,help='Output file')
 	args = parser.parse_args()
@@ -67,7 +98,9 @@ def main():
 		print("Saved listing of %d full-text documents and %d abstracts" % (fulltext_count,abstract_count))
 		sys.exit(0)
 
-	assert args.pmids or args.pmidfile, "Must provide --pmids or --pmidfile"
+	by_metadata = args.pmcids or args.dois or args.yearRange or args.journal
+
+	assert args.pmids or args.pmidfile or by_metadata, "Must provide --pmids or --pmidfile, or select documents by --pmcids/--dois/--yearRange/--journal"
 	assert not(args.pmids and args.pmidfile), "Must provide only one of --pmids or --pmidfile"
 
 	assert args.mode in ['abstracts','fulltext','all']
@@ -83,6 +116,28 @@ def main():
 				pmids = [ line.strip() for line in f ]
 
 	pmids = [ pmid for pmid in pmids if pmid ]
+
+	if by_metadata:
+		pmcids = [ normalizePMCID(pmcid) for pmcid in args.pmcids.split(',') if pmcid.strip() ] if args.pmcids else None
+		dois = [ doi for doi in args.dois.split(',') if doi ] if args.dois else None
+		year_range = None
+		if args.yearRange:
+			start_year, _, end_year = args.yearRange.partition('-')
+			year_range = (int(start_year), int(end_year or start_year))
+
+		tables = { 'abstracts':['abstracts'], 'fulltext':['fulltext'], 'all':['abstracts','fulltext'] }[args.mode]
+		matching_pmids = findPMIDsByMetadata(con, tables, pmcids, dois, year_range, args.journal)
+
+		# Documents must match both the PMIDs (if provided) and the metadata
+		if args.pmids or args.pmidfile:
+			pmids = [ pmid for pmid in pmids if int(pmid) in matching_pmids ]
+		else:
+			pmids = [ str(pmid) for pmid in sorted(matching_pmids) ]
+
+	# Databases from before the codec column was added only have gzipped documents
+	decompressor = DocumentDecompressor(con)
+	abstracts_codec = 'codec' if 'codec' in getColumnNames(con, 'abstracts') else '0'
+	fulltext_codec = 'codec' if 'codec' in getColumnNames(con, 'fulltext') else '0'
 	
 	written = 0
 	with open(args.outFile,'w') as outF:
@@ -91,16 +146,16 @@ def main():
 
 			abstract,fulltext = None,None
 
-			cur.execute('SELECT compressed FROM abstracts WHERE pmid = ?', (pmid,))
+			cur.execute('SELECT compressed, %s FROM abstracts WHERE pmid = ?' % abstracts_codec, (pmid,))
 			abstract = cur.fetchone()
 			if abstract:
-				abstract = gunzip_bytes_obj(abstract[0])
+				abstract = decompressor.decompress(*abstract)
 
 			if args.mode in ['fulltext','all']:
-				cur.execute('SELECT compressed FROM fulltext WHERE pmid = ?', (pmid,))
+				cur.execute('SELECT compressed, %s FROM fulltext WHERE pmid = ?' % fulltext_codec, (pmid,))
 				fulltext = cur.fetchone()
 				if fulltext:
-					fulltext = gunzip_bytes_obj(fulltext[0])
+					fulltext = decompressor.decompress(*fulltext)
 
 					# Let's pull over some metadata from the PubMed data
 					if abstract:
@@ -0,0 +1,18 @@
+import argparse
+
+from dbutils import trainDictionaryFromBioCFiles, ZDICT_SAMPLE_COUNT, ZDICT_SIZE
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser('Train the preset dictionary that the converters compress documents with (using --zdict)')
+	parser.add_argument('--inBioc',required=True,type=str,nargs='+',help='BioC XML files to sample documents from')
+	parser.add_argument('--sampleCount',required=False,type=int,default=ZDICT_SAMPLE_COUNT,help='How many documents to sample from the start of each file (default: %d)' % ZDICT_SAMPLE_COUNT)
+	parser.add_argument('--outFile',required=True,type=str,help='File to save the dictionary to')
+	args = parser.parse_args()
+
+	zdict = trainDictionaryFromBioCFiles(args.inBioc, args.sampleCount, ZDICT_SIZE)
+	assert len(zdict) > 0, "No documents found to train the dictionary on"
+
+	with open(args.outFile,'wb') as f:
+		f.write(zdict)
+
+	print("Saved %d byte dictionary to %s" % (len(zdict), args.outFile))
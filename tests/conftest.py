@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+from bioconverters.xmlbackend import XML_BACKENDS, get_xml_backend, lxml_etree, set_xml_backend
+
+# The pipeline scripts (and their shared modules) are not part of the package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+@pytest.fixture(scope='module', params=XML_BACKENDS)
+def xml_backend(request):
+    """
+    Runs the tests that use it with each of the XML parsing backends
+    """
+    if request.param == 'lxml' and lxml_etree is None:
+        pytest.skip('lxml is not installed')
+
+    previous_backend = get_xml_backend()
+    set_xml_backend(request.param)
+    yield request.param
+    set_xml_backend(previous_backend)
@@ -0,0 +1,467 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from xml.etree import ElementTree
+
+import bioc
+import pytest
+from bioc.biocxml.encoder import encode_document
+from lxml import etree as lxml_etree
+
+import dbutils
+from dbutils import (
+    DocumentDatabaseWriter,
+    DocumentDecompressor,
+    kwayMergeDBs,
+    mergeDBs,
+    saveDocumentsToDatabase,
+    serializeDocument,
+)
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+
+
+def make_document(pmid, text, year=2020, journal='Journal of Tests', pmcid=None, doi=None):
+    doc = bioc.BioCDocument()
+    doc.id = str(pmid)
+    doc.infons['pmid'] = str(pmid)
+    doc.infons['pmcid'] = pmcid
+    doc.infons['doi'] = doi
+    doc.infons['year'] = year
+    doc.infons['journal'] = journal
+    passage = bioc.BioCPassage()
+    passage.infons['section'] = 'abstract'
+    passage.offset = 0
+    passage.text = text
+    doc.add_passage(passage)
+    return doc
+
+
+def make_documents(pmids, version=1):
+    return [make_document(pmid, 'Version %d of document %d about %s.' % (version, pmid, 'genes ' * pmid)) for pmid in pmids]
+
+
+def write_db(filename, docs, is_fulltext=False, file_index=1, **kwargs):
+    writer = DocumentDatabaseWriter(str(filename), is_fulltext=is_fulltext, file_index=file_index, **kwargs)
+    for doc in docs:
+        writer.write_document(doc)
+    writer.close()
+    return str(filename)
+
+
+def write_bioc_file(filename, docs):
+    writer = bioc.biocxml.BioCXMLDocumentWriter(str(filename))
+    for doc in docs:
+        writer.write_document(doc)
+    writer.close()
+    return str(filename)
+
+
+def read_table(db_filename, table='abstracts'):
+    """
+    Gets {pmid: (xml, hash, time field)} with the decompressed documents of a table
+    """
+    con = sqlite3.connect(db_filename)
+    decompressor = DocumentDecompressor(con)
+    time_field = dbutils.TIME_FIELDS[table]
+    rows = {
+        pmid: (decompressor.decompress(compressed, codec), content_hash, time_value)
+        for pmid, compressed, codec, content_hash, time_value in con.execute(
+            f'SELECT pmid, compressed, codec, hash, {time_field} FROM {table}'
+        )
+    }
+    con.close()
+    return rows
+
+
+@pytest.fixture(scope='module')
+def zdict():
+    return dbutils.trainDictionary(serializeDocument(encode_document(doc)) for doc in make_documents(range(1, 50)))
+
+
+def get_zdict(request, use_zdict):
+    return request.getfixturevalue('zdict') if use_zdict else None
+
+
+def passage_texts(xmlstr):
+    return [passage.text for passage in bioc.biocxml.loads('<collection>%s</collection>' % xmlstr).documents[0].passages]
+
+
+@pytest.mark.parametrize('use_zdict', [False, True])
+@pytest.mark.parametrize('batch_size', [1, 7, dbutils.DEFAULT_BATCH_SIZE])
+def test_writer_round_trip(tmp_path, request, use_zdict, batch_size):
+    docs = make_documents(range(1, 26))
+    zdict = get_zdict(request, use_zdict)
+    db_filename = write_db(tmp_path / 'docs.sqlite', docs, batch_size=batch_size, zdict=zdict)
+
+    rows = read_table(db_filename)
+    assert sorted(rows) == list(range(1, 26))
+    for doc in docs:
+        xmlstr, _, file_index = rows[int(doc.id)]
+        assert xmlstr == serializeDocument(encode_document(doc))
+        assert file_index == 1
+
+    con = sqlite3.connect(db_filename)
+    codecs = set(row[0] for row in con.execute('SELECT codec FROM abstracts'))
+    dictionaries = con.execute('SELECT id, zdict FROM dictionaries').fetchall()
+    con.close()
+    if zdict is None:
+        assert codecs == {dbutils.CODEC_GZIP} and dictionaries == []
+    else:
+        # the dictionary is stored by its id
+        assert dictionaries == [(dbutils.calcSHA256_AsInt(zdict), zdict)]
+        assert codecs == {dictionaries[0][0]}
+
+
+def test_writer_skips_documents_without_or_with_repeated_pmid(tmp_path, capsys):
+    docs = make_documents([1, 2])
+    no_id = make_document(3, 'No id')
+    no_id.id = None
+    db_filename = write_db(tmp_path / 'docs.sqlite', docs + [no_id] + make_documents([1], version=2))
+
+    rows = read_table(db_filename)
+    assert sorted(rows) == [1, 2]
+    # the first document with a PMID is kept
+    assert passage_texts(rows[1][0]) == [docs[0].passages[0].text]
+    assert 'Stored 2 abstracts' in capsys.readouterr().out
+
+
+def test_writer_uses_build_pragmas(tmp_path):
+    db_filename = write_db(tmp_path / 'docs.sqlite', make_documents([1]))
+
+    con = sqlite3.connect(db_filename)
+    assert con.execute('PRAGMA page_size').fetchone()[0] == 8192
+    con.close()
+    assert not os.path.exists(db_filename + '-journal')
+
+
+def test_writer_fills_in_metadata(tmp_path):
+    docs = [
+        make_document(1, 'One', year=2001, pmcid='PMC11', doi='10.1/one'),
+        make_document(2, 'Two', year=None, journal='', pmcid=None, doi=None),
+    ]
+    db_filename = write_db(tmp_path / 'docs.sqlite', docs, is_fulltext=True)
+
+    con = sqlite3.connect(db_filename)
+    rows = con.execute('SELECT pmid, pmcid, doi, year, journal FROM fulltext ORDER BY pmid').fetchall()
+    con.close()
+    assert rows == [(1, 'PMC11', '10.1/one', 2001, 'Journal of Tests'), (2, None, None, None, None)]
+
+
+def read_hashes(db_filename, table='abstracts'):
+    return {pmid: content_hash for pmid, (_, content_hash, _) in read_table(db_filename, table).items()}
+
+
+@pytest.mark.parametrize('pretty_print', [False, True])
+def test_content_hash_is_the_same_for_documents_and_xml(tmp_path, pretty_print):
+    docs = make_documents([1, 2]) + [make_document(3, ' '), make_document(4, 'Entities & <tags> and λ')]
+
+    from_documents = write_db(tmp_path / 'documents.sqlite', docs)
+
+    writer = DocumentDatabaseWriter(str(tmp_path / 'xml.sqlite'), is_fulltext=False, file_index=1)
+    for doc in docs:
+        xmlstr = lxml_etree.tostring(encode_document(doc), encoding='unicode', pretty_print=pretty_print)
+        writer.write_xml(int(doc.id), xmlstr)
+    writer.close()
+
+    bioc_filename = str(tmp_path / 'docs.bioc.xml')
+    with open(bioc_filename, 'w') as f:
+        f.write('<collection>\n%s</collection>' % ''.join(
+            lxml_etree.tostring(encode_document(doc), encoding='unicode', pretty_print=pretty_print) for doc in docs
+        ))
+    from_file = str(tmp_path / 'file.sqlite')
+    saveDocumentsToDatabase(from_file, bioc_filename, is_fulltext=False, file_index=1)
+
+    assert read_hashes(from_documents) == read_hashes(str(tmp_path / 'xml.sqlite')) == read_hashes(from_file)
+    # whitespace inside the text still counts
+    assert len(set(read_hashes(from_documents).values())) == len(docs)
+
+
+def test_read_documents_from_bioc_file(tmp_path, xml_backend):
+    docs = make_documents([1, 2]) + [make_document(None, 'No PMID'), make_document(3, 'Entities & <tags> and λ')]
+    bioc_filename = write_bioc_file(tmp_path / 'docs.bioc.xml', docs)
+
+    # the same as serializing the documents from the standard library parser, whichever backend is in use
+    with open(bioc_filename) as f:
+        root = ElementTree.fromstring(f.read())
+    expected = [
+        (int(elem.find('id').text), ElementTree.tostring(elem, encoding='utf8', method='html').decode())
+        for elem in root.iter('document')
+        if elem.find('id').text != 'None'
+    ]
+    assert [pmid for pmid, _ in expected] == [1, 2, 3]
+    assert list(dbutils.readDocumentsFromBioCFile(bioc_filename)) == expected
+
+
+@pytest.mark.parametrize('use_zdict', [False, True])
+def test_save_documents_from_bioc_file(tmp_path, request, xml_backend, use_zdict):
+    docs = make_documents(range(1, 11)) + [make_document(11, 'Entities & <tags> and λ')]
+    bioc_filename = write_bioc_file(tmp_path / 'docs.bioc.xml', docs)
+    db_filename = str(tmp_path / 'docs.sqlite')
+
+    # the documents are always read with the standard library parser, whichever backend is in use
+    saveDocumentsToDatabase(db_filename, bioc_filename, is_fulltext=False, file_index=3, batch_size=4, zdict=get_zdict(request, use_zdict))
+
+    rows = read_table(db_filename)
+    assert sorted(rows) == list(range(1, 12))
+    for doc in docs:
+        xmlstr, _, file_index = rows[int(doc.id)]
+        assert passage_texts(xmlstr) == [doc.passages[0].text]
+        assert file_index == 3
+
+
+def make_merge_inputs(tmp_path):
+    # the time field for abstracts is the file index, so c is older than a and b
+    a = write_db(tmp_path / 'a.sqlite', make_documents([1, 2, 3, 4]), file_index=2)
+    b = write_db(tmp_path / 'b.sqlite', make_documents([3], version=2) + make_documents([4, 5, 6]), file_index=3)
+    c = write_db(tmp_path / 'c.sqlite', make_documents([6], version=3) + make_documents([7]), file_index=1)
+    return [a, b, c]
+
+
+EXPECTED_VERSIONS = {1: (1, 2), 2: (1, 2), 3: (2, 3), 4: (1, 2), 5: (1, 3), 6: (1, 3), 7: (1, 1)}
+
+
+@pytest.mark.parametrize('mode', ['copy', 'in_place', 'kway'])
+def test_merge_keeps_latest_versions(tmp_path, capsys, mode):
+    input_dbs = make_merge_inputs(tmp_path)
+    output_db = str(tmp_path / 'merged.sqlite')
+
+    if mode == 'kway':
+        kwayMergeDBs(input_dbs, output_db)
+    else:
+        mergeDBs(input_dbs, output_db, in_place=(mode == 'in_place'))
+
+    rows = read_table(output_db)
+    assert sorted(rows) == sorted(EXPECTED_VERSIONS)
+    for pmid, (version, file_index) in EXPECTED_VERSIONS.items():
+        xmlstr, _, time_value = rows[pmid]
+        assert passage_texts(xmlstr)[0].startswith('Version %d of' % version)
+        assert time_value == file_index
+
+    # the first input is copied when not merging with a k-way merge, so its documents are not counted
+    inserted = 7 if mode == 'kway' else 3
+    assert (
+        'Merged abstracts: %d inserted, 1 replaced, 1 unchanged (skipped), 1 older (skipped)' % inserted
+        in capsys.readouterr().out
+    )
+    assert not os.path.exists(output_db + '.tmp')
+
+
+def test_merge_into_existing_database(tmp_path):
+    a, b, c = make_merge_inputs(tmp_path)
+    output_db = str(tmp_path / 'merged.sqlite')
+
+    mergeDBs([a], output_db)
+    mergeDBs([b, c], output_db, in_place=True)
+
+    rows = read_table(output_db)
+    assert {pmid: time_value for pmid, (_, _, time_value) in rows.items()} == {
+        pmid: file_index for pmid, (_, file_index) in EXPECTED_VERSIONS.items()
+    }
+
+
+def test_merge_many_inputs_in_groups(tmp_path):
+    # more inputs than can be attached (or opened with max_open) at once, with every document updated along the way
+    input_dbs = [
+        write_db(tmp_path / ('in%02d.sqlite' % i), make_documents(range(i, i + 5), version=i), file_index=i + 1)
+        for i in range(dbutils.MAX_ATTACHED_DBS * 2 + 3)
+    ]
+
+    merged = {}
+    for mode in ['in_place', 'kway']:
+        output_db = str(tmp_path / ('%s.sqlite' % mode))
+        if mode == 'kway':
+            kwayMergeDBs(input_dbs, output_db, max_open=4)
+        else:
+            mergeDBs(input_dbs, output_db, in_place=True)
+        merged[mode] = read_table(output_db)
+
+    assert merged['in_place'] == merged['kway']
+    last = len(input_dbs) - 1
+    assert passage_texts(merged['kway'][last + 4][0])[0].startswith('Version %d of' % last)
+
+
+@pytest.mark.parametrize('merge', [mergeDBs, kwayMergeDBs])
+def test_merge_truncates_inputs(tmp_path, merge):
+    input_dbs = make_merge_inputs(tmp_path)
+    output_db = str(tmp_path / 'merged.sqlite')
+
+    merge(input_dbs, output_db, truncate_inputs=True)
+
+    assert all(os.path.getsize(input_db) == 0 for input_db in input_dbs)
+    assert len(read_table(output_db)) == len(EXPECTED_VERSIONS)
+
+    # empty inputs are skipped when merging again
+    merge(input_dbs, output_db)
+    assert len(read_table(output_db)) == len(EXPECTED_VERSIONS)
+
+
+def retrieve_docs(db_filename, out_filename, *args):
+    subprocess.run(
+        [sys.executable, os.path.join(SRC_DIR, 'retrieveDocs.py'), '--db', db_filename, '--outFile', str(out_filename), '--noprettyify']
+        + list(args),
+        check=True,
+        stdout=subprocess.PIPE,
+    )
+    return bioc.biocxml.load(open(out_filename)).documents
+
+
+@pytest.mark.parametrize('use_zdict', [False, True])
+def test_write_merge_and_retrieve(tmp_path, request, use_zdict):
+    zdict = get_zdict(request, use_zdict)
+    abstracts = write_db(tmp_path / 'abstracts.sqlite', make_documents([1, 2, 3]), zdict=zdict)
+    fulltext_docs = [make_document(2, 'Full text of document 2', journal='Full Text Journal')]
+    fulltext = write_db(tmp_path / 'fulltext.sqlite', fulltext_docs, is_fulltext=True, zdict=zdict)
+    output_db = str(tmp_path / 'merged.sqlite')
+    kwayMergeDBs([abstracts, fulltext], output_db)
+
+    docs = retrieve_docs(output_db, tmp_path / 'out.xml', '--mode', 'all', '--pmids', '1,2,4')
+
+    assert [doc.id for doc in docs] == ['1', '2']
+    assert [p.text for p in docs[1].passages] == ['Full text of document 2']
+    # the full text takes the metadata of the abstract
+    assert docs[1].infons['journal'] == 'Journal of Tests'
+
+    # the databases share the dictionary, so the merged database only has one copy of it
+    con = sqlite3.connect(output_db)
+    assert con.execute('SELECT COUNT(*) FROM dictionaries').fetchone()[0] == (1 if use_zdict else 0)
+    con.close()
+
+
+def test_train_dictionary_from_bioc_files(tmp_path):
+    bioc_filenames = [
+        write_bioc_file(tmp_path / 'a.bioc.xml', make_documents(range(1, 30))),
+        write_bioc_file(tmp_path / 'b.bioc.xml', [make_document(pmid, 'Other text about proteins') for pmid in range(30, 40)]),
+    ]
+
+    zdict = dbutils.trainDictionaryFromBioCFiles(bioc_filenames, sample_count=5, size=4096)
+
+    samples = [xmlstr for filename in bioc_filenames for _, xmlstr in list(dbutils.readDocumentsFromBioCFile(filename))[:5]]
+    assert zdict == dbutils.trainDictionary(samples, 4096)
+    assert 0 < len(zdict) <= 4096 and b'proteins' in zdict
+
+
+@pytest.mark.parametrize(
+    'infons,expected',
+    [
+        ({'pmcid': 'PMC1', 'doi': '10.1/x', 'year': 2001, 'journal': 'J'}, ('PMC1', '10.1/x', 2001, 'J')),
+        ({'pmcid': ' PMC2 ', 'year': ' 1999 ', 'journal': 'A journal'}, ('PMC2', None, 1999, 'A journal')),
+        ({'pmcid': '123', 'journal': 'J'}, ('PMC123', None, None, 'J')),
+        ({'pmcid': 'pmc456'}, ('PMC456', None, None, None)),
+        ({'pmcid': 'NIHMS789'}, ('NIHMS789', None, None, None)),
+        ({'pmcid': 'None', 'doi': '', 'year': None, 'journal': '  '}, (None, None, None, None)),
+        ({'year': '2010-2011'}, (None, None, None, None)),
+        ({}, (None, None, None, None)),
+    ],
+)
+def test_get_metadata(infons, expected):
+    assert dbutils.getMetadata(infons) == expected
+
+
+def write_old_db(filename, abstracts, fulltext):
+    # The schema from before the codec and metadata columns were added
+    con = sqlite3.connect(str(filename))
+    con.execute('CREATE TABLE fulltext(pmid INTEGER PRIMARY KEY ASC, compressed BLOB, hash INTEGER, updated INTEGER);')
+    con.execute('CREATE TABLE abstracts(pmid INTEGER PRIMARY KEY ASC, compressed BLOB, hash INTEGER, updated INTEGER, file_index INTEGER);')
+    for doc in abstracts:
+        compressed = dbutils.gzip_str(serializeDocument(encode_document(doc)))
+        con.execute('INSERT INTO abstracts VALUES (?,?,?,?,?)', (int(doc.id), compressed, int(doc.id), 0, 1))
+    for doc in fulltext:
+        compressed = dbutils.gzip_str(serializeDocument(encode_document(doc)))
+        con.execute('INSERT INTO fulltext VALUES (?,?,?,?)', (int(doc.id), compressed, int(doc.id), 0))
+    con.commit()
+    con.close()
+    return str(filename)
+
+
+def make_metadata_documents():
+    abstracts = [
+        make_document(1, 'One', year=2001, journal='Journal A', pmcid='PMC11', doi='10.1/one'),
+        make_document(2, 'Two', year=2005, journal='Journal B'),
+        make_document(3, 'Three', year=2010, journal='Journal A', doi='10.1/three'),
+        make_document(4, 'Four', year=None, journal=None),
+    ]
+    fulltext = [
+        make_document(3, 'Three in full', year=2010, journal='Journal A', pmcid='PMC33', doi='10.1/three'),
+        # PMC OA articles often give the PMCID without its prefix
+        make_document(5, 'Five in full', year=2012, journal='Journal C', pmcid='55'),
+    ]
+    return abstracts, fulltext
+
+
+def test_upgrade_db_schema_fills_in_metadata(tmp_path):
+    abstracts, fulltext = make_metadata_documents()
+    db_filename = write_old_db(tmp_path / 'old.sqlite', abstracts, fulltext)
+
+    dbutils.upgradeDBSchema(db_filename, batch_size=3)
+
+    con = sqlite3.connect(db_filename)
+    assert con.execute('SELECT pmid, codec, pmcid, doi, year, journal FROM abstracts ORDER BY pmid').fetchall() == [
+        (1, 0, 'PMC11', '10.1/one', 2001, 'Journal A'),
+        (2, 0, None, None, 2005, 'Journal B'),
+        (3, 0, None, '10.1/three', 2010, 'Journal A'),
+        (4, 0, None, None, None, None),
+    ]
+    assert con.execute('SELECT pmid, codec, pmcid, doi, year, journal FROM fulltext ORDER BY pmid').fetchall() == [
+        (3, 0, 'PMC33', '10.1/three', 2010, 'Journal A'),
+        (5, 0, 'PMC55', None, 2012, 'Journal C'),
+    ]
+    indices = set(row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'index'"))
+    assert {'abstracts_year', 'fulltext_pmcid'} <= indices
+    con.close()
+
+    # the upgraded database can be merged with a new one
+    assert dbutils.getDBSchema(db_filename) == dbutils.getDBSchema(write_db(tmp_path / 'new.sqlite', []))
+    new_db = write_db(tmp_path / 'new.sqlite', [make_document(5, 'Five', year=2020)], file_index=2)
+    kwayMergeDBs([new_db], db_filename)
+    assert sorted(read_table(db_filename)) == [1, 2, 3, 4, 5]
+
+
+def test_upgrade_db_schema_leaves_upgraded_databases_alone(tmp_path):
+    db_filename = write_db(tmp_path / 'new.sqlite', [make_document(1, 'One', year=2001)])
+    con = sqlite3.connect(db_filename)
+    con.execute('UPDATE abstracts SET year = NULL')
+    con.commit()
+    con.close()
+    schema = dbutils.getDBSchema(db_filename)
+
+    dbutils.upgradeDBSchema(db_filename)
+
+    # the metadata is only filled in when the columns are added
+    assert dbutils.getDBSchema(db_filename) == schema
+    con = sqlite3.connect(db_filename)
+    assert con.execute('SELECT year FROM abstracts').fetchall() == [(None,)]
+    con.close()
+
+
+@pytest.mark.parametrize('upgraded', [False, True])
+def test_find_pmids_by_metadata(tmp_path, upgraded):
+    from retrieveDocs import findPMIDsByMetadata
+
+    abstracts, fulltext = make_metadata_documents()
+    if upgraded:
+        db_filename = write_old_db(tmp_path / 'docs.sqlite', abstracts, fulltext)
+        dbutils.upgradeDBSchema(db_filename)
+    else:
+        db_filename = str(tmp_path / 'docs.sqlite')
+        kwayMergeDBs(
+            [write_db(tmp_path / 'abstracts.sqlite', abstracts), write_db(tmp_path / 'fulltext.sqlite', fulltext, is_fulltext=True)],
+            db_filename,
+        )
+
+    con = sqlite3.connect(db_filename)
+    both = ['abstracts', 'fulltext']
+    assert findPMIDsByMetadata(con, both, pmcids=['PMC11', 'PMC33', 'PMC55']) == {1, 3, 5}
+    assert findPMIDsByMetadata(con, ['abstracts'], pmcids=['PMC33']) == set()
+    assert findPMIDsByMetadata(con, both, dois=['10.1/three', '10.1/missing']) == {3}
+    assert findPMIDsByMetadata(con, both, year_range=(2001, 2005)) == {1, 2}
+    assert findPMIDsByMetadata(con, both, journal='Journal A') == {1, 3}
+    assert findPMIDsByMetadata(con, both, year_range=(2002, 2010), journal='Journal A') == {3}
+    con.close()
+
+    docs = retrieve_docs(db_filename, tmp_path / 'out.xml', '--mode', 'abstracts', '--yearRange', '2005-2010')
+    assert [doc.id for doc in docs] == ['2', '3']
+    # the stored numeric PMCID is found with or without the prefix
+    docs = retrieve_docs(db_filename, tmp_path / 'out.xml', '--mode', 'fulltext', '--pmcids', '55,PMC33')
+    assert [doc.id for doc in docs] == ['3', '5']
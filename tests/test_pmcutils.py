@@ -0,0 +1,121 @@
+import io
+import os
+import tarfile
+
+import pytest
+
+import pmcutils
+from pmcutils import (
+    IndexedArchive,
+    findPMCIDsInArchives,
+    getIndexFilenames,
+    hasArchiveIndex,
+    iterateAndIndexArchive,
+    readArchiveMembers,
+)
+
+requires_indexed_gzip = pytest.mark.skipif(
+    pmcutils.indexed_gzip is None, reason='indexed_gzip is not installed'
+)
+
+
+def write_archive(filename, articles):
+    with tarfile.open(filename, 'w:gz') as tar:
+        for name, content in articles.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+
+
+def make_articles(pmcids, version=1):
+    return {
+        'dir/%s.nxml' % pmcid: ('<article><p>%s v%d %s</p></article>' % (pmcid, version, 'x' * 1000)).encode()
+        for pmcid in pmcids
+    }
+
+
+def index_archive(filename):
+    return [member.name for member in iterateAndIndexArchive(filename)]
+
+
+def test_iterate_archive_yields_every_member(tmp_path):
+    articles = make_articles(['PMC1', 'PMC2', 'PMC3'])
+    archive_filename = str(tmp_path / 'archive.tar.gz')
+    write_archive(archive_filename, articles)
+
+    assert index_archive(archive_filename) == list(articles)
+    assert hasArchiveIndex(archive_filename) == (pmcutils.indexed_gzip is not None)
+
+
+@requires_indexed_gzip
+def test_iterate_archive_saves_index(tmp_path):
+    archive_filename = str(tmp_path / 'archive.tar.gz')
+    write_archive(archive_filename, make_articles(['PMC1', 'PMC2']))
+
+    # the index is only written once the iteration has finished
+    members = iterateAndIndexArchive(archive_filename)
+    next(members)
+    assert not hasArchiveIndex(archive_filename)
+    list(members)
+
+    assert all(os.path.isfile(f) for f in getIndexFilenames(archive_filename))
+    assert hasArchiveIndex(archive_filename)
+
+
+@requires_indexed_gzip
+def test_indexed_archive_reads_members(tmp_path):
+    articles = make_articles(['PMC%d' % i for i in range(50)])
+    archive_filename = str(tmp_path / 'archive.tar.gz')
+    write_archive(archive_filename, articles)
+    index_archive(archive_filename)
+
+    with IndexedArchive(archive_filename) as archive:
+        assert set(archive.members) == set(articles)
+        # out of order, so that it has to seek backwards
+        for name in reversed(list(articles)):
+            assert archive.read(name) == articles[name]
+
+
+def test_indexed_archive_requires_index(tmp_path):
+    archive_filename = str(tmp_path / 'archive.tar.gz')
+    write_archive(archive_filename, make_articles(['PMC1']))
+
+    with pytest.raises(AssertionError):
+        IndexedArchive(archive_filename)
+
+
+@pytest.mark.parametrize('indexed', [False, pytest.param(True, marks=requires_indexed_gzip)])
+def test_read_archive_members(tmp_path, indexed):
+    articles = make_articles(['PMC1', 'PMC2', 'PMC3', 'PMC4'])
+    archive_filename = str(tmp_path / 'archive.tar.gz')
+    write_archive(archive_filename, articles)
+    if indexed:
+        index_archive(archive_filename)
+    assert hasArchiveIndex(archive_filename) == indexed
+
+    requested = ['dir/PMC3.nxml', 'dir/PMC1.nxml', 'dir/missing.nxml']
+    found = [(name, f.read()) for name, f in readArchiveMembers(archive_filename, requested)]
+
+    # in the order they are stored in the archive
+    assert found == [(name, articles[name]) for name in ['dir/PMC1.nxml', 'dir/PMC3.nxml']]
+
+
+@requires_indexed_gzip
+def test_find_pmcids_in_archives(tmp_path):
+    baseline = str(tmp_path / 'baseline.tar.gz')
+    update = str(tmp_path / 'update.tar.gz')
+    unindexed = str(tmp_path / 'unindexed.tar.gz')
+    write_archive(baseline, make_articles(['PMC1', 'PMC2']))
+    write_archive(update, make_articles(['PMC2', 'PMC3'], version=2))
+    write_archive(unindexed, make_articles(['PMC4']))
+    index_archive(baseline)
+    index_archive(update)
+
+    locations = findPMCIDsInArchives(str(tmp_path), ['PMC1', 'PMC2', 'PMC3', 'PMC4', 'PMC5'])
+
+    # the later archive wins and archives without an index are skipped
+    assert locations == {
+        'PMC1': (baseline, 'dir/PMC1.nxml'),
+        'PMC2': (update, 'dir/PMC2.nxml'),
+        'PMC3': (update, 'dir/PMC3.nxml'),
+    }
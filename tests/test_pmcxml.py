@@ -1,13 +1,16 @@
-from io import StringIO
+from io import BytesIO, StringIO
 
 import bioc
 import pytest
 
-from bioconverters.main import docs2bioc
+from bioconverters.main import convert, docs2bioc
 from bioconverters.utils import TABLE_DELIMITER, TextChunk
+from bioconverters.xmlbackend import XML_BACKENDS, get_xml_backend, lxml_etree, set_xml_backend
 
 from .util import fetch_xml
 
+pytestmark = pytest.mark.usefixtures('xml_backend')
+
 
 @pytest.fixture(scope='module')
 def table_article():
@@ -79,3 +82,93 @@ def test_citation_offset(citation_offset_article):
     # https://github.com/jakelever/biotext/issues/9
     file = StringIO(citation_offset_article)
     list(docs2bioc(file, 'pmcxml', trim_sentences=False, mark_citations=True))
+
+
+def test_citation_markers_are_reproducible(citation_offset_article):
+    def convert_article():
+        collection = bioc.BioCCollection()
+        file = StringIO(citation_offset_article)
+        for doc in docs2bioc(file, 'pmcxml', trim_sentences=False, mark_citations=True):
+            collection.add_document(doc)
+        return bioc.biocxml.dumps(collection)
+
+    first = convert_article()
+    assert 'citation_text' in first
+    assert first == convert_article()
+
+
+def test_xml_backends_give_identical_output():
+    article = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<!-- comments and processing instructions are skipped by both parsers -->\n'
+        '<article><front><article-meta><article-id pub-id-type="pmid">1</article-id>'
+        '<title-group><article-title>A <italic>test</italic> title</article-title></title-group>'
+        '</article-meta></front><body><sec><title>Intro<?pi ignored?></title>'
+        '<p>Text with a citation <xref ref-type="bibr" rid="b1">1</xref> and an entity &amp;'
+        '<!-- a comment --> joined.</p><table-wrap><table><tr><td>a</td><td></td><td>&#955;</td></tr>'
+        '</table></table-wrap></sec></body></article>'
+    )
+
+    outputs = []
+    previous_backend = get_xml_backend()
+    try:
+        for backend in XML_BACKENDS:
+            if backend == 'lxml' and lxml_etree is None:
+                continue
+            set_xml_backend(backend)
+            collection = bioc.BioCCollection()
+            for doc in docs2bioc(StringIO(article), 'pmcxml', trim_sentences=False, mark_citations=True):
+                collection.add_document(doc)
+            outputs.append(bioc.biocxml.dumps(collection))
+    finally:
+        set_xml_backend(previous_backend)
+
+    assert 'joined' in outputs[0]
+    assert all(output == outputs[0] for output in outputs)
+
+
+@pytest.mark.parametrize('as_bytes', [True, False])
+def test_xlink_namespace_added_while_streaming(as_bytes):
+    article = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<article\n    article-type="research-article"><front><article-meta>'
+        '<article-id pub-id-type="pmid">1</article-id></article-meta></front>'
+        '<body><p>Structures for λ <ext-link xlink:href="http://www.pdb.org">www.pdb.org</ext-link>.</p></body></article>'
+    )
+    source = BytesIO(article.encode('utf-8')) if as_bytes else StringIO(article)
+
+    docs = list(docs2bioc(source, 'pmcxml', trim_sentences=False))
+
+    assert len(docs) == 1
+    assert 'Structures for λ.' in [passage.text for passage in docs[0].passages]
+
+
+@pytest.mark.parametrize('out_format', ['biocxml', 'txt'])
+def test_convert_with_workers_keeps_input_order(tmp_path, out_format):
+    in_files = []
+    for i in range(6):
+        in_file = tmp_path / f'article{i}.xml'
+        in_file.write_text(
+            f'<article><front><article-meta><article-id pub-id-type="pmid">{i + 1}</article-id>'
+            f'</article-meta></front><body><p>Text of article {i}.</p></body></article>'
+        )
+        in_files.append(str(in_file))
+
+    outputs = []
+    for workers in [1, 3]:
+        out_file = tmp_path / f'out{workers}.{out_format}'
+        convert(in_files, 'pmcxml', str(out_file), out_format, workers=workers)
+        outputs.append(out_file.read_text())
+
+    assert outputs[0].index('article 0') < outputs[0].index('article 5')
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_convert_reports_failed_file(tmp_path, workers):
+    in_files = [tmp_path / 'good.xml', tmp_path / 'bad.xml']
+    in_files[0].write_text('<article><body><p>Fine.</p></body></article>')
+    in_files[1].write_text('<article><body><p>Not closed</body></article>')
+
+    with pytest.raises(RuntimeError, match='bad.xml'):
+        convert([str(f) for f in in_files], 'pmcxml', str(tmp_path / 'out.txt'), 'txt', workers=workers)
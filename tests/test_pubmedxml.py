@@ -1,14 +1,21 @@
-from io import StringIO
+import gc
+import tracemalloc
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from xml.etree import ElementTree
 
+import bioc
 import pytest
+from bioconverters import pubmedxml, xmlbackend
 from bioconverters.main import docs2bioc
+from bioconverters.pubmedxml import process_medline_file, pubmedxml2bioc, split_medline_file
 from bioconverters.utils import TABLE_DELIMITER
 
 from .util import fetch_xml
 
 
 @pytest.fixture(scope='module')
-def doc():
+def doc(xml_backend):
     article = fetch_xml('20628391', 'pubmed')  # has a table to be processed in it
     file = StringIO(article)
     return list(docs2bioc(file, 'pubmedxml', trim_sentences=False))[0]
@@ -39,3 +46,225 @@ def test_convert_has_expected_sections(doc):
 )
 def test_metadata_infons(doc, infon, value):
     assert doc.infons[infon] == value
+
+
+def test_medline_fields(xml_backend):
+    article = """<PubmedArticleSet><PubmedArticle>
+    <MedlineCitation Status="MEDLINE" Owner="NLM">
+        <PMID Version="1">123</PMID>
+        <Article PubModel="Print">
+            <Journal>
+                <JournalIssue CitedMedium="Print"><PubDate><MedlineDate>1998 Dec-1999 Jan</MedlineDate></PubDate></JournalIssue>
+                <Title>Journal of Tests</Title>
+                <ISOAbbreviation>J Test</ISOAbbreviation>
+            </Journal>
+            <ArticleTitle>[A <i>title</i> (  )].</ArticleTitle>
+            <Abstract>
+                <AbstractText Label="BACKGROUND">First &lt;part&gt; [ ].</AbstractText>
+                <AbstractText Label="RESULTS">Second part.</AbstractText>
+            </Abstract>
+            <AuthorList>
+                <Author><LastName>Smith</LastName><ForeName>Jane</ForeName></Author>
+                <Author><LastName>Jones</LastName></Author>
+                <Author><CollectiveName>The Test Group</CollectiveName></Author>
+            </AuthorList>
+            <PublicationTypeList>
+                <PublicationType UI="D016428">Journal Article</PublicationType>
+                <PublicationType UI="D013485">Research Support, Non-U.S. Gov't</PublicationType>
+                <PublicationType UI="D016454">Review</PublicationType>
+            </PublicationTypeList>
+        </Article>
+        <ChemicalList><Chemical><RegistryNumber>0</RegistryNumber><NameOfSubstance UI="D000001">Chemical</NameOfSubstance></Chemical></ChemicalList>
+        <SupplMeshList><SupplMeshName Type="Disease" UI="C000001">Concept</SupplMeshName></SupplMeshList>
+        <MeshHeadingList>
+            <MeshHeading>
+                <DescriptorName UI="D000002" MajorTopicYN="N">Term</DescriptorName>
+                <QualifierName UI="Q000001" MajorTopicYN="Y">qualifier</QualifierName>
+            </MeshHeading>
+        </MeshHeadingList>
+    </MedlineCitation>
+    <PubmedData>
+        <History>
+            <PubMedPubDate PubStatus="received"><Year>1998</Year><Month>1</Month><Day>2</Day></PubMedPubDate>
+            <PubMedPubDate PubStatus="pubmed"><Year>1999</Year><Month>3</Month><Day>4</Day></PubMedPubDate>
+        </History>
+        <ArticleIdList>
+            <ArticleId IdType="pubmed">123</ArticleId>
+            <ArticleId IdType="doi">not a doi</ArticleId>
+            <ArticleId IdType="doi">10.1000/test.123</ArticleId>
+            <ArticleId IdType="pmc">PMC456</ArticleId>
+        </ArticleIdList>
+    </PubmedData>
+</PubmedArticle></PubmedArticleSet>"""
+
+    articles = list(process_medline_file(StringIO(article)))
+    assert len(articles) == 1
+    assert articles[0] == {
+        'pmid': '123',
+        'pmcid': 'PMC456',
+        'doi': '10.1000/test.123',
+        'pubYear': 1998,
+        'pubMonth': 1,  # the first month name found in the MedlineDate
+        'pubDay': None,
+        'title': ['A title .'],
+        'abstract': ['First <part>. Second part.'],
+        'journal': 'Journal of Tests',
+        'journalISO': 'J Test',
+        'authors': ['Jane Smith', 'Jones', 'The Test Group'],
+        'chemicals': 'D000001|Chemical',
+        'meshHeadings': 'Descriptor|D000002|N|Term~Qualifier|Q000001|Y|qualifier',
+        'supplementaryMesh': 'C000001|Disease|Concept',
+        'publicationTypes': 'Journal Article|Review',
+    }
+
+
+def write_minimal_pubmed_file(filename, article_count):
+    with open(filename, 'w') as f:
+        f.write('<PubmedArticleSet>')
+        for pmid in range(1, article_count + 1):
+            f.write(
+                f'<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article><Journal><JournalIssue>'
+                '<PubDate><Year>2020</Year></PubDate></JournalIssue></Journal>'
+                f'<ArticleTitle>Article {pmid}</ArticleTitle></Article></MedlineCitation></PubmedArticle>\n'
+            )
+        f.write('</PubmedArticleSet>')
+
+
+def peak_memory_to_process(filename):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        article_count = sum(1 for _ in process_medline_file(filename))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return article_count, peak
+
+
+def test_process_medline_file_memory_is_flat(tmp_path):
+    # uses the default (standard library) backend as tracemalloc can't see the memory used by lxml's tree
+    warm_up_file, small_file, large_file = (
+        tmp_path / 'warm_up.xml',
+        tmp_path / 'small.xml',
+        tmp_path / 'large.xml',
+    )
+    write_minimal_pubmed_file(warm_up_file, 200)
+    write_minimal_pubmed_file(small_file, 2000)
+    write_minimal_pubmed_file(large_file, 6000)
+
+    peak_memory_to_process(warm_up_file)  # warm up any caches
+    small_count, small_peak = peak_memory_to_process(small_file)
+    large_count, large_peak = peak_memory_to_process(large_file)
+
+    assert (small_count, large_count) == (2000, 6000)
+    # previously each processed article was left attached to the root, adding ~300KB for the extra articles
+    assert large_peak - small_peak < 100 * 1024
+
+
+class PublicPullParser:
+    """
+    Exposes only the public methods of the standard library's pull parser (and records the root element)
+    """
+
+    roots = []
+
+    def __init__(self, events):
+        self.parser = ElementTree.XMLPullParser(events=events)
+        self.feed, self.close = self.parser.feed, self.parser.close
+
+    def read_events(self):
+        for event, elem in self.parser.read_events():
+            if not self.roots:
+                self.roots.append(elem)
+            yield event, elem
+
+
+@pytest.mark.parametrize('read_size', [16, 1024 * 1024])
+def test_stdlib_iterparse_detached_uses_public_parser_api(tmp_path, monkeypatch, read_size):
+    monkeypatch.setattr(xmlbackend, 'stdlib_etree', SimpleNamespace(XMLPullParser=PublicPullParser))
+    monkeypatch.setattr(xmlbackend, 'STDLIB_READ_SIZE', read_size)
+    monkeypatch.setattr(PublicPullParser, 'roots', [])
+    filename = tmp_path / 'articles.xml'
+    write_minimal_pubmed_file(filename, 20)
+
+    pmids = []
+    for elem in xmlbackend.iterparse_detached(str(filename), tag='PubmedArticle', backend='stdlib'):
+        pmids.append(elem.find('.//PMID').text)
+        # the articles before this one have been detached from the root
+        assert PublicPullParser.roots[0][0] is elem
+
+    assert pmids == [str(pmid) for pmid in range(1, 21)]
+    assert len(PublicPullParser.roots[0]) == 0
+
+
+@pytest.mark.parametrize('read_size', [64, 1024 * 1024])
+def test_split_medline_file_keeps_every_article(tmp_path, monkeypatch, read_size):
+    monkeypatch.setattr(pubmedxml, 'MEDLINE_READ_SIZE', read_size)
+    filename = tmp_path / 'articles.xml'
+    write_minimal_pubmed_file(filename, 10)
+    data = filename.read_bytes().replace(
+        b'</PubmedArticleSet>', b'<DeleteCitation><PMID>99</PMID></DeleteCitation></PubmedArticleSet>'
+    )
+
+    pieces = list(split_medline_file(BytesIO(data), piece_size=500))
+
+    assert len(pieces) > 2
+    assert all(piece.startswith(b'<PubmedArticleSet>') for piece in pieces)
+    assert all(piece.endswith(b'</PubmedArticle></PubmedArticleSet>') for piece in pieces)
+    # the content after the last article is not copied into the pieces
+    assert not any(b'DeleteCitation' in piece for piece in pieces)
+
+    pmids = [pmid.text for piece in pieces for pmid in ElementTree.fromstring(piece).iter('PMID')]
+    assert pmids == [str(pmid) for pmid in range(1, 11)]
+
+
+def test_split_medline_file_reads_text_files():
+    data = '<?xml version="1.0" encoding="UTF-8"?>\n<PubmedArticleSet><PubmedArticle>λ</PubmedArticle></PubmedArticleSet>'
+
+    assert list(split_medline_file(StringIO(data))) == [data.encode('utf-8')]
+
+
+@pytest.mark.parametrize('text', [False, True])
+def test_split_medline_file_keeps_declared_encoding(monkeypatch, text):
+    monkeypatch.setattr(pubmedxml, 'MEDLINE_READ_SIZE', 64)
+    data = '<?xml version="1.0" encoding="ISO-8859-1"?>\n<PubmedArticleSet>%s</PubmedArticleSet>' % ''.join(
+        f'<PubmedArticle><PMID>{pmid}</PMID><ArticleTitle>Caf\u00e9 {pmid}</ArticleTitle></PubmedArticle>'
+        for pmid in range(1, 6)
+    )
+    source = StringIO(data) if text else BytesIO(data.encode('latin-1'))
+
+    pieces = list(split_medline_file(source, piece_size=100))
+
+    assert len(pieces) > 1
+    titles = [title.text for piece in pieces for title in ElementTree.fromstring(piece).iter('ArticleTitle')]
+    assert titles == ['Caf\u00e9 %d' % pmid for pmid in range(1, 6)]
+
+
+def skip_handler(elem, custom_handlers):
+    return []
+
+
+def test_pubmedxml2bioc_with_workers_needs_picklable_tag_handlers(tmp_path):
+    filename = tmp_path / 'articles.xml'
+    write_minimal_pubmed_file(filename, 5)
+
+    with pytest.raises(ValueError, match='tag_handlers must be picklable'):
+        list(pubmedxml2bioc(str(filename), tag_handlers={'i': lambda elem, custom_handlers: []}, workers=2))
+
+    # module-level functions can be sent to the worker processes
+    assert len(list(pubmedxml2bioc(str(filename), tag_handlers={'i': skip_handler}, workers=2))) == 5
+
+
+def test_pubmedxml2bioc_with_workers_matches_serial(tmp_path, xml_backend):
+    filename = tmp_path / 'articles.xml'
+    write_minimal_pubmed_file(filename, 50)
+
+    outputs = []
+    for workers in [1, 3]:
+        collection = bioc.BioCCollection()
+        for doc in pubmedxml2bioc(str(filename), workers=workers):
+            collection.add_document(doc)
+        outputs.append(bioc.biocxml.dumps(collection))
+
+    assert outputs[0].count('<document>') == 50
+    assert outputs[0] == outputs[1]
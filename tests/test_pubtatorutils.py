@@ -0,0 +1,117 @@
+import random
+import re
+
+import pytest
+
+from pubtatorutils import MentionMatcher, createRegex, selectLongestNonOverlapping
+
+
+def per_mention_hits(annotations, text):
+    # The original matching in alignWithPubtator.py that runs the regex of each mention of each annotation in turn
+    hits = []
+    for annotationType, conceptid, mentions in annotations:
+        mentions = [m.strip() for m in mentions.split('|')]
+        mentions = [m for m in mentions if m]
+        for mention in mentions:
+            for match in re.finditer(createRegex(mention), text):
+                start, end = match.span()
+                hits.append((start, end, annotationType, conceptid))
+    return hits
+
+
+@pytest.mark.parametrize(
+    'annotations,text',
+    [
+        # overlapping and nested mentions, including the same mention for different concepts
+        (
+            [
+                ('Gene', '3558', 'IL-2|interleukin 2'),
+                ('Gene', '3559', 'IL-2 receptor|IL-2R'),
+                ('Chemical', 'D1', 'receptor'),
+                ('Disease', 'D2', 'IL-2'),
+            ],
+            'The IL-2 receptor binds IL-2, and IL-2R  receptor levels rise with interleukin\n2.',
+        ),
+        # regex metacharacters in the mentions
+        (
+            [
+                ('Mutation', 'c.123+4A>G', 'c.123+4A>G'),
+                ('Chemical', 'D3', '(S)-ketamine|[Ca2+]i|a.b|x*y'),
+                ('Gene', '7157', 'p53?'),
+            ],
+            'Variant c.123+4A>G and c.123+4AAG, (S)-ketamine with [Ca2+]i and a.b but not axb, x*y, p53? p53.',
+        ),
+        # word boundaries
+        (
+            [('Species', '9685', 'cat|cats'), ('Gene', 'G1', 'TNF')],
+            'cat category cats concatenate cat-like TNFalpha TNF, TNF_1 (TNF)',
+        ),
+        # greek letters and runs of whitespace
+        (
+            [('Gene', '7124', 'TNF alpha|TNF-alpha'), ('Gene', '2099', 'ER beta'), ('Chemical', 'D4', 'alpha')],
+            'TNF α, TNF   alpha, TNF-α and ERβ vs ER\tβ, alpha and α-helix',
+        ),
+        ([], 'No annotations'),
+        ([('Gene', '1', 'BRCA1')], ''),
+    ],
+)
+def test_mention_matcher_matches_per_mention_regexes(annotations, text):
+    assert MentionMatcher(annotations).findAll(text) == per_mention_hits(annotations, text)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_mention_matcher_matches_per_mention_regexes_on_random_text(seed):
+    rng = random.Random(seed)
+    tokens = ['a', 'ab', 'abc', 'b', 'alpha', 'α', 'beta', 'IL-2', '2', '(', ')', '+', '.', '*', '[x]', 'x', 'c.1A>G']
+    separators = [' ', ' ', '  ', '\n', '-', '', ',']
+
+    def phrase(length):
+        return ''.join(rng.choice(tokens) + rng.choice(separators) for _ in range(length))
+
+    annotations = [
+        (rng.choice(['Gene', 'Chemical']), str(i), '|'.join(phrase(rng.randint(1, 3)) for _ in range(rng.randint(1, 3))))
+        for i in range(rng.randint(1, 15))
+    ]
+    text = phrase(300)
+
+    assert MentionMatcher(annotations).findAll(text) == per_mention_hits(annotations, text)
+
+
+def quadratic_select(spans):
+    # The original implementation (from alignWithPubtator.py) that checks every candidate against all chosen spans
+    locations = sorted([(end - start, start, end) for start, end in spans], reverse=True)
+    nonoverlapping = []
+    for _, start1, end1 in locations:
+        overlapping = False
+        for start2, end2 in nonoverlapping:
+            if start1 > end2:
+                pass
+            elif start2 > end1:
+                pass
+            else:
+                overlapping = True
+                break
+
+        if not overlapping:
+            nonoverlapping.append((start1, end1))
+    return nonoverlapping
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_select_longest_non_overlapping_matches_quadratic(seed):
+    rng = random.Random(seed)
+    passage_length = rng.choice([20, 200, 2000])
+    spans = []
+    for _ in range(rng.randint(0, 300)):
+        start = rng.randrange(passage_length)
+        spans.append((start, min(passage_length, start + rng.randint(0, 30))))
+
+    assert selectLongestNonOverlapping(spans) == quadratic_select(spans)
+
+
+def test_select_longest_non_overlapping_edge_cases():
+    assert selectLongestNonOverlapping([]) == []
+    # shared endpoints overlap, and the later span wins a tie
+    assert selectLongestNonOverlapping([(0, 5), (5, 10)]) == [(5, 10)]
+    assert selectLongestNonOverlapping([(0, 4), (5, 10), (2, 12)]) == [(2, 12)]
+    assert selectLongestNonOverlapping([(3, 3), (3, 3), (0, 1)]) == [(0, 1), (3, 3)]
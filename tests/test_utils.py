@@ -1,4 +1,6 @@
+import re
 import textwrap
+import unicodedata
 import xml.etree.cElementTree as etree
 from typing import List, Optional
 from unittest.mock import MagicMock
@@ -7,11 +9,13 @@ from xml.sax.saxutils import escape
 import pytest
 from bioconverters.utils import (
     TABLE_DELIMITER,
+    TextChunk,
     cleanup_text,
     extract_text_chunks,
     merge_adjacent_xref_siblings,
     remove_brackets_without_words,
     strip_annotation_markers,
+    tag_handler,
 )
 from hypothesis import given, infer
 from hypothesis import strategies as st
@@ -37,6 +41,24 @@ def test_remove_brackets_without_words(test_input, expected):
     assert expected == remove_brackets_without_words(test_input)
 
 
+def reference_remove_brackets_without_words(text: str) -> str:
+    # the original implementation that repeats the substitutions until nothing changes
+    changed = True
+    previous_text = text
+    while changed:
+        fixed = re.sub(r"\([^\w\t]*\)", "", previous_text)
+        fixed = re.sub(r"\[[^\w\t]*\]", "", fixed)
+        fixed = re.sub(r"\{[^\w\t]*\}", "", fixed)
+        changed = bool(previous_text != fixed)
+        previous_text = fixed
+    return fixed
+
+
+@given(text=st.one_of(st.text(), st.text(alphabet='()[]{} \t.;,a1\u00e9_')))
+def test_remove_brackets_without_words_matches_reference(text):
+    assert remove_brackets_without_words(text) == reference_remove_brackets_without_words(text)
+
+
 def test_extract_text_chunks_sibling_xrefs():
     siblings_example = """<article><abstract><p>Lorem ipsum dolor sit amet, consectetur adipiscing elit. Duis nec diam sed nisl aliquam scelerisque quis at turpis <xref ref-type="bibr">1</xref>. Vestibulum urna quam, accumsan id efficitur eget, fermentum vel eros. Pellentesque nisi urna, fringilla vitae sapien a, eleifend tempus libero. Nullam eget porta velit. Praesent bibendum dolor enim, ac lobortis<xref ref-type="bibr">2</xref>,            <xref ref-type="bibr">3</xref>.</p></abstract></article>"""
     expected = """Lorem ipsum dolor sit amet, consectetur adipiscing elit. Duis nec diam sed nisl aliquam scelerisque quis at turpis. Vestibulum urna quam, accumsan id efficitur eget, fermentum vel eros. Pellentesque nisi urna, fringilla vitae sapien a, eleifend tempus libero. Nullam eget porta velit. Praesent bibendum dolor enim, ac lobortis."""
@@ -73,6 +95,22 @@ def test_extract_figure_label():
     assert 'Figure 3' in [c.text for c in chunks if c.xml_path == 'article/fig/label']
 
 
+def test_extract_xml_paths_with_custom_handler():
+    xml_input = '<article><sec><title>Results</title><fig><caption><p>Growth curves</p></caption></fig></sec></article>'
+
+    def caption_handler(elem, custom_handlers):
+        # chunks from handlers that don't track the XML path are given one from the tree
+        return [TextChunk('Custom caption', elem)] + tag_handler(elem[0], custom_handlers)
+
+    root_nodes = [etree.fromstring(xml_input)]
+    chunks = extract_text_chunks(root_nodes, tag_handlers={'caption': caption_handler})
+    assert [(c.text, c.xml_path) for c in chunks] == [
+        ('Results', 'article/sec/title'),
+        ('Custom caption', 'article/sec/fig/caption'),
+        ('Growth curves', 'article/sec/fig/caption/p'),
+    ]
+
+
 @pytest.mark.parametrize(
     'text,annotations_map,expected_text,expected_locations',
     [
@@ -259,6 +297,33 @@ def test_cleanup_text(input, output):
     assert cleanup_text(input) == output
 
 
+def reference_cleanup_text(text: str) -> str:
+    # the original per-character/regex implementation of cleanup_text
+    text = text.replace(u"\u2028", " ").replace(u"\u2029", " ")
+    text = "".join(ch for ch in text if unicodedata.category(ch)[0] != "C" or ch == TABLE_DELIMITER)
+    text = "".join(ch if unicodedata.category(ch)[0] != "Z" else " " for ch in text)
+    text = re.sub(r",([^\S\t]*,)*", ",", text)
+    text = re.sub(r"(,[^\S\t]*)*\.", ".", text)
+    text = remove_brackets_without_words(text)
+    text = re.sub(r'\([^\S\t]*([^)]*[^\s)])[^\S\t]*\)', r'(\1)', text)
+    text = re.sub(r'[^\S\t]+\.(\s|$)', r'.\1', text)
+    text = re.sub(r'[^\S\t]*([,;])[^\S\t]+', r'\1 ', text)
+    text = re.sub(r'(^|\t)([^\S\t]+)', r'\1', text)
+    text = re.sub(r'([^\S\t]+)(\t|$)', r'\2', text)
+    text = re.sub(r'[^\S\t][^\S\t]+', ' ', text)
+    return text
+
+
+@given(
+    text=st.one_of(
+        st.text(),
+        st.text(alphabet=' \t\n\r\x0b\x0c\xa0\u2028\u2029\u200b\x00\x85,.;()[]{}ab1'),
+    )
+)
+def test_cleanup_text_matches_reference(text):
+    assert cleanup_text(text) == reference_cleanup_text(text)
+
+
 @given(text=infer, sibling_text=infer, sibling_tail=infer)
 def test_merge_adjacent_xref_siblings(
     text: Optional[str], sibling_text: Optional[str], sibling_tail: Optional[str]